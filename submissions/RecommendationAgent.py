@@ -1,10 +1,17 @@
 from agno.agent import Agent
-from agno.models.azure.openai_chat import AzureOpenAI
 from read_env import *
+import recommendation_cache
+from metrics import incr, span
 
-def recommendationTool(topic,proficiency_level):
+def _ask_agent(topic,proficiency_level):
     query = 'Give me the best study materials in terms of youtube tutorials and websites for the give topic to get profiency in the given proficiency level. Topic:' + topic +'Profiency Level:' + proficiency_level
-    agent = Agent(model=AzureOpenAI(id="XXXXXXX",
-                               api_key=AZURE_OPENAI_API_KEY), markdown=True)
-    assistant_message = agent.run(query).messages[-1].content
+    # The agno model (and its HTTP connection pool) is shared; only the Agent is per call
+    agent = Agent(model=get_model("RECOMMENDATION_MODEL"), markdown=True)
+    with span("recommendation.agent"):
+        assistant_message = agent.run(query).messages[-1].content
+    incr("recommendation.chars", len(assistant_message or ""))
     return(assistant_message)
+
+def recommendationTool(topic,proficiency_level):
+    # Served from the shared recommendation cache; only misses go to the LLM
+    return recommendation_cache.get_or_compute(topic, proficiency_level, lambda: _ask_agent(topic, proficiency_level))
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+
+import numpy as np
+
+from user_db import transaction
+
+# A new question is answered from the cache when its embedding is at least this similar (cosine)
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Cached answers older than this are recomputed (default: 1 day)
+CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+
+# Least recently used answers beyond this count per document are evicted
+CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+
+_stats = {"hits": 0, "exact_hits": 0, "misses": 0, "invalidated": 0}
+_table_ready = False
+
+
+def _ensure_table(conn):
+    global _table_ready
+    if _table_ready:
+        return
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS AnswerCache (
+            scope VARCHAR(200),
+            index_version VARCHAR(64),
+            question TEXT,
+            embedding BLOB,
+            answer TEXT,
+            sources TEXT,
+            created_at REAL,
+            last_used REAL
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_scope ON AnswerCache(scope, last_used);")
+    _table_ready = True
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def _normalize(question):
+    return " ".join(question.lower().split())
+
+
+def _drop_stale(conn, scope, index_version):
+    # Entries answered from another index version of the scope are invalid
+    removed = conn.execute("DELETE FROM AnswerCache WHERE scope = ? AND index_version != ?",
+                           (scope, index_version)).rowcount
+    _stats["invalidated"] += max(removed, 0)
+
+
+def lookup_exact(scope, index_version, question):
+    """
+    Return the cached answer to the same question (ignoring case and spacing), or None.
+
+    Needs no embedding, so it runs before the semantic `lookup`.
+
+    Returns:
+        dict: {"answer", "sources", "question", "similarity"} of the match.
+    """
+    now = time.time()
+    with transaction() as conn:
+        _ensure_table(conn)
+        _drop_stale(conn, scope, index_version)
+        rows = conn.execute(
+            "SELECT rowid, question, answer, sources FROM AnswerCache WHERE scope = ? AND created_at > ?",
+            (scope, now - CACHE_TTL),
+        ).fetchall()
+        key = _normalize(question)
+        match = next((row for row in rows if _normalize(row[1]) == key), None)
+        if match is None:
+            return None
+        rowid, question, answer, sources = match
+        conn.execute("UPDATE AnswerCache SET last_used = ? WHERE rowid = ?", (now, rowid))
+    return {"answer": answer, "sources": json.loads(sources), "question": question, "similarity": 1.0}
+
+
+def lookup(scope, index_version, embedding, threshold=SIMILARITY_THRESHOLD):
+    """
+    Return the cached answer closest to a question embedding, or None below `threshold`.
+
+    Entries of the scope that were answered from another index version are dropped first,
+    so re-indexing a document invalidates its answers. Entries stored without an
+    embedding only match exactly (see `lookup_exact`).
+
+    Returns:
+        dict: {"answer", "sources", "question", "similarity"} of the best match.
+    """
+    now = time.time()
+    query = _unit(embedding)
+    with transaction() as conn:
+        _ensure_table(conn)
+        _drop_stale(conn, scope, index_version)
+        rows = conn.execute(
+            "SELECT rowid, question, embedding, answer, sources FROM AnswerCache "
+            "WHERE scope = ? AND created_at > ? AND embedding IS NOT NULL",
+            (scope, now - CACHE_TTL),
+        ).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        similarities = matrix @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+        rowid, question, _, answer, sources = rows[best]
+        conn.execute("UPDATE AnswerCache SET last_used = ? WHERE rowid = ?", (now, rowid))
+    return {"answer": answer, "sources": json.loads(sources), "question": question,
+            "similarity": float(similarities[best])}
+
+
+def store(scope, index_version, question, embedding, answer, sources):
+    """
+    Save an answer and evict expired and least recently used entries of the scope.
+
+    With `embedding` None the answer is only served to the same question.
+    """
+    now = time.time()
+    blob = _unit(embedding).tobytes() if embedding is not None else None
+    with transaction() as conn:
+        _ensure_table(conn)
+        conn.execute("""
+            INSERT INTO AnswerCache (scope, index_version, question, embedding, answer, sources, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (scope, index_version, question, blob, answer, json.dumps(sources), now, now))
+        conn.execute("DELETE FROM AnswerCache WHERE created_at <= ?", (now - CACHE_TTL,))
+        conn.execute("""
+            DELETE FROM AnswerCache WHERE rowid IN (
+                SELECT rowid FROM AnswerCache WHERE scope = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (scope, CACHE_MAX_ENTRIES))
+
+
+def find(scope, index_version, question, embeddings, semantic=True):
+    """
+    Look a question up in the cache, counting the hit or miss.
+
+    The same question is found without embedding it. Otherwise the question is only
+    embedded for the semantic lookup when `semantic` is True; callers that would not
+    embed it to answer it (e.g. a keyword lookup answered by BM25 alone) pass False.
+
+    Returns:
+        (dict, list): The cached answer (with "cached": True) or None, and the question
+        embedding (None when it was not computed) to pass to `store` once a fresh
+        answer is available.
+    """
+    cached = lookup_exact(scope, index_version, question)
+    if cached is not None:
+        _stats["hits"] += 1
+        _stats["exact_hits"] += 1
+        return dict(cached, cached=True), None
+
+    embedding = embeddings.embed_query(question) if semantic else None
+    cached = lookup(scope, index_version, embedding) if embedding is not None else None
+    if cached is None:
+        _stats["misses"] += 1
+        return None, embedding
+    _stats["hits"] += 1
+    return dict(cached, cached=True), embedding
+
+
+def get_or_answer(scope, index_version, question, embeddings, ask, semantic=True):
+    """
+    Answer `question` from the cache, or by calling `ask` and caching the result.
+
+    Parameters:
+        scope (str): What the question is about, e.g. a document's file name.
+        index_version (str): Fingerprint of the index answers come from; a change invalidates them.
+        question (str): The user's question.
+        embeddings: LangChain embeddings client used to embed the question.
+        ask (callable): ask(question) -> (answer, sources), sources being JSON-serialisable metadata.
+        semantic (bool): Whether to embed the question to match similar ones (see `find`).
+
+    Returns:
+        dict: {"answer", "sources", "cached"}; hits also carry the matched "question" and "similarity".
+    """
+    cached, embedding = find(scope, index_version, question, embeddings, semantic)
+    if cached is not None:
+        return cached
+
+    answer, sources = ask(question)
+    store(scope, index_version, question, embedding, answer, sources)
+    return {"answer": answer, "sources": sources, "cached": False}
+
+
+def invalidate(scope=None):
+    """Drop the cached answers of one scope, or all of them."""
+    with transaction() as conn:
+        _ensure_table(conn)
+        if scope is None:
+            conn.execute("DELETE FROM AnswerCache;")
+        else:
+            conn.execute("DELETE FROM AnswerCache WHERE scope = ?", (scope,))
+
+
+def stats():
+    """
+    Hit/miss counters of this process; "exact_hits" counts the hits found without embedding
+    the question, "invalidated" the answers dropped after re-indexing.
+    """
+    lookups = _stats["hits"] + _stats["misses"]
+    return dict(_stats, hit_rate=_stats["hits"] / lookups if lookups else None)
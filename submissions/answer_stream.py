@@ -0,0 +1,91 @@
+import time
+import queue
+import threading
+
+from langchain.callbacks.base import BaseCallbackHandler
+from context_builder import MAP_TAG
+from metrics import get_metrics, incr
+
+_DONE = object()
+
+
+class StreamCancelled(Exception):
+    """Raised inside the chain to abort generation once the reader has gone away."""
+
+
+class _TokenQueue(BaseCallbackHandler):
+    # Let StreamCancelled propagate out of the LLM call instead of being logged and ignored
+    raise_error = True
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.stream.cancelled.is_set():
+            raise StreamCancelled()
+        if MAP_TAG in (kwargs.get("tags") or ()):
+            # Extracts of the map step are not part of the answer
+            return
+        if self.stream.first_token_s is None:
+            self.stream.first_token_s = time.perf_counter() - self.stream.started
+            get_metrics().observe("llm.first_token", self.stream.first_token_s)
+        incr("llm.tokens")
+        self.stream._queue.put(token)
+
+
+class AnswerStream:
+    """
+    Run a RetrievalQA chain in a background thread and hand out its answer token by token.
+
+    The chain's LLM must be created with streaming=True. Iterate `tokens()` to render the
+    answer as it is generated; once it is exhausted, `answer` and `sources` (the retrieved
+    documents, if the chain returns them) are set. Closing the iterator early, e.g. when
+    Streamlit stops a run because the user clicked something, or calling `cancel()`
+    aborts generation at the next token.
+    """
+
+    def __init__(self, chain, query):
+        self.query = query
+        self.answer = ""
+        self.sources = []
+        self.error = None
+        self.started = time.perf_counter()
+        self.first_token_s = None
+        self.total_s = None
+        self.cancelled = threading.Event()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, args=(chain,), name="answer-stream", daemon=True)
+        self._thread.start()
+
+    def _run(self, chain):
+        try:
+            result = chain.invoke({"query": self.query}, config={"callbacks": [_TokenQueue(self)]})
+            self.answer = result["result"]
+            self.sources = result.get("source_documents", [])
+            incr("llm.answer_chars", len(self.answer))
+        except StreamCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.total_s = time.perf_counter() - self.started
+            if not self.cancelled.is_set():
+                get_metrics().observe("llm.answer", self.total_s, error=self.error is not None)
+            self._queue.put(_DONE)
+
+    def tokens(self):
+        """Yield answer tokens as they arrive; raises the chain's error, if any, at the end."""
+        try:
+            while True:
+                token = self._queue.get()
+                if token is _DONE:
+                    break
+                yield token
+        finally:
+            if self.total_s is None:
+                self.cancel()
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self):
+        self.cancelled.set()
@@ -0,0 +1,245 @@
+import os
+import time
+import queue
+import atexit
+import itertools
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+
+# Whisper model size: tiny, base, small, medium, large...
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+
+# Number of resident worker processes; each keeps one copy of the model loaded
+ASR_WORKERS = int(os.getenv("ASR_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+
+# Torch threads per worker, so workers x threads does not oversubscribe the CPU
+ASR_THREADS = int(os.getenv("ASR_THREADS", str(max(1, (os.cpu_count() or 1) // max(ASR_WORKERS, 1)))))
+
+# Times a worker may die while transcribing a request before the request fails
+MAX_ATTEMPTS = int(os.getenv("ASR_MAX_ATTEMPTS", "2"))
+
+
+def _serve(model_name, threads, requests, responses):
+    # Worker process: load the model once, then answer requests until a None sentinel
+    import torch
+    import whisper
+
+    torch.set_num_threads(threads)
+    start = time.perf_counter()
+    model = whisper.load_model(model_name)
+    responses.put({"type": "ready", "pid": os.getpid(), "load_s": time.perf_counter() - start})
+
+    for request in iter(requests.get, None):
+        # Tells the pool which request to blame if this process dies during inference
+        responses.put({"type": "start", "id": request["id"]})
+        start = time.perf_counter()
+        try:
+            text = model.transcribe(request["samples"], fp16=False)["text"].strip()
+            responses.put({"type": "result", "id": request["id"], "text": text,
+                           "inference_s": time.perf_counter() - start})
+        except Exception as e:
+            responses.put({"type": "error", "id": request["id"], "error": repr(e),
+                           "inference_s": time.perf_counter() - start})
+
+
+class WhisperWorkerPool:
+    """
+    Resident Whisper workers, each fed from its own request queue.
+
+    Each worker process loads the model once at start-up and then serves segment
+    transcription requests for as long as the app runs, so processing a video no longer
+    pays for loading the weights. Model load time and inference time are tracked separately.
+
+    Requests go to the worker with the fewest in flight, so the pool knows which requests
+    each worker holds. When a worker dies (out of memory, CUDA error...) it is respawned
+    and its requests are sent to the live workers again. The request it was transcribing
+    fails once it has taken down `max_attempts` workers. A worker that dies before its
+    model is loaded is dropped from the pool rather than respawned.
+    """
+
+    def __init__(self, model_name=WHISPER_MODEL, workers=ASR_WORKERS, threads=ASR_THREADS,
+                 max_attempts=MAX_ATTEMPTS):
+        self.model_name = model_name
+        self.threads = threads
+        self.max_attempts = max_attempts
+        self._ctx = mp.get_context("spawn")
+        self._responses = self._ctx.Queue()
+        self._workers = []
+        self._requests = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {"workers_ready": 0, "load_s": [], "requests": 0, "errors": 0, "inference_s": 0.0,
+                       "respawns": 0, "resubmitted": 0}
+        self._closed = False
+
+        for _ in range(max(1, workers)):
+            self._workers.append(self._spawn())
+        self._dispatcher = threading.Thread(target=self._dispatch, name="asr-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _spawn(self):
+        requests = self._ctx.Queue()
+        process = self._ctx.Process(target=_serve, args=(self.model_name, self.threads, requests, self._responses),
+                                    daemon=True)
+        process.start()
+        return {"process": process, "requests": requests, "in_flight": set(), "ready": False}
+
+    def _send(self, request_id):
+        # Caller holds the lock: hand the request to the live worker with the fewest in flight
+        alive = [worker for worker in self._workers if worker["process"].is_alive()]
+        if not alive:
+            raise RuntimeError("All Whisper workers exited")
+        worker = min(alive, key=lambda w: len(w["in_flight"]))
+        request = self._requests[request_id]
+        request["worker"] = worker
+        request["running"] = False
+        request["sends"] += 1
+        worker["in_flight"].add(request_id)
+        worker["requests"].put({"id": request_id, "samples": request["samples"]})
+
+    def _dispatch(self):
+        while not self._closed:
+            try:
+                message = self._responses.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+
+            with self._lock:
+                if message["type"] == "ready":
+                    self._stats["workers_ready"] += 1
+                    self._stats["load_s"].append(message["load_s"])
+                    for worker in self._workers:
+                        if worker["process"].pid == message["pid"]:
+                            worker["ready"] = True
+                    continue
+                if message["type"] == "start":
+                    request = self._requests.get(message["id"])
+                    if request is not None:
+                        request["running"] = True
+                        request["attempts"] += 1
+                    continue
+                self._stats["inference_s"] += message["inference_s"]
+                request = self._requests.pop(message["id"], None)
+                if request is not None:
+                    request["worker"]["in_flight"].discard(message["id"])
+                if message["type"] == "error":
+                    self._stats["errors"] += 1
+            if request is None:
+                continue
+            if message["type"] == "error":
+                request["future"].set_exception(RuntimeError(message["error"]))
+            else:
+                request["future"].set_result(message["text"])
+            self._check_workers()
+
+    def _check_workers(self):
+        # Respawn dead workers and queue their requests again (or fail them)
+        failed = []
+        with self._lock:
+            if self._closed:
+                return
+            for worker in list(self._workers):
+                if worker["process"].is_alive():
+                    continue
+                lost = sorted(worker["in_flight"])
+                position = self._workers.index(worker)
+                if worker["ready"]:
+                    self._workers[position] = self._spawn()
+                    self._stats["respawns"] += 1
+                else:
+                    # Died while loading the model: a new process would most likely die too
+                    del self._workers[position]
+                for request_id in lost:
+                    request = self._requests[request_id]
+                    try:
+                        # Requests still queued behind the crash are not to blame; the
+                        # send cap covers a "start" message lost with the process
+                        if ((request["running"] and request["attempts"] >= self.max_attempts)
+                                or request["sends"] >= 2 * self.max_attempts):
+                            raise RuntimeError(f"Whisper worker exited (exit code {worker['process'].exitcode})")
+                        self._send(request_id)
+                        self._stats["resubmitted"] += 1
+                    except RuntimeError as e:
+                        failed.append((self._requests.pop(request_id)["future"], e))
+            if not any(worker["process"].is_alive() for worker in self._workers):
+                error = RuntimeError("All Whisper workers exited")
+                failed += [(request["future"], error) for request in self._requests.values()]
+                self._requests = {}
+        for future, error in failed:
+            future.set_exception(error)
+
+    def _fail_pending(self, error):
+        with self._lock:
+            requests, self._requests = list(self._requests.values()), {}
+        for request in requests:
+            request["future"].set_exception(error)
+
+    @property
+    def workers(self):
+        """Number of workers, counting respawned ones once and not counting dropped ones."""
+        with self._lock:
+            return len(self._workers)
+
+    def submit(self, samples):
+        """Queue 16 kHz mono float32 audio for transcription; returns a Future of its text."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Whisper worker pool is closed")
+            request_id = next(self._ids)
+            self._requests[request_id] = {"future": future, "samples": samples, "attempts": 0, "sends": 0,
+                                          "running": False, "worker": None}
+            self._stats["requests"] += 1
+            try:
+                self._send(request_id)
+            except RuntimeError:
+                del self._requests[request_id]
+                raise
+        return future
+
+    def stats(self):
+        with self._lock:
+            load_s = list(self._stats["load_s"])
+            return {
+                "model": self.model_name,
+                "workers": len(self._workers),
+                "workers_alive": sum(worker["process"].is_alive() for worker in self._workers),
+                "threads_per_worker": self.threads,
+                "workers_ready": self._stats["workers_ready"],
+                "model_load_s": max(load_s) if load_s else None,
+                "requests": self._stats["requests"],
+                "errors": self._stats["errors"],
+                "respawns": self._stats["respawns"],
+                "resubmitted": self._stats["resubmitted"],
+                "inference_s": self._stats["inference_s"],
+                "pending": len(self._requests),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self._workers:
+            worker["requests"].put(None)
+        for worker in self._workers:
+            worker["process"].join(timeout=5)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+        self._fail_pending(RuntimeError("Whisper worker pool was closed"))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_asr_pool():
+    """Return the process-wide warm Whisper worker pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WhisperWorkerPool()
+            atexit.register(_pool.close)
+        return _pool
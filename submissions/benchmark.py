@@ -0,0 +1,543 @@
+import os
+import re
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Any, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+# Project modules are imported inside the benchmarks, after `isolate` has pointed their
+# stores (user DB, embedding cache, index and video stores) at a scratch folder
+
+# Dimension of the fake embeddings; ada-002's, so index sizes match production
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", "1536"))
+
+SUITES = ["pdf", "video", "retrieval", "db"]
+
+CANNED_ANSWER = ("This is a canned answer from the benchmark's stand-in LLM. It streams one word at a time "
+                 "so time to first token and total answer time can be measured without a live endpoint.")
+
+
+# ---------- Deterministic model stand-ins ----------
+def hash_embedding(text, dim=FAKE_EMBEDDING_DIM):
+    """
+    Deterministic stand-in for a text embedding: a signed bag of hashed words, L2-normalised.
+
+    Texts sharing words get similar vectors, so retrieval over fake embeddings still
+    returns related chunks and exercises the same code paths as real ones.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0:
+        vector[0] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+
+class HashEmbeddings(Embeddings):
+    """LangChain embeddings client returning `hash_embedding`s after `latency_s` per request."""
+
+    def __init__(self, dim=FAKE_EMBEDDING_DIM, latency_s=0.0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.model_name = f"hash-embedding-{dim}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_s)
+        return [hash_embedding(text, self.dim) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_s)
+        return hash_embedding(text, self.dim)
+
+
+class HashLlamaEmbedding(BaseEmbedding):
+    """llama_index counterpart of `HashEmbeddings` for the video pipeline."""
+
+    _dim: int = PrivateAttr()
+    _latency_s: float = PrivateAttr()
+
+    def __init__(self, dim: int = FAKE_EMBEDDING_DIM, latency_s: float = 0.0, **kwargs: Any):
+        super().__init__(model_name=f"hash-embedding-{dim}", **kwargs)
+        self._dim = dim
+        self._latency_s = latency_s
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashLlamaEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(self._latency_s)
+        return hash_embedding(query, self._dim)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._latency_s)
+        return [hash_embedding(text, self._dim) for text in texts]
+
+
+class CannedChatModel(BaseChatModel):
+    """Chat model that answers `answer` word by word, after `latency_s` and then every `token_interval_s`."""
+
+    answer: str = CANNED_ANSWER
+    latency_s: float = 0.2
+    token_interval_s: float = 0.01
+
+    @property
+    def _llm_type(self) -> str:
+        return "canned"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Tokens go to the callbacks either way, like a client created with streaming=True
+        text = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_s)
+        for i, word in enumerate(self.answer.split(" ")):
+            if i:
+                time.sleep(self.token_interval_s)
+            token = word if i == 0 else " " + word
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def isolate(workdir):
+    """Send every store the benchmarks write to into `workdir`, so runs start cold and leave the app's data alone."""
+    stores = {
+        "USER_DB_PATH": "user_data.db",
+        "EMBEDDING_CACHE_PATH": "embedding_cache.db",
+        "INDEX_STORE_DIR": "index_store",
+        "VIDEO_STORE_DIR": "video_store",
+        "LIBRARY_DIR": os.path.join("index_store", "library"),
+    }
+    Path(workdir).mkdir(parents=True, exist_ok=True)
+    for name, relative in stores.items():
+        os.environ[name] = str(Path(workdir) / relative)
+
+
+def install_fakes(llm_latency_s=0.2, embedding_latency_s=0.0):
+    """Point the read_env registry's LLM and embedding clients at the local stand-ins."""
+    import read_env
+    from embedding_cache import CachedEmbeddings, CachedLlamaEmbedding
+    from llama_index.core.llms import MockLLM
+
+    fakes = {name: (lambda: CannedChatModel(latency_s=llm_latency_s))
+             for name in read_env.MODEL_FACTORIES if name.startswith("LLM_MODEL")}
+    # Wrapped in the embedding caches like the real clients, so cache overhead is measured too
+    fakes["EMBEDDINGS_MODEL"] = lambda: CachedEmbeddings(HashEmbeddings(latency_s=embedding_latency_s))
+    fakes["VIDEO_EMBED_MODEL"] = lambda: CachedLlamaEmbedding(HashLlamaEmbedding(latency_s=embedding_latency_s))
+    fakes["VIDEO_LLM"] = MockLLM
+    read_env.MODEL_FACTORIES.update(fakes)
+    read_env._models.clear()
+
+
+# ---------- Benchmarks ----------
+def percentiles(samples_s):
+    ms = np.asarray(samples_s, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"n": 0}
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def bench_pdf_ingestion(pdf_dir):
+    """
+    Ingest every PDF of `pdf_dir` into a cold index store, then load each back from it.
+
+    Returns:
+        (dict, list): Per-file and total throughput, and the completed ingestion jobs.
+    """
+    from read_env import get_model
+    from ingestion import get_extract_pool, load_or_ingest
+    from vector_backends import index_info
+
+    embeddings = get_model("EMBEDDINGS_MODEL")
+    # Start the extraction processes up front so the first file is not charged for them
+    start = time.perf_counter()
+    get_extract_pool().submit(os.getpid).result()
+    pool_start_s = time.perf_counter() - start
+
+    files, jobs = {}, []
+    for path in sorted(Path(pdf_dir).glob("*.pdf")):
+        start = time.perf_counter()
+        job = load_or_ingest(str(path), embeddings, chunk_size=1000, chunk_overlap=0, cache=False)
+        seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        load_or_ingest(str(path), embeddings, chunk_size=1000, chunk_overlap=0, cache=False)
+        reload_s = time.perf_counter() - start
+
+        progress = job.progress()
+        files[path.name] = {
+            "pages": progress["pages_total"],
+            "chunks": progress["chunks_indexed"],
+            "seconds": seconds,
+            "first_batch_s": progress["first_batch_s"],
+            "pages_per_s": progress["pages_total"] / seconds,
+            "chunks_per_s": progress["chunks_indexed"] / seconds,
+            "reload_s": reload_s,
+            "index": index_info(job.vectorstore.index),
+        }
+        jobs.append(job)
+
+    seconds = sum(f["seconds"] for f in files.values())
+    pages = sum(f["pages"] for f in files.values())
+    chunks = sum(f["chunks"] for f in files.values())
+    return {
+        "extract_pool_start_s": pool_start_s,
+        "files": files,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": seconds,
+        "pages_per_s": pages / seconds if seconds else None,
+        "chunks_per_s": chunks / seconds if seconds else None,
+    }, jobs
+
+
+def bench_video_indexing(data_dir):
+    """
+    Index a folder of extracted frames plus a transcript (the layout of `mixed_data/`)
+    the way `videoChatbot` indexes a processed video, then persist and reload it.
+
+    Returns:
+        (dict, Path, VectorStoreIndex): Stage timings, the artifact folder and the index.
+    """
+    from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
+    from read_env import get_model
+    from video_store import (VIDEO_STORE_DIR, FRAMES_DIR, TRANSCRIPT_FILE, document_metadata, frame_files,
+                             load_video_index, save_video_index, video_index_nbytes)
+
+    embed_model = get_model("VIDEO_EMBED_MODEL")
+    artifact_dir = Path(VIDEO_STORE_DIR) / Path(data_dir).name
+    (artifact_dir / FRAMES_DIR).mkdir(parents=True, exist_ok=True)
+    for frame in Path(data_dir).glob("*.png"):
+        shutil.copy(frame, artifact_dir / FRAMES_DIR / frame.name)
+    transcripts = sorted(Path(data_dir).glob("*.txt"))
+    if transcripts:
+        shutil.copy(transcripts[0], artifact_dir / TRANSCRIPT_FILE)
+    input_files = frame_files(artifact_dir) + ([str(artifact_dir / TRANSCRIPT_FILE)] if transcripts else [])
+
+    timings = {}
+    start = time.perf_counter()
+    documents = SimpleDirectoryReader(input_files=input_files, file_metadata=document_metadata(artifact_dir)).load_data()
+    timings["load_documents_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = VectorStoreIndex.from_documents(documents, embed_model=embed_model)
+    timings["index_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    save_video_index(artifact_dir, index, embed_model)
+    timings["persist_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_video_index(artifact_dir, embed_model)
+    timings["reload_s"] = time.perf_counter() - start
+
+    return {
+        "frames": len(input_files) - len(transcripts),
+        "documents": len(documents),
+        "nodes": len(index.docstore.docs),
+        "nodes_per_s": len(index.docstore.docs) / timings["index_s"] if timings["index_s"] else None,
+        "resident_bytes": video_index_nbytes(index),
+        **timings,
+    }, artifact_dir, index
+
+
+def sample_queries(texts, n, rng, words=8):
+    """Deterministic queries: runs of `words` consecutive words taken from random chunks."""
+    queries = []
+    candidates = [text.split() for text in texts if len(text.split()) >= words]
+    for _ in range(n if candidates else 0):
+        tokens = rng.choice(candidates)
+        first = rng.randrange(len(tokens) - words + 1)
+        queries.append(" ".join(tokens[first:first + words]))
+    return queries
+
+
+def bench_retrieval(jobs, artifact_dir, video_index, n_queries=200, n_answers=10, k=4, seed=0):
+    """
+    Retrieval latency percentiles of every search path: a document's hybrid index, the
+    library (unfiltered and filtered to one source), the video index, and end-to-end
+    streamed answers through the token-budgeted QA chain with the stand-in LLM.
+    """
+    from answer_stream import AnswerStream
+    from context_builder import CONTEXT_CANDIDATES, BudgetedQA
+    from library_index import LibraryIndex
+    from read_env import get_model
+
+    rng = random.Random(seed)
+    results = {}
+
+    def timed(search, queries):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            samples.append(time.perf_counter() - start)
+        return percentiles(samples)
+
+    library = LibraryIndex(get_model("EMBEDDINGS_MODEL"))
+    start = time.perf_counter()
+    for job in jobs:
+        library.add_vectorstore(job.file_path, job.vectorstore, job.key)
+    if artifact_dir is not None:
+        library.add_video(artifact_dir)
+    results["library_build_s"] = time.perf_counter() - start
+    results["library"] = library.stats()
+
+    per_job = max(1, n_queries // max(len(jobs), 1))
+    document_queries = []
+    for job in jobs:
+        docstore = job.vectorstore.docstore
+        texts = [docstore.search(doc_id).page_content for doc_id in job.vectorstore.index_to_docstore_id.values()]
+        queries = sample_queries(texts, per_job, rng)
+        document_queries.extend((job, query) for query in queries)
+
+    if document_queries:
+        samples = []
+        for job, query in document_queries:
+            start = time.perf_counter()
+            job.similarity_search(query, k)
+            samples.append(time.perf_counter() - start)
+        results["document_hybrid"] = percentiles(samples)
+
+        queries = [query for _, query in document_queries]
+        results["library_all"] = timed(lambda query: library.search(query, k), queries)
+        samples = []
+        for job, query in document_queries:
+            start = time.perf_counter()
+            library.search(query, k, source=os.path.basename(job.file_path))
+            samples.append(time.perf_counter() - start)
+        results["library_one_source"] = percentiles(samples)
+
+    if video_index is not None:
+        texts = [node.get_content() for node in video_index.docstore.docs.values()]
+        retriever = video_index.as_retriever(similarity_top_k=k)
+        results["video"] = timed(retriever.retrieve, sample_queries(texts, n_queries, rng))
+
+    if document_queries and n_answers:
+        qa = BudgetedQA(llm=get_model("LLM_MODEL_GPT3_STREAMING"),
+                        retriever=library.as_retriever(k=max(k, CONTEXT_CANDIDATES)), k=k)
+        first_token, total = [], []
+        for _, query in rng.sample(document_queries, min(n_answers, len(document_queries))):
+            stream = AnswerStream(qa, query)
+            for _ in stream.tokens():
+                pass
+            first_token.append(stream.first_token_s)
+            total.append(stream.total_s)
+        results["answer_first_token"] = percentiles(first_token)
+        results["answer_total"] = percentiles(total)
+    return results
+
+
+def synthetic_profile(i, rng):
+    levels = ["Beginner", "Intermediate", "Advanced"]
+    subjects = ["Python", "SQL", "Machine Learning", "Statistics", "Docker", "Kubernetes", "React", "Spark"]
+    return {
+        "name": f"Benchmark User {i:06d}",
+        "email": f"user{i:06d}@example.com",
+        "age": rng.randint(18, 65),
+        "phone": f"+1555{i:07d}",
+        "skills": [{"name": s, "level": rng.choice(levels)} for s in rng.sample(subjects, 3)],
+        "learning_goal": {"goal": rng.choice(subjects), "desired_proficiency": rng.choice(levels)},
+        "topics_to_learn": [{"name": s, "level": rng.choice(levels)} for s in rng.sample(subjects, 3)],
+    }
+
+
+def bench_user_db(n_users=2000, n_lookups=1000, seed=0):
+    """Throughput of `save_to_db` and latency of `get_user_profile` on a synthetic user table."""
+    from user_db import init_db, save_to_db, get_user_profile
+
+    rng = random.Random(seed)
+    init_db()
+    profiles = [synthetic_profile(i, rng) for i in range(n_users)]
+
+    start = time.perf_counter()
+    for profile in profiles:
+        save_to_db(profile)
+    save_s = time.perf_counter() - start
+
+    samples = []
+    for _ in range(n_lookups):
+        name = rng.choice(profiles)["name"]
+        start = time.perf_counter()
+        get_user_profile(name)
+        samples.append(time.perf_counter() - start)
+
+    return {
+        "users": n_users,
+        "save_s": save_s,
+        "saves_per_s": n_users / save_s if save_s else None,
+        "get_user_profile": percentiles(samples),
+        "lookups_per_s": n_lookups / sum(samples) if samples else None,
+    }
+
+
+# ---------- Runs and comparisons ----------
+def _commit():
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return proc.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(suites=SUITES, pdf_dir="PDFS", video_dir="mixed_data", llm_latency_s=0.2, embedding_latency_s=0.0,
+        n_queries=200, n_answers=10, n_users=2000, seed=0, workdir=None):
+    """
+    Run the selected benchmarks against fresh stores in `workdir` with the model stand-ins.
+
+    A failing suite records its error and the others still run. Retrieval needs the
+    indexes the "pdf" and "video" suites build, so it builds them itself when they are
+    not selected.
+
+    Returns:
+        dict: Run metadata (commit, machine, settings) and the results of each suite.
+    """
+    pdf_dir, video_dir = os.path.abspath(pdf_dir), os.path.abspath(video_dir)
+    isolate(workdir or tempfile.mkdtemp(prefix="benchmark-"))
+    install_fakes(llm_latency_s, embedding_latency_s)
+
+    report = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"suites": list(suites), "pdf_dir": pdf_dir, "video_dir": video_dir,
+                     "llm_latency_s": llm_latency_s, "embedding_latency_s": embedding_latency_s,
+                     "embedding_dim": FAKE_EMBEDDING_DIM, "queries": n_queries, "answers": n_answers,
+                     "users": n_users, "seed": seed},
+        "results": {},
+    }
+    results = report["results"]
+    jobs, artifact_dir, video_index = [], None, None
+
+    def attempt(name, fn):
+        print(f"Running {name}...")
+        try:
+            return fn()
+        except Exception as e:
+            results[name] = {"error": repr(e)}
+            return None
+
+    if "pdf" in suites or "retrieval" in suites:
+        outcome = attempt("pdf", lambda: bench_pdf_ingestion(pdf_dir))
+        if outcome is not None:
+            jobs = outcome[1]
+            if "pdf" in suites:
+                results["pdf"] = outcome[0]
+    if "video" in suites or "retrieval" in suites:
+        outcome = attempt("video", lambda: bench_video_indexing(video_dir))
+        if outcome is not None:
+            _, artifact_dir, video_index = outcome
+            if "video" in suites:
+                results["video"] = outcome[0]
+    if "retrieval" in suites:
+        outcome = attempt("retrieval", lambda: bench_retrieval(jobs, artifact_dir, video_index,
+                                                               n_queries, n_answers, seed=seed))
+        if outcome is not None:
+            results["retrieval"] = outcome
+    if "db" in suites:
+        outcome = attempt("db", lambda: bench_user_db(n_users, seed=seed))
+        if outcome is not None:
+            results["db"] = outcome
+
+    from metrics import get_metrics
+    # Per-stage breakdown of everything above, from the app's own instrumentation
+    report["stages"] = get_metrics().snapshot()
+    return report
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Numeric results that changed by more than `threshold` (relative) between two reports.
+
+    Returns:
+        list: (metric, old, new, relative change) sorted by the size of the change.
+    """
+    old_values = dict(_flatten(old["results"]))
+    changes = []
+    for metric, value in _flatten(new["results"]):
+        before = old_values.get(metric)
+        if before and abs(value / before - 1) > threshold:
+            changes.append((metric, before, value, value / before - 1))
+    return sorted(changes, key=lambda change: abs(change[3]), reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks with deterministic stand-ins for the Azure models.")
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma-separated subset of " + ",".join(SUITES))
+    parser.add_argument("--pdf-dir", default="PDFS")
+    parser.add_argument("--video-dir", default="mixed_data")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds before the fake LLM's first token")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="seconds per fake embedding request")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=10)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch folder with the stores the run built")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            old_report, new_report = json.load(f_old), json.load(f_new)
+        print(f"{old_report.get('commit')} -> {new_report.get('commit')}")
+        for metric, before, after, change in compare(old_report, new_report):
+            print(f"  {metric:<55} {before:>12.4g} -> {after:>12.4g} ({change:+.0%})")
+    else:
+        workdir = tempfile.mkdtemp(prefix="benchmark-")
+        try:
+            report = run([s for s in args.suites.split(",") if s], args.pdf_dir, args.video_dir, args.llm_latency,
+                         args.embedding_latency, args.queries, args.answers, args.users, args.seed, workdir)
+        finally:
+            if args.keep:
+                print(f"Stores kept in {workdir}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        for suite, result in report["results"].items():
+            print(f"{suite}: {'failed: ' + result['error'] if 'error' in result else 'ok'}")
+        print(f"Wrote {args.output}")
@@ -0,0 +1,169 @@
+import os
+import csv
+import sys
+import json
+import time
+import uuid
+import argparse
+from itertools import islice
+
+from user_db import transaction, INSERT_USER, INSERT_SKILL, INSERT_GOAL, INSERT_TOPIC
+
+# Profiles written per transaction
+BATCH_SIZE = 5000
+
+# CSV columns holding nested structures, stored as JSON in the cell
+JSON_COLUMNS = ("skills", "learning_goal", "topics_to_learn")
+
+# SQLite caps the number of bound parameters per statement, so email lookups are chunked
+LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+def iter_profiles(path):
+    """
+    Stream profile documents from a .jsonl or .csv file.
+
+    Each document has the same shape `save_to_db` accepts. In CSV files the
+    skills, learning_goal and topics_to_learn columns hold JSON.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                for column in JSON_COLUMNS:
+                    if row.get(column):
+                        row[column] = json.loads(row[column])
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_checkpoint(checkpoint_path, source):
+    """Return how many records of `source` a previous run already committed."""
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    return checkpoint["records_done"] if checkpoint.get("source") == os.path.abspath(source) else 0
+
+
+def write_checkpoint(checkpoint_path, source, records_done):
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": os.path.abspath(source), "records_done": records_done}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _existing_emails(conn, emails):
+    found = set()
+    emails = list(emails)
+    for i in range(0, len(emails), LOOKUP_CHUNK_SIZE):
+        chunk = emails[i:i + LOOKUP_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT lower(trim(email)) FROM User WHERE lower(trim(email)) IN ({placeholders})", chunk)
+        found.update(row[0] for row in rows)
+    return found
+
+
+def bulk_save_to_db(profiles):
+    """
+    Insert a batch of profiles in one transaction with `executemany`.
+
+    Users are de-duplicated by email, both within the batch and against users already
+    in the database; profiles without an email are skipped.
+
+    Returns:
+        dict: {"inserted", "duplicates", "invalid"} counts for the batch.
+    """
+    stats = {"inserted": 0, "duplicates": 0, "invalid": 0}
+    users, skills, goals, topics = [], [], [], []
+
+    with transaction() as conn:
+        batch_emails = {normalize_email(p.get("email")) for p in profiles} - {""}
+        seen = _existing_emails(conn, batch_emails)
+
+        for data in profiles:
+            email = normalize_email(data.get("email"))
+            if not email:
+                stats["invalid"] += 1
+                continue
+            if email in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(email)
+
+            user_id = str(uuid.uuid4())
+            users.append((user_id, data.get("name"), data.get("email"), data.get("age"), data.get("phone")))
+            skills.extend((user_id, skill["name"], skill["level"]) for skill in data.get("skills") or [])
+            goal = data.get("learning_goal") or {}
+            if goal:
+                goals.append((user_id, goal["goal"], goal["desired_proficiency"]))
+            topics.extend((user_id, topic["name"], topic["level"]) for topic in data.get("topics_to_learn") or [])
+
+        conn.executemany(INSERT_USER, users)
+        conn.executemany(INSERT_SKILL, skills)
+        conn.executemany(INSERT_GOAL, goals)
+        conn.executemany(INSERT_TOPIC, topics)
+
+    stats["inserted"] = len(users)
+    return stats
+
+
+def import_profiles(path, batch_size=BATCH_SIZE, checkpoint_path=None, progress=None):
+    """
+    Bulk-load a JSONL/CSV file of profiles into user_data.db.
+
+    With `checkpoint_path`, the number of committed records is saved after every batch
+    and a re-run resumes after them. A crash between a commit and its checkpoint is
+    harmless: the re-imported profiles are dropped by the email de-duplication.
+
+    Parameters:
+        path (str): .jsonl or .csv file of profile documents.
+        batch_size (int): Profiles per transaction.
+        checkpoint_path (str): Optional checkpoint file for resumable imports.
+        progress (callable): Optional callback receiving the running stats after each batch.
+
+    Returns:
+        dict: Totals for "read", "resumed_from", "inserted", "duplicates", "invalid" and "seconds".
+    """
+    start = time.perf_counter()
+    records_done = read_checkpoint(checkpoint_path, path)
+    totals = {"read": 0, "resumed_from": records_done, "inserted": 0, "duplicates": 0, "invalid": 0}
+
+    profiles = islice(iter_profiles(path), records_done, None)
+    while True:
+        batch = list(islice(profiles, batch_size))
+        if not batch:
+            break
+        for key, value in bulk_save_to_db(batch).items():
+            totals[key] += value
+        totals["read"] += len(batch)
+        records_done += len(batch)
+        if checkpoint_path:
+            write_checkpoint(checkpoint_path, path, records_done)
+        if progress:
+            progress(totals)
+
+    totals["seconds"] = time.perf_counter() - start
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import user profiles into user_data.db")
+    parser.add_argument("path", help=".jsonl or .csv file of profile documents")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="profiles per transaction")
+    parser.add_argument("--checkpoint", help="checkpoint file; re-running with it resumes an interrupted import")
+    args = parser.parse_args()
+
+    def print_progress(stats):
+        print(f"\r{stats['read'] + stats['resumed_from']} records processed, {stats['inserted']} inserted",
+              end="", file=sys.stderr)
+
+    result = import_profiles(args.path, args.batch_size, args.checkpoint, print_progress)
+    print(file=sys.stderr)
+    print(json.dumps(result, indent=2))
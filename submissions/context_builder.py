@@ -0,0 +1,195 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from langchain.chains.base import Chain
+from langchain.schema import BaseRetriever
+from metrics import incr, span
+
+# Tokens of retrieved context allowed in one prompt before falling back to map-reduce
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+
+# Chunks of evidence per question, and how many candidates are retrieved to replace near-duplicates
+CONTEXT_K = int(os.getenv("CONTEXT_K", "4"))
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", str(3 * CONTEXT_K)))
+
+# Chunks sharing at least this fraction of their word 3-grams (Jaccard) count as duplicates
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+
+# Candidates scoring below this fraction of the best candidate's retrieval score are left
+# out; with reciprocal-rank fusion that drops chunks only one retriever ranks, and lowly
+SCORE_DROPOFF = float(os.getenv("SCORE_DROPOFF", "0.4"))
+
+# Concurrent LLM calls in the map step
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+
+# Tag of the map step's LLM runs, so streaming callbacks can leave their tokens out
+MAP_TAG = "qa-map"
+
+# Tokenizer of the gpt-35-turbo / gpt-4 family
+TOKEN_ENCODING = "cl100k_base"
+
+# LangChain's default "stuff" and "map_reduce" question-answering prompts
+STUFF_PROMPT = """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+{context}
+
+Question: {question}
+Helpful Answer:"""
+
+MAP_PROMPT = """Use the following portion of a long document to see if any of the text is relevant to answer the question.
+Return any relevant text verbatim. If nothing is relevant, return NONE.
+{context}
+Question: {question}
+Relevant text, if any:"""
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Tokens of `text` for the chat model, counted locally with tiktoken.
+
+    Falls back to ~4 characters per token when tiktoken or its encoding file is unavailable.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception:
+            _encoding = False
+    if _encoding is False:
+        return max(1, len(text) // 4)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _shingles(text, n=3):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def select_context(docs, k=CONTEXT_K, token_budget=CONTEXT_TOKEN_BUDGET, dedupe_threshold=DEDUPE_THRESHOLD,
+                   score_dropoff=SCORE_DROPOFF):
+    """
+    Pick the evidence for a question from retrieved chunks, best ranked first.
+
+    A chunk that is a near-duplicate of an earlier one (the same passage in two copies
+    of a document, overlapping transcript chunks...) is skipped, and candidates stop at
+    the first chunk whose metadata["score"] is below `score_dropoff` times the best
+    one's, so an easy question gets fewer chunks. The best `k` of the remaining
+    candidates are picked for one prompt, stopping early at the first chunk that would
+    take the total past `token_budget`; the best chunk is always picked.
+
+    Returns:
+        dict: {"docs": picked chunks, "candidates": every remaining candidate, "tokens":
+        tokens of the picked chunks, "duplicates": chunks skipped, "over_budget": whether
+        picking stopped at the budget, "fits": whether the picked chunks fit in
+        `token_budget` (False only when the best chunk alone does not)}
+    """
+    picked, candidates, candidate_shingles = [], [], []
+    tokens = duplicates = 0
+    best_score, over_budget = None, False
+    for doc in docs:
+        score = doc.metadata.get("score")
+        if score is not None:
+            if best_score is None:
+                best_score = score
+            elif score < score_dropoff * best_score:
+                break
+        shingles = _shingles(doc.page_content)
+        if any(_jaccard(shingles, other) >= dedupe_threshold for other in candidate_shingles):
+            duplicates += 1
+            continue
+        candidates.append(doc)
+        candidate_shingles.append(shingles)
+        if len(picked) >= k or over_budget:
+            continue
+        doc_tokens = count_tokens(doc.page_content)
+        if picked and tokens + doc_tokens > token_budget:
+            over_budget = True
+            continue
+        picked.append(doc)
+        tokens += doc_tokens
+    return {"docs": picked, "candidates": candidates, "tokens": tokens, "duplicates": duplicates,
+            "over_budget": over_budget, "fits": tokens <= token_budget}
+
+
+def truncate_to_budget(texts, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Keep texts in order while they fit in `token_budget`; the first one is always kept."""
+    kept, tokens = [], 0
+    for text in texts:
+        tokens += count_tokens(text)
+        if kept and tokens > token_budget:
+            break
+        kept.append(text)
+    return kept
+
+
+class BudgetedQA(Chain):
+    """
+    Retrieval QA with a token-budgeted prompt, in place of RetrievalQA(chain_type="stuff").
+
+    The retriever's candidates are deduplicated and the best `k` are stuffed into one
+    prompt when they fit in `token_budget` (see `select_context`). Otherwise every
+    deduplicated candidate is first reduced to its relevant text by parallel LLM calls
+    (map) and the answer is written from those extracts (reduce). Map calls run with
+    the caller's callbacks under the MAP_TAG tag, so a streaming caller can leave their
+    tokens out. Input "query"; outputs "result" and "source_documents".
+    """
+
+    retriever: BaseRetriever
+    llm: Any
+    k: int = CONTEXT_K
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+    dedupe_threshold: float = DEDUPE_THRESHOLD
+    map_concurrency: int = MAP_CONCURRENCY
+
+    @property
+    def input_keys(self) -> List[str]:
+        return ["query"]
+
+    @property
+    def output_keys(self) -> List[str]:
+        return ["result", "source_documents"]
+
+    def _ask(self, prompt, callbacks=None):
+        message = self.llm.invoke(prompt, config={"callbacks": callbacks})
+        return getattr(message, "content", message)
+
+    def _map(self, query, docs, callbacks=None):
+        def extract(doc):
+            with span("llm.map_call"):
+                return self._ask(MAP_PROMPT.format(context=doc.page_content, question=query), callbacks)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.map_concurrency, len(docs))),
+                                thread_name_prefix="qa-map") as executor:
+            extracts = list(executor.map(extract, docs))
+        return [text for text in extracts if text.strip() and text.strip().upper() != "NONE"]
+
+    def _call(self, inputs: Dict[str, Any], run_manager=None) -> Dict[str, Any]:
+        query = inputs["query"]
+        callbacks = run_manager.get_child() if run_manager else None
+        docs = self.retriever.invoke(query, config={"callbacks": callbacks})
+
+        context = select_context(docs, self.k, self.token_budget, self.dedupe_threshold)
+        incr("context.tokens", context["tokens"])
+        incr("context.duplicates", context["duplicates"])
+        incr("context.budget_stops", context["over_budget"])
+        sources = context["docs"]
+        if context["fits"] and not context["over_budget"]:
+            texts = [doc.page_content for doc in sources]
+        else:
+            incr("context.map_reduce")
+            sources = context["candidates"]
+            map_callbacks = run_manager.get_child(tag=MAP_TAG) if run_manager else None
+            with span("llm.map"):
+                texts = truncate_to_budget(self._map(query, sources, map_callbacks), self.token_budget)
+
+        answer = self._ask(STUFF_PROMPT.format(context="\n\n".join(texts), question=query), callbacks)
+        return {"result": answer, "source_documents": sources}
@@ -2,14 +2,9 @@ from read_env import *
 import langchain
 langchain.verbose = False
 
-# Import required LangChain modules
-from langchain.document_loaders import PyPDFLoader,Docx2txtLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.vectorstores import FAISS
-import pickle
-from langchain.chains import RetrievalQA
-from langchain.agents import Tool
+from context_builder import BudgetedQA, CONTEXT_CANDIDATES
 from QnAtool import *
+from ingestion import load_or_ingest
 
 def tutorial_agent_astool(tutorial_doc_name,query):
     '''
@@ -17,7 +12,8 @@ def tutorial_agent_astool(tutorial_doc_name,query):
     (e.g., PDFs or Word documents containing Python tutorials like those from W3Schools).
     
     The function loads the document, splits the content into manageable text chunks, 
-    builds a FAISS vectorstore using embeddings, and returns a tool capable of handling queries.
+    builds a FAISS vectorstore using embeddings (cached on disk by document hash),
+    and returns a tool capable of handling queries.
 
     Parameters:
         tutorial_doc_name (str): The name of the tutorial file (without extension) located in the "PDFS" folder.
@@ -28,28 +24,24 @@ def tutorial_agent_astool(tutorial_doc_name,query):
     file_path_pdf = rf'PDFS\{tutorial_doc_name}.pdf'
     file_path_docx = rf'PDFS\{tutorial_doc_name}.docx'
 
-    # Decide loader based on file extension
+    # Decide which file to index based on file extension
     if os.path.exists(file_path_pdf):
-        loader = PyPDFLoader(file_path_pdf)
+        file_path = file_path_pdf
     elif os.path.exists(file_path_docx):
-        loader = Docx2txtLoader(file_path_docx)
+        file_path = file_path_docx
     else:
         raise FileNotFoundError("Neither .pdf nor .docx file found for the given document name.")
-        
-    # Load and split the document into pages
-    pages = loader.load_and_split()
 
-    # Split the pages into smaller chunks to make them suitable for vector-based retrieval
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    docs = text_splitter.split_documents(pages)
-
-    # Generate vector embeddings and create a FAISS index
-    embeddings = EMBEDDINGS_MODEL
-    print("Embeddings created",embeddings)
-    retriever = FAISS.from_documents(docs, embeddings).as_retriever()
+    # Load the FAISS index from the on-disk store, or ingest the document (pages extracted
+    # in parallel, chunks embedded in batches) if it or the index settings changed.
+    # A one-shot query waits for the whole document rather than answering from part of it.
+    # The retriever fuses BM25 and vector search, skipping the query embedding for keyword lookups.
+    embeddings = get_model("EMBEDDINGS_MODEL")
+    # Extra candidates replace near-duplicate chunks in the token-budgeted prompt
+    retriever = load_or_ingest(file_path, embeddings, chunk_size=1000, chunk_overlap=0).as_retriever(k=CONTEXT_CANDIDATES)
 
     # Define the chain to process user queries
-    llm = LLM_MODEL_GPT3
-    qa = RetrievalQA.from_chain_type(llm=llm, chain_type='stuff', retriever=retriever)
-    return qa.run(query)
+    llm = get_model("LLM_MODEL_GPT3")
+    qa = BudgetedQA(llm=llm, retriever=retriever)
+    return qa.invoke({"query": query})["result"]
 
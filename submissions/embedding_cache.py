@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Any, List
+
+from langchain_core.embeddings import Embeddings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+from hash_utils import text_sha256
+
+# Local SQLite file holding every embedding computed by either pipeline
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+
+# SQLite caps the number of bound parameters per statement, so lookups are chunked
+LOOKUP_CHUNK_SIZE = 500
+
+
+def embedding_model_name(embeddings):
+    """Best-effort identifier of an embeddings client (deployment, then model name)."""
+    for attr in ("deployment", "deployment_name", "model_name", "model"):
+        value = getattr(embeddings, attr, None)
+        if value:
+            return str(value)
+    return type(embeddings).__name__
+
+
+def embedding_model_id(embeddings):
+    """
+    Name of the model behind an embeddings client, e.g. "text-embedding-ada-002".
+
+    Unlike `embedding_model_name` it ignores the deployment and looks through the cache
+    wrappers, so the LangChain and llama_index clients of one model agree on it and
+    vectors stored by one pipeline can be reused by the other.
+    """
+    inner = getattr(embeddings, "embeddings", None) or getattr(embeddings, "_embed_model", None)
+    if inner is not None:
+        return embedding_model_id(inner)
+    for attr in ("model_name", "model"):
+        value = getattr(embeddings, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return embedding_model_name(embeddings)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store keyed by (model, sha256(text)).
+
+    Vectors are stored as float32 blobs and always returned with float32 precision,
+    whether they were cached or just computed. One instance is safe to share between
+    threads and between the LangChain and llama_index wrappers below, which both key
+    it by `embedding_model_id`.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS Embedding (
+                model TEXT,
+                text_hash TEXT,
+                vector BLOB,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    def get_many(self, model, texts):
+        """Return cached vectors for `texts` (None where missing) and update the counters."""
+        hashes = [text_sha256(t) for t in texts]
+        found = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique_hashes), LOOKUP_CHUNK_SIZE):
+                chunk = unique_hashes[i:i + LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM Embedding WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+
+            vectors = [found.get(h) for h in hashes]
+            hit_count = sum(v is not None for v in vectors)
+            self.hits += hit_count
+            self.misses += len(vectors) - hit_count
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        rows = [(model, text_sha256(t), array("f", v).tobytes()) for t, v in zip(texts, vectors)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO Embedding (model, text_hash, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def embed(self, model, texts, embed_fn, batch_size=256):
+        """
+        Embed `texts`, sending only cache misses to `embed_fn`.
+
+        Misses are de-duplicated and sent in batches of `batch_size`; the new vectors are
+        written back before returning, so repeated chunks are only ever paid for once.
+        """
+        vectors = self.get_many(model, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        computed = {}
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            batch_vectors = [array("f", v) for v in embed_fn(batch)]
+            self.put_many(model, batch, batch_vectors)
+            computed.update(zip(batch, batch_vectors))
+        return [v if v is not None else computed[t].tolist() for t, v in zip(texts, vectors)]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Return the process-wide EmbeddingCache shared by both pipelines."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that serves repeated texts from the EmbeddingCache."""
+
+    def __init__(self, embeddings, cache=None, batch_size=256):
+        self.embeddings = embeddings
+        self.cache = cache or get_embedding_cache()
+        self.batch_size = batch_size
+        self.model = embedding_model_id(embeddings)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.embed(self.model, texts, self.embeddings.embed_documents, self.batch_size)
+
+    def embed_query(self, text: str) -> List[float]:
+        # Query embeddings are keyed separately since some models embed queries differently
+        return self.cache.embed(f"{self.model}:query", [text], lambda batch: [self.embeddings.embed_query(batch[0])])[0]
+
+
+class CachedLlamaEmbedding(BaseEmbedding):
+    """llama_index embedding wrapper that serves repeated texts from the EmbeddingCache."""
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _cache_batch_size: int = PrivateAttr()
+    _cache_model: str = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache = None, batch_size: int = 256, **kwargs: Any):
+        super().__init__(model_name=embed_model.model_name, embed_batch_size=embed_model.embed_batch_size, **kwargs)
+        self._embed_model = embed_model
+        self._cache = cache or get_embedding_cache()
+        self._cache_batch_size = batch_size
+        # Same key as CachedEmbeddings, so both pipelines share the vectors of one model
+        self._cache_model = embedding_model_id(embed_model)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedLlamaEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._cache.embed(f"{self._cache_model}:query", [query], lambda batch: [self._embed_model.get_query_embedding(batch[0])])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cache.embed(self._cache_model, texts, self._embed_model.get_text_embedding_batch, self._cache_batch_size)
@@ -0,0 +1,122 @@
+import os
+import json
+
+import numpy as np
+
+# Frames are decoded at this rate and compared; only keyframes are written
+SAMPLE_FPS = 1.0
+
+# Half the L1 distance between grey-level histograms (0..1) that counts as a scene change
+SCENE_THRESHOLD = 0.2
+
+# Share of thumbnail pixels whose grey level moves by more than PIXEL_DELTA that counts as a
+# scene change. A new line of text on a slide changes 1-3% of the pixels, while compression
+# noise moves levels by a few steps only, so it stays under PIXEL_DELTA
+DIFF_THRESHOLD = 0.01
+PIXEL_DELTA = 32
+
+# Keyframes whose perceptual hashes differ in at most this many of 128 bits are candidate duplicates
+HASH_DISTANCE = 10
+
+# Frames are reduced to roughly this many pixels per side before any comparison
+THUMBNAIL_SIZE = 64
+
+HISTOGRAM_BINS = 32
+
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def gray_thumbnail(frame, size=THUMBNAIL_SIZE):
+    """Cheap luminance thumbnail of an RGB frame by stride sampling (no resampling filter)."""
+    h, w = frame.shape[:2]
+    thumb = frame[::max(h // size, 1), ::max(w // size, 1)].astype(np.float32)
+    if thumb.ndim == 3:
+        thumb = thumb[..., :3] @ _LUMA
+    return thumb
+
+
+def histogram(gray, bins=HISTOGRAM_BINS):
+    hist = np.bincount((gray.astype(np.uint8) // (256 // bins)).ravel(), minlength=bins)
+    return hist / hist.sum()
+
+
+def _block_means(gray, rows, cols):
+    h, w = gray.shape
+    rows = np.linspace(0, h, rows + 1).astype(int)
+    cols = np.linspace(0, w, cols + 1).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(gray, rows[:-1], axis=0), cols[:-1], axis=1)
+    return sums / np.outer(np.diff(rows), np.diff(cols))
+
+
+def dhash(gray):
+    """
+    128-bit difference hash: horizontal gradients of an 8x9 grid of block means, then
+    vertical gradients of a 9x8 grid, so frames with only horizontal lines are told apart too.
+    """
+    horizontal = _block_means(gray, 8, 9)
+    vertical = _block_means(gray, 9, 8)
+    bits = np.concatenate([(horizontal[:, 1:] > horizontal[:, :-1]).ravel(),
+                           (vertical[1:, :] > vertical[:-1, :]).ravel()])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def changed_share(a, b, delta=PIXEL_DELTA):
+    """Share of pixels whose grey level differs by more than `delta` between two thumbnails."""
+    return float(np.mean(np.abs(a - b) > delta))
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def select_keyframes(frames, scene_threshold=SCENE_THRESHOLD, diff_threshold=DIFF_THRESHOLD,
+                     hash_distance=HASH_DISTANCE):
+    """
+    Yield the keyframes of a stream of (timestamp, frame) pairs.
+
+    A frame is a scene change when its grey-level histogram or enough of its pixels differ
+    from the last keyframe. Scene changes that look like an earlier keyframe (e.g. returning
+    to a previous slide) are dropped: their perceptual hashes are within `hash_distance`
+    bits and their pixels would not count as a scene change against that keyframe either.
+
+    Yields:
+        (timestamp, frame) for every kept keyframe, in order.
+    """
+    last_thumb = last_hist = None
+    kept = []
+    for timestamp, frame in frames:
+        thumb = gray_thumbnail(frame)
+        hist = histogram(thumb)
+        if last_thumb is not None:
+            hist_change = 0.5 * np.abs(hist - last_hist).sum()
+            if hist_change < scene_threshold and changed_share(thumb, last_thumb) < diff_threshold:
+                continue
+
+        frame_hash = dhash(thumb)
+        if any(hamming(frame_hash, h) <= hash_distance and changed_share(thumb, t) < diff_threshold
+               for h, t in kept):
+            continue
+
+        kept.append((frame_hash, thumb))
+        last_thumb, last_hist = thumb, hist
+        yield timestamp, frame
+
+
+def write_keyframes(keyframes, output_folder):
+    """
+    Save keyframes as frameNNNN.png and record their timestamps in keyframes.json.
+
+    Returns:
+        list: {"file", "timestamp"} for every written frame.
+    """
+    from PIL import Image
+
+    written = []
+    for i, (timestamp, frame) in enumerate(keyframes):
+        file_name = f"frame{i:04d}.png"
+        Image.fromarray(frame).save(os.path.join(output_folder, file_name))
+        written.append({"file": file_name, "timestamp": round(float(timestamp), 3)})
+
+    with open(os.path.join(output_folder, "keyframes.json"), "w") as f:
+        json.dump(written, f, indent=2)
+    return written
@@ -1,176 +1,262 @@
 import streamlit as st
-import sqlite3
 import os
-from videoChatbot import process_video_and_query, process_video
-from pathlib import Path
 from read_env import *
-import langchain
-from RecommendationAgent import recommendationTool
+from import_profiler import timed_import, IMPORT_TIMES
+from user_db import init_db, get_user_profile
+from index_cache import get_index_cache
+from metrics import STAGES, get_metrics, serve_metrics
+import answer_cache
 import pandas as pd
-import uuid
-import time
-langchain.verbose = False
-
-# Import required LangChain modules
-from langchain.document_loaders import PyPDFLoader,Docx2txtLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.vectorstores import FAISS
-import pickle
-from langchain.chains import RetrievalQA
-
-
-# ---------- Database Functions ----------
-def init_db():
-    conn = sqlite3.connect("user_data.db")
-    cursor = conn.cursor()
-
-    # Create tables if they don't exist
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS User (
-            id TEXT PRIMARY KEY,
-            name VARCHAR(50),
-            email NVARCHAR(50),
-            age INTEGER,
-            phone_number NVARCHAR(50)
-        );
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Skills (
-            user_id VARCHAR(50),
-            skill_name VARCHAR(100),
-            skill_proficiency VARCHAR(50),
-            FOREIGN KEY(user_id) REFERENCES User(id)
-        );
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS LearningGoal (
-            user_id VARCHAR(50),
-            goal_name VARCHAR(100),
-            goal_proficiency VARCHAR(50),
-            FOREIGN KEY(user_id) REFERENCES User(id)
-        );
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Topic (
-            user_id VARCHAR(50),
-            topic_name VARCHAR(100),
-            topic_proficiency VARCHAR(50),
-            FOREIGN KEY(user_id) REFERENCES User(id)
-        );
-    """)
-
-    conn.commit()
-    conn.close()
-
-def save_to_db(data):
-    conn = sqlite3.connect("user_data.db")
-    cursor = conn.cursor()
-
-    user_id = str(uuid.uuid4())
-
-    cursor.execute("""
-        INSERT INTO User (id, name, email, age, phone_number)
-        VALUES (?, ?, ?, ?, ?)
-    """, (user_id, data['name'], data['email'], data['age'], data['phone']))
-
-    for skill in data['skills']:
-        cursor.execute("""
-            INSERT INTO Skills (user_id, skill_name, skill_proficiency)
-            VALUES (?, ?, ?)
-        """, (user_id, skill['name'], skill['level']))
-
-    goal = data['learning_goal']
-    cursor.execute("""
-        INSERT INTO LearningGoal (user_id, goal_name, goal_proficiency)
-        VALUES (?, ?, ?)
-    """, (user_id, goal['goal'], goal['desired_proficiency']))
-
-    for topic in data['topics_to_learn']:
-        cursor.execute("""
-            INSERT INTO Topic (user_id, topic_name, topic_proficiency)
-            VALUES (?, ?, ?)
-        """, (user_id, topic['name'], topic['level']))
-
-    conn.commit()
-    conn.close()
-    
-
-
-def get_user_profile(name):
-    conn = sqlite3.connect("user_data.db")
-    cursor = conn.cursor()
-
-    # Fetch user basic info
-    cursor.execute("SELECT id, name, email, age, phone_number FROM User WHERE name = ?", (name,))
-    user_row = cursor.fetchone()
-
-    if not user_row:
-        conn.close()
-        return None
-
-    user_id, name, email, age, phone = user_row
-
-    # Fetch skills
-    cursor.execute("SELECT skill_name, skill_proficiency FROM Skills WHERE user_id = ?", (user_id,))
-    skills = [{"name": row[0], "level": row[1]} for row in cursor.fetchall()]
-
-    # Fetch learning goal
-    cursor.execute("SELECT goal_name, goal_proficiency FROM LearningGoal WHERE user_id = ?", (user_id,))
-    goal_row = cursor.fetchone()
-    learning_goal = {"goal": goal_row[0], "desired_proficiency": goal_row[1]} if goal_row else {}
-
-    # Fetch topics
-    cursor.execute("SELECT topic_name, topic_proficiency FROM Topic WHERE user_id = ?", (user_id,))
-    topics = [{"name": row[0], "level": row[1]} for row in cursor.fetchall()]
-
-    conn.close()
-
-    return {
-        "name": name,
-        "email": email,
-        "age": age,
-        "phone": phone,
-        "skills": skills,
-        "learning_goal": learning_goal,
-        "topics_to_learn": topics
-    }
+
+
+# ---------- Lazily loaded subsystems ----------
+# Streamlit re-runs this script on every interaction, so the heavy libraries behind
+# each tab (LangChain/FAISS, llama_index/moviepy/Whisper, agno) are imported on first
+# use and held as process-wide cached resources instead of at the top of the file.
+@st.cache_resource(show_spinner=False)
+def load_pdf_chat():
+    langchain = timed_import("langchain")
+    langchain.verbose = False
+    return timed_import("ingestion"), timed_import("context_builder")
+
+
+@st.cache_resource(show_spinner=False)
+def load_library():
+    library_index = timed_import("library_index")
+    library = library_index.LibraryIndex.load(get_model("EMBEDDINGS_MODEL"))
+    # Pick up documents and processed videos added since the library was last saved
+    library.sync_in_background()
+    return library
+
+
+@st.cache_resource(show_spinner=False)
+def load_ingestion_queue():
+    ingestion_queue = timed_import("ingestion_queue").get_ingestion_queue()
+    library = load_library()
+
+    def add_to_library(job):
+        # Runs in the app process once a worker has saved the document's or video's index
+        if job["status"] != "done":
+            return
+        changed = library.add_document(job["source"]) if job["kind"] == "document" else library.sync_videos()
+        if changed:
+            library.save()
+
+    ingestion_queue.add_done_callback(add_to_library)
+    ingestion_queue.resume()
+    return ingestion_queue
+
+
+@st.fragment(run_every=2)
+def ingestion_status(kind, source, library_source):
+    """
+    Queue a video (or document) for background processing and show its progress.
+
+    The job table is polled every two seconds and the page reruns once the result is in
+    the library, so the session stays responsive and the job survives a reloaded tab.
+    """
+    if load_library().has_source(library_source):
+        st.rerun()
+    ingestion_queue = load_ingestion_queue()
+    job = ingestion_queue.latest_job(kind, source)
+    if job is not None and job["status"] == "failed":
+        st.error(f"Processing {os.path.basename(source)} failed: {job['error']}")
+        if not st.button("🔁 Retry", key=f"retry_{source}"):
+            return
+        job = None
+    if job is None:
+        job = ingestion_queue.get_job(ingestion_queue.submit(kind, source))
+
+    if job["status"] == "queued":
+        st.info(f"⏳ Waiting for a free worker ({job['wait_s']:.0f}s so far)...")
+    elif job["status"] == "running":
+        st.progress(job["progress"] or 0.0,
+                    text=f"{job['message'] or 'Processing'}... ({job['run_s']:.0f}s)")
+    else:
+        st.info("Adding to the library...")
+
+
+@st.fragment(run_every=2)
+def pdf_ingestion_status(job, pdf_name):
+    """
+    Show how far a PDF being indexed in this process has got.
+
+    The page reruns once the finished index is in the library, so later questions
+    are answered (and cached) from the library like any other document.
+    """
+    if load_library().has_source(pdf_name):
+        st.rerun()
+    progress = job.progress()
+    if progress["error"] is not None:
+        st.warning(f"Indexing stopped early, answers only cover part of the PDF: {progress['error']}")
+    elif not progress["done"]:
+        st.progress(
+            progress["pages_done"] / max(progress["pages_total"], 1),
+            text=f"Indexing page {progress['pages_done']} of {progress['pages_total']} "
+                 f"({progress['chunks_indexed']} chunks) - answers use the pages indexed so far",
+        )
+    else:
+        st.info("Adding to the library...")
+
+
+def start_pdf_ingestion(file_path):
+    """
+    Index a PDF in this process and return its job once its first chunks are searchable.
+
+    IngestionJob already runs in a background thread with its own extraction processes,
+    so the chat can answer from the first embedded batches while the rest is indexed.
+    The job is shared by every session asking for the same PDF and recorded in the
+    ingestion job table, whose done callback moves it into the library.
+    """
+    job = st.session_state.ingestion_jobs.get(file_path)
+    if job is None or (job.done and job.error is not None):
+        ingestion, _ = load_pdf_chat()
+        job = ingestion.start_ingestion(file_path, get_model("EMBEDDINGS_MODEL"), chunk_size=1000, chunk_overlap=0)
+        if job.done:
+            # Already in the index store
+            load_library().add_ingested(job)
+        else:
+            load_ingestion_queue().track("document", file_path, job)
+        st.session_state.ingestion_jobs[file_path] = job
+    job.wait_ready()
+    return job
+
+
+def streaming_qa(retriever, k):
+    """Token-budgeted QA chain (see context_builder) whose LLM streams the answer to callbacks."""
+    _, context_builder = load_pdf_chat()
+    return context_builder.BudgetedQA(llm=get_model("LLM_MODEL_GPT3_STREAMING"), retriever=retriever, k=k)
+
+
+def stream_answer(qa, query):
+    """
+    Render an answer token by token and attach its sources when the stream ends.
+
+    Clicking "Stop" (or anything else) makes Streamlit rerun the script, which closes
+    the stream and aborts the generation at the next token.
+
+    Returns:
+        dict: {"answer", "sources"}.
+    """
+    stream = timed_import("answer_stream").AnswerStream(qa, query)
+    st.button("⏹ Stop", key="stop_answer")
+    streamed = st.write_stream(stream.tokens())
+    sources = [doc.metadata for doc in stream.sources]
+    show_sources(sources)
+    if stream.first_token_s is not None:
+        st.caption(f"First token after {stream.first_token_s:.1f}s, full answer after {stream.total_s:.1f}s")
+    return {"answer": stream.answer or streamed, "sources": sources}
+
+
+def ask_library(query, source=None, doc_type=None):
+    """
+    Stream the answer to a question about the library, or show the cached answer to a
+    near-identical earlier question about the same material when there is one.
+    """
+    library = load_library()
+    types = [doc_type] if isinstance(doc_type, str) else sorted(doc_type or ["all"])
+    scope = source or "library:" + ",".join(types)
+    version = library.version(source, doc_type)
+
+    def ask(question):
+        # Cache miss: stream a fresh answer, which get_or_answer then stores.
+        # Questions across many sources get more evidence; map-reduce takes over when it overflows the budget
+        _, context_builder = load_pdf_chat()
+        k = context_builder.CONTEXT_K if source else 2 * context_builder.CONTEXT_K
+        retriever = library.as_retriever(k=max(k, context_builder.CONTEXT_CANDIDATES), source=source, doc_type=doc_type)
+        result = stream_answer(streaming_qa(retriever, k), question)
+        return result["answer"], result["sources"]
+
+    try:
+        # Keyword lookups answered by BM25 alone are only cached by their exact text,
+        # so the cache does not embed questions retrieval would not embed
+        result = answer_cache.get_or_answer(scope, version, query, get_model("EMBEDDINGS_MODEL"), ask,
+                                            semantic=library.needs_embedding(query, source, doc_type))
+    except Exception as e:
+        st.error(f"Could not answer the question: {e}")
+        return
+    if result["cached"]:
+        show_answer(result)
+
+
+@st.cache_resource(show_spinner=False)
+def load_recommendation_agent():
+    return timed_import("RecommendationAgent")
+
+
+@st.cache_resource(show_spinner=False)
+def load_recommendation_executor():
+    return timed_import("recommendation_executor")
 
 # ---------- Streamlit App ----------
 # Initialize the database
 init_db()
-conn = sqlite3.connect("user_data.db")
-cursor = conn.cursor()
-user_df = pd.read_sql_query("SELECT id, name FROM User;", conn)
-user_names = user_df["name"].tolist()
-print("*****1",user_names)
-goal_query = f"SELECT goal_name, goal_proficiency FROM LearningGoal;"
-goal_df = pd.read_sql_query(goal_query, conn)
-print("*****2",goal_df)
-topic_query = f"SELECT topic_name, topic_proficiency FROM Topic;"
-topic_df = pd.read_sql_query(topic_query, conn)
-print("*****3",topic_df)
 
 if 'skills' not in st.session_state:
     st.session_state.skills = []
 if 'topics' not in st.session_state:
     st.session_state.topics = []
 
-# Global cache for index
-if "index_cache" not in st.session_state:
-    st.session_state.index_cache = {}
-
-# Dummy chatbot function using actual logic
-def dummy_chat_response(query, index):
-    return process_video_and_query(query, index)
+# PDFs this session is indexing in the app process, by path
+if "ingestion_jobs" not in st.session_state:
+    st.session_state.ingestion_jobs = {}
+
+def show_answer(result):
+    st.success(result["answer"])
+    if result["cached"]:
+        st.caption(f"⚡ Cached answer to a similar question: \"{result['question']}\"")
+    show_sources(result["sources"])
+
+def show_sources(sources):
+    for source in sources:
+        if source.get("page") is not None:
+            where = f"page {source['page'] + 1}"
+        elif source.get("timestamp") is not None:
+            where = f"at {int(source['timestamp']) // 60}:{int(source['timestamp']) % 60:02d}"
+        else:
+            where = ""
+        st.caption(f"📎 {source.get('source')} {where}")
 
 # ---- UI START ----
 st.set_page_config(layout="wide")
 # tabs = st.tabs(["Register Profiles", "Topic-Based Recommendation", "Chatbot with Resources", "Profile-Based Recommendations","My Profile"])
 # tabs = st.tabs(["My Profile", "Topic-Based Recommendation", "Chatbot with Resources", "Admin","Profile-Based Recommendations"])
-tabs = st.tabs(["My Profile", "Topic-Based Recommendation", "Chatbot with Resources"])
+tabs = st.tabs(["My Profile", "Topic-Based Recommendation", "Chatbot with Resources", "Pipeline Metrics"])
+
+# Prometheus scrape endpoint, only when METRICS_PORT is set
+serve_metrics()
+
+with st.sidebar.expander("⏱️ Startup report"):
+    if IMPORT_TIMES:
+        for module_name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True):
+            st.markdown(f"- `{module_name}`: {seconds:.2f}s")
+    else:
+        st.caption("No subsystem loaded yet.")
+    st.caption("Run `python import_profiler.py` for a per-package breakdown.")
+
+with st.sidebar.expander("🗂️ Index cache"):
+    cache_stats = get_index_cache().stats()
+    hit_rate = f"{cache_stats['hit_rate']:.0%}" if cache_stats["hit_rate"] is not None else "n/a"
+    st.markdown(f"- Hit rate: {hit_rate} ({cache_stats['hits']} hits, {cache_stats['misses']} builds, "
+                f"{cache_stats['shared']} shared)")
+    st.markdown(f"- Resident: {cache_stats['resident_bytes'] / 1024 ** 2:.1f} of "
+                f"{cache_stats['max_bytes'] / 1024 ** 2:.0f} MB: library index "
+                f"{cache_stats['pinned_bytes'] / 1024 ** 2:.1f} MB + {cache_stats['entries']} cached indexes")
+    st.markdown(f"- Evictions: {cache_stats['evictions']}")
+
+with st.sidebar.expander("💬 Answer cache"):
+    answer_stats = answer_cache.stats()
+    hit_rate = f"{answer_stats['hit_rate']:.0%}" if answer_stats["hit_rate"] is not None else "n/a"
+    st.markdown(f"- Hit rate: {hit_rate} ({answer_stats['hits']} hits, {answer_stats['misses']} misses)")
+    st.markdown(f"- Invalidated after re-indexing: {answer_stats['invalidated']}")
+
+with st.sidebar.expander("⚙️ Ingestion jobs"):
+    jobs = timed_import("ingestion_queue").list_jobs(20)
+    if jobs:
+        st.dataframe(pd.DataFrame(jobs)[["source", "status", "progress", "wait_s", "run_s", "error"]],
+                     hide_index=True)
+    else:
+        st.caption("No document or video processed in the background yet.")
 
 # ---- Tab 2: Recommendation ----
 with tabs[1]:
@@ -189,7 +275,7 @@ with tabs[1]:
         else:
             with st.spinner("Fetching recommendations..."):
                 try:
-                    recommendations = recommendationTool(topic, proficiency_level)
+                    recommendations = load_recommendation_agent().recommendationTool(topic, proficiency_level)
                     st.markdown("### 📚 Recommendations")
                     st.markdown(recommendations)
                 except Exception as e:
@@ -212,24 +298,21 @@ with tabs[2]:
     if selected_video != "-- Select --":
         st.video(os.path.join(video_folder, selected_video))
 
-        # Process the video only once and cache the index
-        if selected_video not in st.session_state.index_cache:
-            with st.spinner("🤖 Chatbot is loading... Please wait."):
-                index = process_video(selected_video)
-                st.session_state.index_cache[selected_video] = index
-                st.success("Chatbot is ready!")
+        # Process the video only once, in a worker; its transcript then lives in the shared library index
+        if not load_library().has_source(selected_video):
+            ingestion_status("video", selected_video, selected_video)
+        elif not load_library().num_chunks(selected_video):
+            st.warning("No speech was found in this video, so there is nothing to chat about.")
         else:
-            index = st.session_state.index_cache[selected_video]
             st.success("Chatbot is ready!")
 
-        st.markdown("### 🤖 Chat with Bot about this Video")
-        user_query = st.text_input("Ask a question:")
-        if st.button("Submit"):
-            if user_query.strip():
-                response = dummy_chat_response(user_query, index)
-                st.success(response)
-            else:
-                st.warning("Please enter a question.")
+            st.markdown("### 🤖 Chat with Bot about this Video")
+            user_query = st.text_input("Ask a question:")
+            if st.button("Submit"):
+                if user_query.strip():
+                    ask_library(user_query, source=selected_video)
+                else:
+                    st.warning("Please enter a question.")
 
     st.markdown("---")
 
@@ -238,36 +321,53 @@ with tabs[2]:
     selected_pdf = st.selectbox("Select a PDF to open chat", ["-- Select --"] + [pdf.replace(".pdf", "") for pdf in pdf_files])
 
     if selected_pdf != "-- Select --":
-        if selected_pdf not in st.session_state.index_cache:
-            with st.spinner("🔍 Processing PDF and setting up chatbot..."):
-                # Embed and set up retriever once
-                def prepare_pdf_retriever(doc_name):
-                    # Dummy query just to trigger full retriever return instead of immediate response
-                    file_path = f"{pdf_folder}/{doc_name}.pdf"
-                    loader = PyPDFLoader(file_path)
-                    pages = loader.load_and_split()
-                    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-                    docs = text_splitter.split_documents(pages)
-                    retriever = FAISS.from_documents(docs, EMBEDDINGS_MODEL).as_retriever()
-                    return retriever
-
-                retriever = prepare_pdf_retriever(selected_pdf)
-                qa = RetrievalQA.from_chain_type(llm=LLM_MODEL_GPT3, chain_type='stuff', retriever=retriever)
-                st.session_state.index_cache[selected_pdf] = qa
-                st.success("PDF Chatbot is ready!")
+        # Index the PDF only once; it is then a query filtered to this file on the library index
+        pdf_name = f"{selected_pdf}.pdf"
+        pdf_path = f"{pdf_folder}/{pdf_name}"
+        job = None
+        if load_library().has_source(pdf_name):
+            st.session_state.ingestion_jobs.pop(pdf_path, None)
         else:
-            qa = st.session_state.index_cache[selected_pdf]
+            with st.spinner("🔍 Processing PDF and setting up chatbot..."):
+                try:
+                    job = start_pdf_ingestion(pdf_path)
+                except Exception as e:
+                    st.error(f"Processing {pdf_name} failed: {e}")
+                    st.button("🔁 Retry", key=f"retry_{pdf_path}")
+            if job is not None:
+                pdf_ingestion_status(job, pdf_name)
+
+        if job is not None or load_library().has_source(pdf_name):
             st.success("PDF Chatbot is ready!")
 
-        st.markdown("### 🧠 Chat with Bot about this PDF")
-        pdf_query = st.text_input("Ask a question about the PDF:", key="pdf_query")
-        if st.button("Submit PDF Query"):
-            if pdf_query.strip():
-                response = qa.run(pdf_query)
-                print( "RESPONSE",response)
-                st.success(response)
-            else:
-                st.warning("Please enter a question.")
+            st.markdown("### 🧠 Chat with Bot about this PDF")
+            pdf_query = st.text_input("Ask a question about the PDF:", key="pdf_query")
+            if st.button("Submit PDF Query"):
+                if pdf_query.strip() and load_library().has_source(pdf_name):
+                    ask_library(pdf_query, source=pdf_name)
+                elif pdf_query.strip():
+                    # Still being indexed: answer from the partial index and do not cache the answer
+                    _, context_builder = load_pdf_chat()
+                    retriever = job.as_retriever(k=context_builder.CONTEXT_CANDIDATES)
+                    try:
+                        stream_answer(streaming_qa(retriever, context_builder.CONTEXT_K), pdf_query)
+                    except Exception as e:
+                        st.error(f"Could not answer the question: {e}")
+                else:
+                    st.warning("Please enter a question.")
+
+    st.markdown("---")
+
+    # ---- 📚 Whole-library Chatbot ----
+    st.subheader("📚 Ask the Whole Library")
+    library_scope = st.radio("Search in", ["All materials", "PDFs", "Videos"], horizontal=True, key="library_scope")
+    library_query = st.text_input("Ask a question across all PDFs and videos:", key="library_query")
+    if st.button("Submit Library Query"):
+        if library_query.strip():
+            doc_type = {"All materials": None, "PDFs": ("pdf", "docx"), "Videos": "video"}[library_scope]
+            ask_library(library_query, doc_type=doc_type)
+        else:
+            st.warning("Please enter a question.")
 
 with tabs[0]:
     # st.header("My Profile & Recommendations")
@@ -347,52 +447,81 @@ with tabs[0]:
     with col2:
         st.subheader("🔍 Study Material Recommendations")
 
-        conn = sqlite3.connect("user_data.db")
         try:
-            # Get user ID
-            user_df = pd.read_sql_query("SELECT id FROM User WHERE name = 'Sinegalatha B';", conn)
-            if not user_df.empty:
-                user_id = user_df["id"].values[0]
+            # Goals and topics come from the same single-query profile load as the left pane
+            rec_profile = get_user_profile("Sinegalatha B")
+            if rec_profile:
+                # Each goal/topic gets a placeholder that is filled as soon as its
+                # recommendation arrives; the agent calls run concurrently
+                rec_items = []
+                rec_slots = []
 
                 # --- Learning Goals ---
                 st.markdown("### 🎯 Learning Goals")
-                goal_df = pd.read_sql_query(f"SELECT goal_name, goal_proficiency FROM LearningGoal WHERE user_id = '{user_id}';", conn)
-                if not goal_df.empty:
-                    for _, row in goal_df.iterrows():
-                        goal_name = row["goal_name"]
-                        goal_proficiency = row["goal_proficiency"]
+                if rec_profile["learning_goals"]:
+                    for goal in rec_profile["learning_goals"]:
+                        goal_name = goal["goal"]
+                        goal_proficiency = goal["desired_proficiency"]
                         st.markdown(f"**{goal_name}** ({goal_proficiency})")
-                        with st.spinner(f"Getting resources for {goal_name}..."):
-                            try:
-                                rec = recommendationTool(goal_name, goal_proficiency)
-                                st.markdown(rec)
-                            except Exception as e:
-                                st.error(f"Error: {e}")
+                        rec_items.append((goal_name, goal_proficiency))
+                        rec_slots.append(st.empty())
                 else:
                     st.info("No learning goals found.")
 
                 # --- Topics ---
                 st.markdown("### 📚 Topics to Learn")
-                topic_df = pd.read_sql_query(f"SELECT topic_name, topic_proficiency FROM Topic WHERE user_id = '{user_id}';", conn)
-                if not topic_df.empty:
-                    for _, row in topic_df.iterrows():
-                        topic_name = row["topic_name"]
-                        topic_proficiency = row["topic_proficiency"]
+                if rec_profile["topics_to_learn"]:
+                    for topic in rec_profile["topics_to_learn"]:
+                        topic_name = topic["name"]
+                        topic_proficiency = topic["level"]
                         st.markdown(f"**{topic_name}** ({topic_proficiency})")
-                        with st.spinner(f"Getting resources for {topic_name}..."):
-                            try:
-                                rec = recommendationTool(topic_name, topic_proficiency)
-                                st.markdown(rec)
-                            except Exception as e:
-                                st.error(f"Error: {e}")
+                        rec_items.append((topic_name, topic_proficiency))
+                        rec_slots.append(st.empty())
                 else:
                     st.info("No topics found.")
+
+                for (name, _), slot in zip(rec_items, rec_slots):
+                    slot.info(f"⏳ Getting resources for {name}...")
+                for rec in load_recommendation_executor().iter_recommendations(rec_items):
+                    slot = rec_slots[rec["index"]]
+                    if rec["error"] is not None:
+                        slot.error(f"Error: {rec['error']}")
+                    else:
+                        slot.markdown(rec["content"])
             else:
                 st.warning("User Sinegalatha B not found in database.")
         except Exception as e:
             st.error(f"❌ Database error: {e}")
-        finally:
-            conn.close()
+
+# ---- Tab 4: Pipeline Metrics (admin) ----
+with tabs[3]:
+    st.header("📈 Pipeline Metrics")
+    st.caption("Time per stage since the app started, in this process and its ingestion workers. "
+               "p50/p95 cover the latest runs of each stage, max every run since start-up.")
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+    if snapshot["stages"]:
+        st.dataframe(pd.DataFrame([
+            {
+                "stage": stage,
+                "runs": s["count"],
+                "errors": s["errors"],
+                "p50 (ms)": s["p50_s"] * 1000,
+                "p95 (ms)": s["p95_s"] * 1000,
+                "max (ms)": s["max_s"] * 1000,
+                "total (s)": s["sum_s"],
+                "what": STAGES.get(stage, ""),
+            }
+            for stage, s in snapshot["stages"].items()
+        ]), hide_index=True)
+    else:
+        st.info("Nothing measured yet: ask a question or open a PDF or video.")
+    if snapshot["counters"]:
+        st.subheader("Counters")
+        st.dataframe(pd.DataFrame([{"counter": name, "value": value} for name, value in snapshot["counters"].items()]),
+                     hide_index=True)
+    st.download_button("⬇️ Prometheus", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+    st.download_button("⬇️ JSON", metrics.to_json(), file_name="metrics.json", mime="application/json")
 # with tabs[3]:  # Admin tab
 #     st.header("👨‍💼 Admin Panel")
 #     admin_view = st.radio("Select Admin Function", ["Register Profiles", "Profile-Based Recommendations"], horizontal=True)
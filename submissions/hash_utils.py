@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import hashlib
+import threading
+
+# SQLite file remembering the digests of large files, so an unchanged file is not read again
+FILE_DIGEST_CACHE_PATH = os.getenv("FILE_DIGEST_CACHE_PATH", "file_digests.db")
+
+_digest_conn = None
+_digest_lock = threading.Lock()
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    """Return the hex sha256 of a file's contents, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _digest_db():
+    # Caller holds _digest_lock
+    global _digest_conn
+    if _digest_conn is None:
+        conn = sqlite3.connect(FILE_DIGEST_CACHE_PATH, check_same_thread=False)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS FileDigest (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                sha256 TEXT
+            );
+        """)
+        conn.commit()
+        _digest_conn = conn
+    return _digest_conn
+
+
+def cached_file_sha256(file_path):
+    """
+    `file_sha256` remembered by (absolute path, size, modification time).
+
+    Reopening a multi-GB video only costs a stat; the file is read again once it has
+    been replaced or modified.
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        row = _digest_db().execute("SELECT sha256 FROM FileDigest WHERE path = ? AND size = ? AND mtime_ns = ?",
+                                   key).fetchone()
+    if row is not None:
+        return row[0]
+
+    digest = file_sha256(file_path)
+    with _digest_lock:
+        conn = _digest_db()
+        conn.execute("INSERT OR REPLACE INTO FileDigest (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                     (*key, digest))
+        conn.commit()
+    return digest
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
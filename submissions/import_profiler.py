@@ -0,0 +1,71 @@
+import re
+import sys
+import time
+import importlib
+import subprocess
+from collections import defaultdict
+
+# Seconds spent in the first import of each subsystem module in this process
+IMPORT_TIMES = {}
+
+# Subsystems the app loads on demand (see the load_* helpers in frontend.py), plus the
+# Whisper workers and vector backends the ingestion jobs pull in
+SUBSYSTEM_MODULES = ["ingestion", "library_index", "context_builder", "answer_stream", "ingestion_queue",
+                     "asr_worker", "vector_backends", "RecommendationAgent", "recommendation_executor"]
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def timed_import(name):
+    """Import a module and record how long the first import took."""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+
+def importtime_report(module, top=20):
+    """
+    Break down the cold import cost of `module` by top-level package.
+
+    Runs `python -X importtime -c "import <module>"` in a fresh interpreter, so the
+    numbers are not skewed by anything this process already imported.
+
+    Parameters:
+        module (str): Module to import, e.g. "library_index".
+        top (int): Number of packages to return.
+
+    Returns:
+        dict: {"module", "total_s", "packages": [(package, self_seconds), ...]} sorted by cost.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    per_package = defaultdict(int)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        per_package[name.split(".")[0]] += int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    packages = sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_s": total_us / 1e6,
+        "packages": [(name, us / 1e6) for name, us in packages],
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+    }
+
+
+if __name__ == "__main__":
+    for module in sys.argv[1:] or SUBSYSTEM_MODULES:
+        report = importtime_report(module)
+        print(f"\n{module}: {report['total_s']:.2f}s")
+        if report["error"]:
+            print(f"  import failed: {report['error']}")
+        for name, seconds in report["packages"]:
+            print(f"  {name:<30} {seconds:8.3f}s")
@@ -0,0 +1,144 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Memory the cached indexes may use together before the least recently used are dropped
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+class IndexCache:
+    """
+    Process-wide cache of loaded document and video indexes, shared by every session.
+
+    Concurrent misses for the same key are collapsed into a single build (single-flight).
+    Each entry is charged its estimated size and the least recently used entries are
+    evicted once the total exceeds `max_bytes`. Builds that return None are not cached.
+
+    Structures that stay resident whatever happens, like the library index, are charged
+    with `pin`: they count towards `max_bytes` and are never evicted, so the cached
+    indexes make room for them.
+    """
+
+    def __init__(self, max_bytes=INDEX_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self._resident = 0
+        self._stats = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        """Cache `value` under `key`; entries larger than the whole budget are not kept."""
+        nbytes = sys.getsizeof(value) if nbytes is None else int(nbytes)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._resident -= previous[1]
+            if nbytes > self.max_bytes - sum(self._pinned.values()):
+                return
+            self._entries[key] = (value, nbytes)
+            self._resident += nbytes
+            self._evict()
+
+    def pin(self, key, nbytes):
+        """Charge `nbytes` of memory held outside the cache under `key` (0 releases it)."""
+        with self._lock:
+            if nbytes:
+                self._pinned[key] = int(nbytes)
+            else:
+                self._pinned.pop(key, None)
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock: drop least recently used entries until everything fits
+        budget = self.max_bytes - sum(self._pinned.values())
+        while self._entries and self._resident > budget:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self._resident -= evicted_bytes
+            self._stats["evictions"] += 1
+
+    def get_or_build(self, key, build, size=None):
+        """
+        Return the cached value for `key`, building it on a miss.
+
+        Parameters:
+            key: Hashable cache key, e.g. ("document", index key).
+            build (callable): Returns the value (or None when there is nothing to cache).
+            size (callable): Estimates the value's resident size in bytes.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_leader:
+            self._stats["shared"] += 1
+            return future.result()
+
+        self._stats["misses"] += 1
+        try:
+            value = build()
+            if value is not None:
+                self.put(key, value, size(value) if size else None)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._resident -= entry[1]
+
+    def stats(self):
+        """
+        Hit rate, resident size and entry count; "shared" counts callers served by an
+        in-flight build, and "resident_bytes" includes the "pinned_bytes".
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            pinned = sum(self._pinned.values())
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else None,
+                "entries": len(self._entries),
+                "resident_bytes": self._resident + pinned,
+                "pinned_bytes": pinned,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_index_cache():
+    """Return the process-wide index cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = IndexCache()
+        return _cache
@@ -0,0 +1,88 @@
+import os
+import json
+import pickle
+import shutil
+import hashlib
+from pathlib import Path
+
+from langchain.vectorstores import FAISS
+from embedding_cache import embedding_model_name
+from hash_utils import file_sha256
+from vector_backends import read_index, write_index
+
+# Root folder for persisted vector indexes (one sub-folder per cache key)
+INDEX_STORE_DIR = os.getenv("INDEX_STORE_DIR", "index_store")
+
+DOCSTORE_FILE = "index.pkl"
+LEXICAL_FILE = "lexical.pkl"
+META_FILE = "meta.json"
+
+
+def index_key(file_path, embeddings, chunk_size, chunk_overlap):
+    """
+    Build the cache key for a document index.
+
+    The key changes whenever the file contents, the splitter settings or the
+    embedding model change, so a stale index is never served.
+    """
+    settings = {
+        "file": file_sha256(file_path),
+        "splitter": "CharacterTextSplitter",
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": embedding_model_name(embeddings),
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_index(key, embeddings, store_dir=INDEX_STORE_DIR):
+    """
+    Load a persisted vectorstore for the given key, or return None if absent.
+
+    The vectors are memory-mapped with whichever backend they were saved with and
+    wrapped in LangChain's FAISS vectorstore, which only needs the faiss.Index interface.
+    """
+    folder = Path(store_dir) / key
+    if not (folder / DOCSTORE_FILE).exists():
+        return None
+    index = read_index(folder)
+    if index is None:
+        return None
+
+    with open(folder / DOCSTORE_FILE, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def load_lexical(key, store_dir=INDEX_STORE_DIR):
+    """Load the BM25 index saved next to a FAISS index, or return None if absent."""
+    path = Path(store_dir) / key / LEXICAL_FILE
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_index(key, vectorstore, meta=None, store_dir=INDEX_STORE_DIR, lexical=None):
+    """Persist a FAISS vectorstore (and optionally its BM25 index) under the given key, replacing the folder atomically."""
+    folder = Path(store_dir) / key
+    tmp_folder = Path(store_dir) / f".{key}.tmp"
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    tmp_folder.mkdir(parents=True)
+
+    write_index(vectorstore.index, tmp_folder)
+    with open(tmp_folder / DOCSTORE_FILE, "wb") as f:
+        pickle.dump((vectorstore.docstore, vectorstore.index_to_docstore_id), f)
+    if lexical is not None:
+        with open(tmp_folder / LEXICAL_FILE, "wb") as f:
+            pickle.dump(lexical, f)
+    with open(tmp_folder / META_FILE, "w") as f:
+        json.dump(meta or {}, f, indent=2)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp_folder, folder)
@@ -0,0 +1,393 @@
+import os
+import time
+import uuid
+import atexit
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from langchain.schema import BaseRetriever, Document
+from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
+from langchain.vectorstores import FAISS
+from embedding_cache import embedding_model_name
+from index_cache import get_index_cache
+from index_store import INDEX_STORE_DIR, index_key, load_index, load_lexical, save_index
+from lexical_index import BM25Index, dense_search, reciprocal_rank_scores
+from metrics import incr, span
+from vector_backends import build_index, choose_backend, index_info, index_nbytes
+
+logger = logging.getLogger(__name__)
+
+# Processes extracting page text; pypdf is pure Python, so threads would serialise on the GIL
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+
+# Pages handed to an extraction process per task
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", "8"))
+
+# Chunks embedded and added to the index at a time; the index is queryable after the first batch
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Candidates taken from each retriever before reciprocal-rank fusion
+FUSION_DEPTH = int(os.getenv("FUSION_DEPTH", "20"))
+
+
+def _extract_pdf_pages(file_path, first, last):
+    # Extraction process: text of pages [first, last) in the shape PyPDFLoader produces
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return [(page, reader.pages[page].extract_text()) for page in range(first, last)]
+
+
+def _extract_docx(file_path):
+    import docx2txt
+
+    return [(None, docx2txt.process(file_path))]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def scored(doc, score):
+    """
+    Copy of a retrieved chunk with its retrieval score in metadata["score"].
+
+    Higher is better. The score is a BM25 or reciprocal-rank fusion score, so it only
+    compares chunks of the same result list (see `context_builder.select_context`).
+    """
+    return Document(page_content=doc.page_content, metadata={**doc.metadata, "score": score})
+
+
+def get_extract_pool():
+    """Return the process-wide page extraction pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=mp.get_context("spawn"))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def split_pages(docs, chunk_size=1000, chunk_overlap=0):
+    """
+    Split page documents into chunks ready for embedding.
+
+    Pages go through the default recursive splitter first, exactly like
+    `loader.load_and_split()` did, so the chunks match indexes built before.
+    """
+    docs = RecursiveCharacterTextSplitter().split_documents(docs)
+    return CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_documents(docs)
+
+
+class IngestionJob:
+    """
+    Background ingestion of one .pdf or .docx file into a FAISS index.
+
+    Pages are extracted in the process pool and streamed, in page order, through the
+    splitter into the index in batches of `EMBED_BATCH_SIZE` chunks. Every chunk also goes
+    into a BM25 index keyed by the same docstore ids. Searches are allowed as soon as the
+    first batch has landed and see every batch added so far. While streaming, vectors go
+    into an exact flat index; once the whole document is indexed they are moved to the
+    backend `choose_backend` picks for the corpus size, and both indexes are saved to the
+    on-disk index store.
+    """
+
+    def __init__(self, key, file_path, embeddings, chunk_size=1000, chunk_overlap=0, store_dir=INDEX_STORE_DIR):
+        self.key = key
+        self.file_path = file_path
+        self.embeddings = embeddings
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.store_dir = store_dir
+        self.vectorstore = None
+        self.lexical = BM25Index()
+        self.error = None
+        self.callback_errors = []
+        self.pages_total = 0
+        self.pages_done = 0
+        self.chunks_indexed = 0
+        self.searches = {"lexical": 0, "hybrid": 0}
+        self.started = time.perf_counter()
+        self.first_batch_s = None
+        self.finished_s = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        self._callbacks = []
+
+    @classmethod
+    def completed(cls, key, file_path, embeddings, vectorstore, lexical=None):
+        """A job for an index loaded from the store: ready and done from the start."""
+        job = cls(key, file_path, embeddings)
+        job.vectorstore = vectorstore
+        # Indexes stored before lexical search existed get their BM25 index rebuilt in memory
+        job.lexical = lexical if lexical is not None else BM25Index.from_docstore(vectorstore)
+        job.chunks_indexed = len(vectorstore.index_to_docstore_id)
+        job.first_batch_s = job.finished_s = 0.0
+        job._ready.set()
+        job._done.set()
+        return job
+
+    def add_done_callback(self, fn):
+        """Call `fn(job)` once the job is done (immediately if it already is)."""
+        with self._lock:
+            if not self.done:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.vectorstore is not None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"ingest-{os.path.basename(self.file_path)}", daemon=True).start()
+        return self
+
+    def _iter_pages(self):
+        pool = get_extract_pool()
+        if self.file_path.lower().endswith(".docx"):
+            self.pages_total = 1
+            with span("pdf.extract"):
+                pages = pool.submit(_extract_docx, self.file_path).result()
+            for _, text in pages:
+                yield [Document(page_content=text, metadata={"source": self.file_path})]
+            return
+
+        from pypdf import PdfReader
+
+        self.pages_total = len(PdfReader(self.file_path).pages)
+        starts = range(0, self.pages_total, PAGES_PER_TASK)
+        ends = [min(start + PAGES_PER_TASK, self.pages_total) for start in starts]
+        batches = pool.map(_extract_pdf_pages, [self.file_path] * len(ends), starts, ends)
+        for _ in ends:
+            # Only the time spent waiting on the extraction processes is on the ingestion path
+            with span("pdf.extract"):
+                pages = next(batches)
+            incr("pdf.pages", len(pages))
+            yield [Document(page_content=text, metadata={"source": self.file_path, "page": page})
+                   for page, text in pages]
+
+    def _add(self, chunks):
+        # Embed outside the lock so searches keep running; only the index update is exclusive
+        texts = [chunk.page_content for chunk in chunks]
+        with span("pdf.embed"):
+            vectors = self.embeddings.embed_documents(texts)
+        incr("embed.texts", len(texts))
+        incr("embed.chars", sum(len(text) for text in texts))
+        metadatas = [chunk.metadata for chunk in chunks]
+        ids = [str(uuid.uuid4()) for _ in chunks]
+        with self._lock, span("pdf.index_add"):
+            if self.vectorstore is None:
+                self.vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), self.embeddings,
+                                                         metadatas=metadatas, ids=ids)
+                self.first_batch_s = time.perf_counter() - self.started
+            else:
+                self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+            self.lexical.add(ids, texts)
+            self.chunks_indexed += len(chunks)
+        incr("pdf.chunks", len(chunks))
+        self._ready.set()
+
+    def _run(self):
+        try:
+            incr("pdf.bytes", os.path.getsize(self.file_path))
+            pending = []
+            for pages in self._iter_pages():
+                self.pages_done += len(pages)
+                with span("pdf.split"):
+                    pending.extend(split_pages(pages, self.chunk_size, self.chunk_overlap))
+                while len(pending) >= EMBED_BATCH_SIZE:
+                    self._add(pending[:EMBED_BATCH_SIZE])
+                    pending = pending[EMBED_BATCH_SIZE:]
+            if pending:
+                self._add(pending)
+            if self.vectorstore is None:
+                raise ValueError(f"No text could be extracted from {self.file_path}")
+
+            flat = self.vectorstore.index
+            if choose_backend(flat.ntotal) != "flat":
+                with span("pdf.index_build"):
+                    index = build_index(flat.reconstruct_n(0, flat.ntotal))
+                with self._lock:
+                    self.vectorstore.index = index
+
+            meta = {
+                "source": os.path.basename(self.file_path),
+                "chunk_size": self.chunk_size,
+                "chunk_overlap": self.chunk_overlap,
+                "embedding_model": embedding_model_name(self.embeddings),
+                "num_chunks": self.chunks_indexed,
+                "num_pages": self.pages_total,
+                "vector_index": index_info(self.vectorstore.index),
+            }
+            with span("pdf.save"):
+                save_index(self.key, self.vectorstore, meta, self.store_dir, lexical=self.lexical)
+            # Hand the finished index to the shared cache before leaving the running-jobs registry
+            get_index_cache().put(("document", self.key), self, self.nbytes())
+        except Exception as e:
+            incr("pdf.failed")
+            logger.exception("Ingestion of %s failed", self.file_path)
+            self.error = e
+        finally:
+            self.finished_s = time.perf_counter() - self.started
+            with _jobs_lock:
+                _jobs.pop(self.key, None)
+            with self._lock:
+                self._ready.set()
+                self._done.set()
+                callbacks, self._callbacks = self._callbacks, []
+            for fn in callbacks:
+                try:
+                    fn(self)
+                except Exception as e:
+                    incr("ingest.callback_errors")
+                    logger.exception("Ingestion callback for %s failed", self.file_path)
+                    self.callback_errors.append(e)
+
+    def wait_ready(self, timeout=None):
+        """Block until the first batch is searchable; raise if ingestion failed before that."""
+        self._ready.wait(timeout)
+        if self.vectorstore is None:
+            raise self.error or TimeoutError(f"{self.file_path} is not indexed yet")
+
+    def wait(self, timeout=None):
+        """Block until the whole document is indexed and return the vectorstore."""
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        if not self.done:
+            raise TimeoutError(f"{self.file_path} is not fully indexed yet")
+        return self.vectorstore
+
+    def similarity_search(self, query, k=4):
+        """
+        Hybrid search over whatever part of the document is indexed so far.
+
+        BM25 runs first. When its best chunk contains every keyword of the query and clearly
+        beats the runner-up, the lexical ranking is returned without embedding the query.
+        Otherwise the BM25 and dense rankings are merged with reciprocal-rank fusion.
+        """
+        with span("retrieval.document"):
+            self.wait_ready()
+            with self._lock:
+                hits = self.lexical.search(query, FUSION_DEPTH)
+            lexical_ids = [doc_id for doc_id, _, _ in hits]
+
+            if self.lexical.confident(query, hits):
+                self.searches["lexical"] += 1
+                ranked = [(doc_id, score) for doc_id, score, _ in hits[:k]]
+            else:
+                self.searches["hybrid"] += 1
+                with span("retrieval.embed_query"):
+                    embedding = self.embeddings.embed_query(query)
+                with self._lock:
+                    dense_ids = dense_search(self.vectorstore, embedding, FUSION_DEPTH)
+                ranked = reciprocal_rank_scores([lexical_ids, dense_ids])[:k]
+
+            with self._lock:
+                return [scored(self.vectorstore.docstore.search(doc_id), score) for doc_id, score in ranked]
+
+    def as_retriever(self, k=4):
+        return IngestionRetriever(job=self, k=k)
+
+    def nbytes(self):
+        """Estimated resident size: the vectors, plus chunk texts, Document objects and BM25 postings (~3x the text)."""
+        if self.vectorstore is None:
+            return 0
+        docstore = self.vectorstore.docstore
+        text = sum(len(docstore.search(doc_id).page_content) for doc_id in self.vectorstore.index_to_docstore_id.values())
+        return index_nbytes(self.vectorstore.index) + 3 * text
+
+    def progress(self):
+        """
+        Returns:
+            dict: pages_done, pages_total, chunks_indexed, ready, done, error and timings in seconds.
+        """
+        return {
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "chunks_indexed": self.chunks_indexed,
+            "searches": dict(self.searches),
+            "ready": self.ready,
+            "done": self.done,
+            "error": repr(self.error) if self.error else None,
+            "first_batch_s": self.first_batch_s,
+            "elapsed_s": self.finished_s if self.finished_s is not None else time.perf_counter() - self.started,
+        }
+
+
+class IngestionRetriever(BaseRetriever):
+    """LangChain retriever over an `IngestionJob`, safe to use while the document is still being indexed."""
+
+    job: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.job.similarity_search(query, self.k)
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def start_ingestion(file_path, embeddings, chunk_size=1000, chunk_overlap=0, store_dir=INDEX_STORE_DIR, cache=True):
+    """
+    Return an ingestion job for a .pdf or .docx file, starting one only when needed.
+
+    A document that is being ingested for another session shares that session's running
+    job. An index already in the store is returned as a completed job from the process-wide
+    index cache, so every session shares one loaded copy; concurrent loads are single-flight.
+
+    Parameters:
+        file_path (str): Path to a .pdf or .docx file.
+        embeddings: LangChain embeddings client (e.g. get_model("EMBEDDINGS_MODEL")).
+        chunk_size (int): CharacterTextSplitter chunk size.
+        chunk_overlap (int): CharacterTextSplitter chunk overlap.
+        store_dir (str): Root folder of the on-disk index store.
+        cache (bool): Keep a loaded index in the shared cache; one-off readers such as the
+            library sync pass False so they do not push out the indexes sessions are using.
+
+    Returns:
+        IngestionJob: Use `wait_ready()`/`as_retriever()` to query early, `wait()` for the full index.
+    """
+    key = index_key(file_path, embeddings, chunk_size, chunk_overlap)
+    with _jobs_lock:
+        job = _jobs.get(key)
+    if job is not None:
+        return job
+
+    def load():
+        vectorstore = load_index(key, embeddings, store_dir)
+        if vectorstore is None:
+            return None
+        return IngestionJob.completed(key, file_path, embeddings, vectorstore, load_lexical(key, store_dir))
+
+    index_cache = get_index_cache()
+    if cache:
+        job = index_cache.get_or_build(("document", key), load, size=IngestionJob.nbytes)
+    else:
+        job = index_cache.get(("document", key)) or load()
+    if job is not None:
+        return job
+
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None:
+            return job
+        job = _jobs[key] = IngestionJob(key, file_path, embeddings, chunk_size, chunk_overlap, store_dir)
+    return job.start()
+
+
+def load_or_ingest(file_path, embeddings, chunk_size=1000, chunk_overlap=0, store_dir=INDEX_STORE_DIR, cache=True):
+    """Blocking form of `start_ingestion`: return the job once the whole document is indexed."""
+    job = start_ingestion(file_path, embeddings, chunk_size, chunk_overlap, store_dir, cache)
+    job.wait()
+    return job
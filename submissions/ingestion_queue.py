@@ -0,0 +1,325 @@
+import os
+import time
+import atexit
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import get_metrics, incr
+from user_db import reader, transaction
+
+logger = logging.getLogger(__name__)
+
+# Documents and videos processed at the same time, each in its own worker process
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+
+# Seconds between the progress updates a worker writes to the job table
+PROGRESS_INTERVAL = float(os.getenv("INGEST_PROGRESS_INTERVAL", "1"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+COLUMNS = ["id", "kind", "source", "status", "progress", "message", "error", "queued_at", "started_at", "finished_at"]
+
+_table_ready = False
+
+
+def _ensure_table(conn):
+    global _table_ready
+    if _table_ready:
+        return
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS IngestionJob (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind VARCHAR(10),
+            source TEXT,
+            status VARCHAR(10),
+            progress REAL,
+            message TEXT,
+            error TEXT,
+            queued_at REAL,
+            started_at REAL,
+            finished_at REAL
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_job_source ON IngestionJob(kind, source);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_job_status ON IngestionJob(status);")
+    _table_ready = True
+
+
+def _reader():
+    # Polling reads skip the write lock; the table is created through the write connection first
+    if not _table_ready:
+        with transaction() as conn:
+            _ensure_table(conn)
+    return reader()
+
+
+def _as_job(row):
+    job = dict(zip(COLUMNS, row))
+    now = time.time()
+    job["wait_s"] = (job["started_at"] or now) - job["queued_at"]
+    job["run_s"] = (job["finished_at"] or now) - job["started_at"] if job["started_at"] else None
+    return job
+
+
+def _update(job_id, **fields):
+    with transaction() as conn:
+        _ensure_table(conn)
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        conn.execute(f"UPDATE IngestionJob SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def get_job(job_id):
+    with _reader() as conn:
+        row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM IngestionJob WHERE id = ?", (job_id,)).fetchone()
+    return _as_job(row) if row else None
+
+
+def latest_job(kind, source):
+    """The most recent job for a document or video, or None if it was never queued."""
+    with _reader() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM IngestionJob WHERE kind = ? AND source = ? ORDER BY id DESC LIMIT 1",
+            (kind, source),
+        ).fetchone()
+    return _as_job(row) if row else None
+
+
+def list_jobs(limit=50):
+    """The most recent jobs, newest first, with their wait and run times in seconds."""
+    with _reader() as conn:
+        rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM IngestionJob ORDER BY id DESC LIMIT ?",
+                            (limit,)).fetchall()
+    return [_as_job(row) for row in rows]
+
+
+def _follow(job_id, job):
+    # Write an `ingestion.IngestionJob`'s page progress to its row until it has finished;
+    # raises the job's error if it failed
+    while True:
+        try:
+            job.wait(PROGRESS_INTERVAL)
+            return
+        except TimeoutError:
+            progress = job.progress()
+            _update(job_id, progress=progress["pages_done"] / max(progress["pages_total"], 1),
+                    message=f"Indexed page {progress['pages_done']} of {progress['pages_total']} "
+                            f"({progress['chunks_indexed']} chunks)")
+
+
+# ---------- Worker processes ----------
+def _init_worker(workers):
+    # Share the cores between concurrent jobs instead of giving each job a full set of
+    # extraction and Whisper processes, and do not keep finished indexes in the worker:
+    # the app process loads them from the index store
+    share = str(max(1, (os.cpu_count() or 2) // max(workers, 1)))
+    os.environ.setdefault("EXTRACT_WORKERS", share)
+    os.environ.setdefault("ASR_WORKERS", share)
+    os.environ.setdefault("INDEX_CACHE_MAX_BYTES", "0")
+
+
+def _ingest_document(job_id, file_path):
+    from read_env import get_model
+    from ingestion import start_ingestion
+
+    # Same chunking as the library, so the library picks up the stored index as is
+    job = start_ingestion(file_path, get_model("EMBEDDINGS_MODEL"), chunk_size=1000, chunk_overlap=0, cache=False)
+    _follow(job_id, job)
+
+
+def _process_video(job_id, video_name):
+    from videoChatbot import process_video
+
+    _update(job_id, message="Extracting frames, transcribing and indexing")
+    process_video(video_name)
+
+
+RUNNERS = {"document": _ingest_document, "video": _process_video}
+
+
+def _run_job(job_id, kind, source):
+    # Worker process: run one job, record its outcome in the job table and hand the
+    # stage timings it recorded back to the app process
+    _update(job_id, status=RUNNING, started_at=time.time(), progress=0.0)
+    try:
+        RUNNERS[kind](job_id, source)
+    except Exception as e:
+        _update(job_id, status=FAILED, error=repr(e), finished_at=time.time())
+        return {"status": FAILED, "metrics": get_metrics().drain()}
+    _update(job_id, status=DONE, progress=1.0, message=None, finished_at=time.time())
+    return {"status": DONE, "metrics": get_metrics().drain()}
+
+
+# ---------- App process ----------
+class IngestionQueue:
+    """
+    Runs document ingestion and video processing in a pool of worker processes.
+
+    Jobs are rows of the IngestionJob table in user_data.db: workers write their status,
+    progress and timings there and any session can poll them, so a job outlives the
+    session (or browser tab) that queued it. Finished indexes are saved to the index and
+    video stores; `add_done_callback` hooks run in this process once a job has ended.
+
+    A document the app indexes itself, so its first chunks can be queried while the rest
+    is embedded, is recorded with `track`: it shows up in the job table like the others,
+    and if the app stops before it is done, `resume` hands it to a worker.
+    """
+
+    def __init__(self, workers=INGEST_WORKERS):
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(workers,))
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    # Job lookups read the shared table, so they see jobs queued by every session
+    get_job = staticmethod(get_job)
+    latest_job = staticmethod(latest_job)
+    list_jobs = staticmethod(list_jobs)
+
+    def add_done_callback(self, fn):
+        """Call fn(job) with the job's row (as a dict) whenever a job is done or has failed."""
+        with self._lock:
+            self._callbacks.append(fn)
+
+    def submit(self, kind, source):
+        """
+        Queue a document or video, unless it is already queued or running.
+
+        Parameters:
+            kind (str): "document" (a .pdf/.docx path) or "video" (a file name in "./Youtube videos/").
+            source (str): The path or file name.
+
+        Returns:
+            int: Id of the job.
+        """
+        if kind not in RUNNERS:
+            raise ValueError(f"Unknown ingestion job kind: {kind}")
+        with transaction() as conn:
+            _ensure_table(conn)
+            row = conn.execute(
+                "SELECT id FROM IngestionJob WHERE kind = ? AND source = ? AND status IN (?, ?) ORDER BY id DESC LIMIT 1",
+                (kind, source, QUEUED, RUNNING),
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            job_id = conn.execute(
+                "INSERT INTO IngestionJob (kind, source, status, progress, queued_at) VALUES (?, ?, ?, 0, ?)",
+                (kind, source, QUEUED, time.time()),
+            ).lastrowid
+        self._dispatch(job_id, kind, source)
+        return job_id
+
+    def track(self, kind, source, job):
+        """
+        Record a job that runs in this process in the job table.
+
+        Parameters:
+            kind (str): "document" or "video", as for `submit`.
+            source (str): The path or file name.
+            job: An `ingestion.IngestionJob` that is still running.
+
+        Returns:
+            int: Id of the job (of the existing one when the source is already queued or running).
+        """
+        if kind not in RUNNERS:
+            raise ValueError(f"Unknown ingestion job kind: {kind}")
+        with transaction() as conn:
+            _ensure_table(conn)
+            row = conn.execute(
+                "SELECT id FROM IngestionJob WHERE kind = ? AND source = ? AND status IN (?, ?) ORDER BY id DESC LIMIT 1",
+                (kind, source, QUEUED, RUNNING),
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            now = time.time()
+            job_id = conn.execute(
+                "INSERT INTO IngestionJob (kind, source, status, progress, queued_at, started_at) "
+                "VALUES (?, ?, ?, 0, ?, ?)",
+                (kind, source, RUNNING, now, now),
+            ).lastrowid
+        threading.Thread(target=self._follow_local, args=(job_id, job), name="ingest-track", daemon=True).start()
+        return job_id
+
+    def _follow_local(self, job_id, job):
+        try:
+            _follow(job_id, job)
+        except Exception as e:
+            _update(job_id, status=FAILED, error=repr(e), finished_at=time.time())
+        else:
+            _update(job_id, status=DONE, progress=1.0, message=None, finished_at=time.time())
+        self._run_callbacks(job_id)
+
+    def _dispatch(self, job_id, kind, source):
+        future = self._pool.submit(_run_job, job_id, kind, source)
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+
+    def _finished(self, job_id, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # The worker process died (e.g. out of memory) before it could record the failure
+            _update(job_id, status=FAILED, error=repr(future.exception()), finished_at=time.time())
+        else:
+            get_metrics().merge(future.result()["metrics"])
+        self._run_callbacks(job_id)
+
+    def _run_callbacks(self, job_id):
+        job = get_job(job_id)
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for fn in callbacks:
+            try:
+                fn(job)
+            except Exception:
+                incr("ingest.callback_errors")
+                logger.exception("Ingestion job callback for %s failed", job["source"])
+
+    def resume(self):
+        """
+        Re-queue the jobs an earlier app process left queued or running when it stopped.
+
+        Only one app process may own the queue; call this once after registering callbacks.
+
+        Returns:
+            int: Number of jobs re-queued.
+        """
+        with transaction() as conn:
+            _ensure_table(conn)
+            rows = conn.execute("SELECT id, kind, source FROM IngestionJob WHERE status IN (?, ?) ORDER BY id",
+                                (QUEUED, RUNNING)).fetchall()
+            conn.execute("UPDATE IngestionJob SET status = ?, progress = 0, message = NULL, started_at = NULL "
+                         "WHERE status IN (?, ?)", (QUEUED, QUEUED, RUNNING))
+        for job_id, kind, source in rows:
+            self._dispatch(job_id, kind, source)
+        return len(rows)
+
+    def stats(self):
+        """Job counts by status, and average wait and run times of the recent jobs in seconds."""
+        with _reader() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM IngestionJob GROUP BY status").fetchall())
+        recent = [job for job in list_jobs(100) if job["status"] == DONE]
+        return {
+            "workers": self.workers,
+            **{status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)},
+            "avg_wait_s": sum(job["wait_s"] for job in recent) / len(recent) if recent else None,
+            "avg_run_s": sum(job["run_s"] for job in recent) / len(recent) if recent else None,
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue():
+    """Return the process-wide ingestion queue, starting its worker pool on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestionQueue()
+            atexit.register(_queue.close)
+        return _queue
@@ -0,0 +1,130 @@
+import re
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Reciprocal-rank fusion constant; larger values flatten the weight of the top ranks
+RRF_K = 60
+
+# The lexical result alone is used when its best chunk contains every query keyword
+# and outscores the runner-up by at least this factor
+LEXICAL_MARGIN = 1.5
+
+_TOKEN = re.compile(r"[a-z0-9_+#]+")
+
+# Question words that carry no lexical signal
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me of on or show
+tell the this to use used using what when where which who why with you your
+""".split())
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def keywords(text):
+    """Distinct query terms that are worth matching."""
+    return list(dict.fromkeys(t for t in tokenize(text) if t not in STOPWORDS))
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring over document chunks.
+
+    Chunks are identified by their docstore id so lexical hits can be fused with, and
+    resolved through, the FAISS index the chunks also live in. Chunks can be added
+    incrementally while a document is being ingested.
+    """
+
+    def __init__(self):
+        self.doc_ids = []
+        self.doc_lens = []
+        self.postings = defaultdict(list)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def from_docstore(cls, vectorstore):
+        """Build the lexical index for an existing LangChain FAISS vectorstore."""
+        index = cls()
+        ids = list(vectorstore.index_to_docstore_id.values())
+        index.add(ids, [vectorstore.docstore.search(doc_id).page_content for doc_id in ids])
+        return index
+
+    def add(self, doc_ids, texts):
+        for doc_id, text in zip(doc_ids, texts):
+            position = len(self.doc_ids)
+            terms = tokenize(text)
+            self.doc_ids.append(doc_id)
+            self.doc_lens.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((position, tf))
+
+    def search(self, query, k=10, allowed=None):
+        """
+        Parameters:
+            query (str): Free-text query.
+            k (int): Number of chunks to return.
+            allowed (np.ndarray): Optional positions (insertion order) of the only chunks to consider.
+
+        Returns:
+            list: (doc_id, score, matched_terms) for the best `k` chunks, best first.
+        """
+        terms = [t for t in keywords(query) if t in self.postings]
+        if not terms or not self.doc_ids:
+            return []
+
+        n = len(self.doc_ids)
+        doc_lens = np.asarray(self.doc_lens, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lens / max(doc_lens.mean(), 1.0))
+        scores = np.zeros(n, dtype=np.float32)
+        matched = np.zeros(n, dtype=np.int32)
+        for term in terms:
+            postings = np.asarray(self.postings[term])
+            positions, tf = postings[:, 0], postings[:, 1].astype(np.float32)
+            idf = math.log(1 + (n - len(positions) + 0.5) / (len(positions) + 0.5))
+            scores[positions] += idf * tf * (BM25_K1 + 1) / (tf + norm[positions])
+            matched[positions] += 1
+        if allowed is not None:
+            mask = np.zeros(n, dtype=bool)
+            mask[allowed] = True
+            scores[~mask] = 0
+
+        top = np.argsort(-scores)[:k]
+        return [(self.doc_ids[i], float(scores[i]), int(matched[i])) for i in top if scores[i] > 0]
+
+    def confident(self, query, hits):
+        """True when the lexical hits are good enough to answer without dense retrieval."""
+        if not hits:
+            return False
+        if hits[0][2] < len(keywords(query)):
+            return False
+        return len(hits) == 1 or hits[0][1] >= LEXICAL_MARGIN * hits[1][1]
+
+
+def reciprocal_rank_scores(rankings, k=RRF_K):
+    """Fuse several ranked lists of ids into one list of (id, sum(1 / (k + rank))), best first."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse several ranked lists of ids into one, scoring each id by sum(1 / (k + rank))."""
+    return [doc_id for doc_id, _ in reciprocal_rank_scores(rankings, k)]
+
+
+def dense_search(vectorstore, embedding, k):
+    """Docstore ids of the `k` nearest chunks of a LangChain FAISS vectorstore."""
+    vector = np.asarray([embedding], dtype=np.float32)
+    _, indices = vectorstore.index.search(vector, k)
+    return [vectorstore.index_to_docstore_id[i] for i in indices[0] if i != -1]
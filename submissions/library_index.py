@@ -0,0 +1,432 @@
+import os
+import json
+import pickle
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+from langchain.schema import BaseRetriever, Document
+from embedding_cache import embedding_model_id, embedding_model_name
+from hash_utils import text_sha256
+from index_cache import get_index_cache
+from index_store import INDEX_STORE_DIR, index_key, load_index
+from ingestion import FUSION_DEPTH, load_or_ingest, scored
+from lexical_index import BM25Index, reciprocal_rank_scores
+from metrics import incr, span
+from vector_backends import (NumpyIndex, backend_name, build_index, choose_backend, index_info, index_nbytes,
+                             read_index, reconstruct_all, search_ids, write_index)
+
+# Folder of the persisted library index
+LIBRARY_DIR = os.getenv("LIBRARY_DIR", os.path.join(INDEX_STORE_DIR, "library"))
+
+# Folders scanned for .pdf/.docx documents (comma separated)
+LIBRARY_DOC_DIRS = [d for d in os.getenv("LIBRARY_DOC_DIRS", "pdfs").split(",") if d]
+
+# Superseded chunks are only dropped from the index once they are this share of it
+COMPACT_RATIO = 0.25
+
+LIBRARY_FILE = "library.pkl"
+
+logger = logging.getLogger(__name__)
+META_FILE = "meta.json"
+
+DOCUMENT_TYPES = {".pdf": "pdf", ".docx": "docx"}
+
+
+def iter_documents(doc_dirs=LIBRARY_DOC_DIRS):
+    for folder in doc_dirs:
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if Path(name).suffix.lower() in DOCUMENT_TYPES:
+                yield os.path.join(folder, name)
+
+
+def _transcript_offsets(segments):
+    # Start offset of every segment in the transcript, which joins segment texts with spaces
+    offsets, position = [], 0
+    for segment in segments or []:
+        offsets.append((position, segment["start"]))
+        position += len(segment["text"]) + 1
+    return offsets
+
+
+class LibraryIndex:
+    """
+    One index over every chunk of every PDF, DOCX and video in the library.
+
+    All chunks share a single vector index (backend chosen by corpus size) and a single
+    BM25 index; each chunk is a Document whose metadata records its "source" file name,
+    "type" ("pdf", "docx" or "video"), "page" and "timestamp" (seconds into the video).
+    Per-document chat is a search filtered to one source and library-wide questions
+    search everything, so memory grows with the number of chunks, not of documents.
+
+    Chunks of a source are stored contiguously. Re-adding a changed source appends its
+    new chunks and retires the old range until the index is compacted.
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model_name(embeddings)
+        # Deployment-independent name, comparable with the model recorded for stored video indexes
+        self.model_id = embedding_model_id(embeddings)
+        self.index = None
+        self.chunks = []
+        self.lexical = BM25Index()
+        self.sources = {}
+        self.retired = 0
+        self.searches = {"lexical": 0, "hybrid": 0}
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+
+    # ---------- Building ----------
+    def has_source(self, source):
+        return os.path.basename(source) in self.sources
+
+    def num_chunks(self, source):
+        """Live chunks of a source; 0 for a source without any text, e.g. a video without speech."""
+        info = self.sources.get(os.path.basename(source))
+        return info["end"] - info["start"] if info else 0
+
+    def add_chunks(self, source, doc_type, fingerprint, docs, vectors=None):
+        """
+        Add (or replace) the chunks of one source.
+
+        Parameters:
+            source (str): File name of the document or video.
+            doc_type (str): "pdf", "docx" or "video".
+            fingerprint (str): Changes whenever the source's content or index settings change.
+            docs (list): Documents whose metadata already holds page/timestamp.
+            vectors (np.ndarray): Their embeddings; computed with the library model if None.
+        """
+        if not docs:
+            # Still recorded, so a source without any text counts as added and is not retried
+            with self._lock:
+                previous = self.sources.get(source)
+                if previous is not None:
+                    self.retired += previous["end"] - previous["start"]
+                self.sources[source] = {"type": doc_type, "fingerprint": fingerprint,
+                                        "start": len(self.chunks), "end": len(self.chunks)}
+            return
+        texts = [doc.page_content for doc in docs]
+        if vectors is None:
+            vectors = self.embeddings.embed_documents(texts)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        with self._lock:
+            if self.index is None:
+                self.index = NumpyIndex(vectors.shape[1])
+            start = len(self.chunks)
+            positions = list(range(start, start + len(docs)))
+            self.index.add(vectors)
+            self.lexical.add(positions, texts)
+            self.chunks.extend(docs)
+            previous = self.sources.get(source)
+            if previous is not None:
+                self.retired += previous["end"] - previous["start"]
+            self.sources[source] = {"type": doc_type, "fingerprint": fingerprint,
+                                    "start": start, "end": start + len(docs)}
+
+            backend = choose_backend(self.index.ntotal)
+            if backend != backend_name(self.index):
+                self.index = build_index(reconstruct_all(self.index), backend)
+            self._charge()
+
+    def add_vectorstore(self, file_path, vectorstore, fingerprint):
+        """Copy the chunks and vectors of a document's FAISS vectorstore into the library."""
+        source = os.path.basename(file_path)
+        doc_type = DOCUMENT_TYPES.get(Path(file_path).suffix.lower(), "pdf")
+        ids = [vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal)]
+        docs = []
+        for doc_id in ids:
+            doc = vectorstore.docstore.search(doc_id)
+            metadata = {"source": source, "type": doc_type, "page": doc.metadata.get("page"), "timestamp": None}
+            docs.append(Document(page_content=doc.page_content, metadata=metadata))
+        self.add_chunks(source, doc_type, fingerprint, docs, reconstruct_all(vectorstore.index))
+
+    def add_document(self, file_path, ingest=True):
+        """
+        Bring one .pdf/.docx into the library, ingesting it first if it has no stored index.
+
+        The document is ingested without holding the sync lock, which is only taken to merge
+        the finished vectors, so other documents and videos can be added meanwhile.
+
+        Parameters:
+            file_path (str): Path of the document.
+            ingest (bool): With False, a document without a stored index is left out
+                (it is indexed when first opened) instead of being ingested now.
+
+        Returns:
+            bool: True if the library changed.
+        """
+        fingerprint = index_key(file_path, self.embeddings, 1000, 0)
+        if self.sources.get(os.path.basename(file_path), {}).get("fingerprint") == fingerprint:
+            return False
+        if ingest:
+            vectorstore = load_or_ingest(file_path, self.embeddings, chunk_size=1000, chunk_overlap=0,
+                                         cache=False).vectorstore
+        else:
+            vectorstore = load_index(fingerprint, self.embeddings)
+            if vectorstore is None:
+                return False
+
+        with self._sync_lock:
+            # Another thread may have added the same version while this one was ingesting
+            if self.sources.get(os.path.basename(file_path), {}).get("fingerprint") == fingerprint:
+                return False
+            self.add_vectorstore(file_path, vectorstore, fingerprint)
+            return True
+
+    def add_ingested(self, job):
+        """`IngestionJob.add_done_callback` hook: move a freshly ingested document into the library."""
+        if job.error is None and self.add_document(job.file_path):
+            self.save()
+
+    def add_video(self, artifact_dir):
+        """
+        Bring one processed video (transcript chunks) into the library.
+
+        Stored embeddings are reused when the video was indexed with the same model as the
+        library's embeddings (compared by `embedding_model_id`) and re-embedded (through
+        the embedding cache) otherwise. Frames carry no text to answer from and are left
+        out, so a video without speech is recorded with no chunks.
+
+        Returns:
+            bool: True if the library changed.
+        """
+        from video_store import load_video_nodes, read_manifest, read_meta
+
+        with self._sync_lock:
+            manifest = read_manifest(artifact_dir) or {}
+            video_model = read_meta(artifact_dir).get("embedding_model")
+            if video_model is None:
+                # Not indexed yet (still being processed)
+                return False
+            fingerprint = f"{Path(artifact_dir).name}:{video_model}"
+            source = manifest.get("video") or Path(artifact_dir).name
+            if self.sources.get(source, {}).get("fingerprint") == fingerprint:
+                return False
+
+            offsets = _transcript_offsets((manifest.get("transcript") or {}).get("segments"))
+            docs, vectors = [], []
+            for node, embedding in load_video_nodes(artifact_dir):
+                text = node.get_content()
+                if not text.strip():
+                    continue
+                timestamp = node.metadata.get("timestamp")
+                if timestamp is None and node.start_char_idx is not None:
+                    timestamp = next((start for offset, start in reversed(offsets)
+                                      if offset <= node.start_char_idx), None)
+                metadata = {"source": source, "type": "video", "page": None, "timestamp": timestamp}
+                docs.append(Document(page_content=text, metadata=metadata))
+                vectors.append(embedding)
+
+            if video_model != self.model_id or any(v is None for v in vectors):
+                vectors = None
+            self.add_chunks(source, "video", fingerprint, docs, vectors)
+            return True
+
+    def sync_videos(self, store_dir=None):
+        from video_store import VIDEO_STORE_DIR, list_artifact_dirs
+
+        changed = False
+        for artifact_dir in list_artifact_dirs(store_dir or VIDEO_STORE_DIR):
+            changed |= self.add_video(artifact_dir)
+        return changed
+
+    def sync(self, doc_dirs=LIBRARY_DOC_DIRS, video_store_dir=None, ingest=False):
+        """
+        Add every new or changed document and processed video, then save if anything changed.
+
+        Only documents whose index is already stored are added unless `ingest` is True; the
+        others join the library once they are opened (or ingested by a worker), so start-up
+        does not wait for every PDF in the folder to be embedded.
+        """
+        changed = False
+        for file_path in iter_documents(doc_dirs):
+            try:
+                changed |= self.add_document(file_path, ingest=ingest)
+            except Exception:
+                incr("library.add_errors")
+                logger.exception("Could not add %s to the library", file_path)
+        changed |= self.sync_videos(video_store_dir)
+        if changed:
+            self.save()
+        return changed
+
+    def sync_in_background(self, **kwargs):
+        threading.Thread(target=self.sync, kwargs=kwargs, name="library-sync", daemon=True).start()
+
+    # ---------- Searching ----------
+    def _allowed(self, source=None, doc_type=None):
+        # Positions of the live chunks matching the filters; None means "every chunk"
+        if source is None and doc_type is None and not self.retired:
+            return None
+        types = {doc_type} if isinstance(doc_type, str) else set(doc_type or ())
+        ranges = [np.arange(info["start"], info["end"]) for name, info in self.sources.items()
+                  if (source is None or name == source) and (not types or info["type"] in types)]
+        return np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+
+    def search(self, query, k=4, source=None, doc_type=None):
+        """
+        Hybrid BM25 + vector search over the library, optionally filtered by metadata.
+
+        Parameters:
+            query (str): The question.
+            k (int): Number of chunks to return.
+            source (str): Only search this document or video (file name).
+            doc_type (str or tuple): Only search these types ("pdf", "docx", "video").
+
+        Returns:
+            list: Documents with "source", "type", "page", "timestamp" and "score" metadata.
+        """
+        with span("retrieval.library"):
+            with self._lock:
+                allowed = self._allowed(source, doc_type)
+                if self.index is None or (allowed is not None and not allowed.size):
+                    return []
+                hits = self.lexical.search(query, FUSION_DEPTH, allowed)
+            lexical_ids = [position for position, _, _ in hits]
+
+            if self.lexical.confident(query, hits):
+                self.searches["lexical"] += 1
+                ranked = [(position, score) for position, score, _ in hits[:k]]
+            else:
+                self.searches["hybrid"] += 1
+                with span("retrieval.embed_query"):
+                    embedding = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+                with self._lock:
+                    if allowed is None:
+                        _, labels = self.index.search(embedding, FUSION_DEPTH)
+                    else:
+                        _, labels = search_ids(self.index, embedding, FUSION_DEPTH, allowed)
+                dense_ids = [int(i) for i in labels[0] if i != -1]
+                ranked = reciprocal_rank_scores([lexical_ids, dense_ids])[:k]
+
+            with self._lock:
+                return [scored(self.chunks[i], score) for i, score in ranked]
+
+    def needs_embedding(self, query, source=None, doc_type=None):
+        """Whether `search` would embed `query`, i.e. BM25 alone is not confident about it."""
+        with self._lock:
+            allowed = self._allowed(source, doc_type)
+            if self.index is None or (allowed is not None and not allowed.size):
+                return False
+            hits = self.lexical.search(query, FUSION_DEPTH, allowed)
+        return not self.lexical.confident(query, hits)
+
+    def version(self, source=None, doc_type=None):
+        """
+        Fingerprint of the content a query with these filters can see.
+
+        It changes whenever a matching source is added or re-indexed, so answers
+        cached against it are invalidated.
+        """
+        types = {doc_type} if isinstance(doc_type, str) else set(doc_type or ())
+        with self._lock:
+            fingerprints = sorted(f"{name}:{info['fingerprint']}" for name, info in self.sources.items()
+                                  if (source is None or name == source) and (not types or info["type"] in types))
+        return text_sha256("\n".join([self.embedding_model] + fingerprints))
+
+    def as_retriever(self, k=4, source=None, doc_type=None):
+        return LibraryRetriever(library=self, k=k, source=source, doc_type=doc_type)
+
+    def nbytes(self):
+        """Estimated resident size: the vectors, plus chunk texts, Document objects and BM25 postings (~3x the text)."""
+        with self._lock:
+            if self.index is None:
+                return 0
+            return index_nbytes(self.index) + 3 * sum(len(doc.page_content) for doc in self.chunks)
+
+    def _charge(self):
+        # The library never leaves memory; charge it to the index cache's budget so the
+        # per-document and video indexes are evicted to make room for it
+        get_index_cache().pin(("library",), self.nbytes())
+
+    def stats(self):
+        with self._lock:
+            types = {}
+            for info in self.sources.values():
+                types[info["type"]] = types.get(info["type"], 0) + 1
+            return {
+                "sources": len(self.sources),
+                "sources_by_type": types,
+                "chunks": len(self.chunks) - self.retired,
+                "retired_chunks": self.retired,
+                "vector_index": index_info(self.index) if self.index is not None else None,
+                "searches": dict(self.searches),
+            }
+
+    # ---------- Persistence ----------
+    def compact(self):
+        """Drop the chunks of replaced source versions and renumber the rest."""
+        with self._lock:
+            if not self.retired:
+                return
+            vectors = reconstruct_all(self.index)
+            keep, sources, position = [], {}, 0
+            for name, info in self.sources.items():
+                keep.extend(range(info["start"], info["end"]))
+                sources[name] = dict(info, start=position, end=position + info["end"] - info["start"])
+                position += info["end"] - info["start"]
+            self.chunks = [self.chunks[i] for i in keep]
+            self.index = build_index(vectors[keep])
+            self.lexical = BM25Index()
+            self.lexical.add(list(range(len(self.chunks))), [doc.page_content for doc in self.chunks])
+            self.sources = sources
+            self.retired = 0
+            self._charge()
+
+    def save(self, folder=LIBRARY_DIR):
+        """Persist the library atomically; compacts first if too many chunks are retired."""
+        with self._lock:
+            if self.index is None:
+                return
+            if self.retired > COMPACT_RATIO * len(self.chunks):
+                self.compact()
+            folder = Path(folder)
+            tmp_folder = folder.with_name(f".{folder.name}.tmp")
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            tmp_folder.mkdir(parents=True)
+            write_index(self.index, tmp_folder)
+            with open(tmp_folder / LIBRARY_FILE, "wb") as f:
+                pickle.dump((self.chunks, self.sources, self.retired, self.lexical), f)
+            with open(tmp_folder / META_FILE, "w") as f:
+                json.dump({"embedding_model": self.embedding_model, **self.stats()}, f, indent=2)
+            shutil.rmtree(folder, ignore_errors=True)
+            os.replace(tmp_folder, folder)
+
+    @classmethod
+    def load(cls, embeddings, folder=LIBRARY_DIR):
+        """Load the persisted library, or return an empty one if it is missing or used another embedding model."""
+        library = cls(embeddings)
+        folder = Path(folder)
+        if not (folder / META_FILE).exists() or not (folder / LIBRARY_FILE).exists():
+            return library
+        with open(folder / META_FILE) as f:
+            if json.load(f).get("embedding_model") != library.embedding_model:
+                return library
+        # Not memory-mapped: the library keeps growing as documents are added
+        index = read_index(folder, mmap=False)
+        if index is None:
+            return library
+        with open(folder / LIBRARY_FILE, "rb") as f:
+            library.chunks, library.sources, library.retired, library.lexical = pickle.load(f)
+        library.index = index
+        library._charge()
+        return library
+
+
+class LibraryRetriever(BaseRetriever):
+    """LangChain retriever over the library index, optionally filtered to one source or type."""
+
+    library: Any
+    k: int = 4
+    source: Optional[str] = None
+    doc_type: Any = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.library.search(query, self.k, self.source, self.doc_type)
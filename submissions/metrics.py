@@ -0,0 +1,244 @@
+import os
+import json
+import math
+import time
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latest durations kept per stage for the percentiles; older ones only count towards the totals
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+
+# Serve /metrics (Prometheus text) and /metrics.json on this port when set
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Prefix of the exported Prometheus metric names
+METRICS_PREFIX = "app"
+
+# Every stage that is timed, and what it covers
+STAGES = {
+    "pdf.extract": "Waiting for page text from the extraction processes (pypdf, as PyPDFLoader did)",
+    "pdf.split": "Recursive and CharacterTextSplitter splitting of extracted pages",
+    "pdf.embed": "Embedding a batch of chunks",
+    "pdf.index_add": "Adding a batch of vectors to the FAISS index and BM25",
+    "pdf.index_build": "Moving a finished document to its final vector backend",
+    "pdf.save": "Writing a document's indexes to the index store",
+    "retrieval.document": "Hybrid search over one document's index",
+    "retrieval.library": "Hybrid search over the library index",
+    "retrieval.embed_query": "Embedding a question for dense search",
+    "llm.first_token": "Question asked to first answer token (retrieval included)",
+    "llm.answer": "Question asked to complete answer (retrieval included)",
+    "llm.map": "Parallel map step of a question whose evidence exceeded the token budget",
+    "llm.map_call": "One LLM call of the map step",
+    "video.frames": "Decoding a video and writing its keyframes (video_to_images)",
+    "video.transcribe": "Transcribing a video's audio with Whisper (audio_to_text)",
+    "video.index": "Embedding a video's frames and transcript into a VectorStoreIndex",
+    "video.load": "Loading a persisted video index",
+    "video.query": "Answering a question with a video index's query engine (retrieval included)",
+    "recommendation.agent": "One agno agent call for study material recommendations",
+}
+
+# Token, byte and item counters
+COUNTERS = {
+    "pdf.bytes": "Bytes of documents ingested",
+    "pdf.pages": "Pages extracted",
+    "pdf.chunks": "Chunks indexed",
+    "pdf.failed": "Document ingestions that failed",
+    "ingest.callback_errors": "Ingestion job done callbacks that raised",
+    "embed.texts": "Texts embedded while ingesting",
+    "embed.chars": "Characters embedded while ingesting",
+    "llm.tokens": "Answer tokens streamed",
+    "llm.answer_chars": "Characters of generated answers",
+    "library.add_errors": "Documents the library sync could not add",
+    "context.tokens": "Tokens of retrieved evidence picked for prompts",
+    "context.duplicates": "Near-duplicate retrieved chunks left out of prompts",
+    "context.budget_stops": "Questions whose best chunks did not fit in the token budget",
+    "context.map_reduce": "Questions answered with map-reduce instead of one prompt",
+    "video.bytes": "Bytes of videos processed",
+    "video.keyframes": "Keyframes written",
+    "video.transcript_chars": "Characters of transcripts",
+    "video.asr_failed_segments": "Speech segments Whisper failed on (left out of transcripts)",
+    "recommendation.chars": "Characters of generated recommendations",
+}
+
+
+def _quantile(sorted_values, q):
+    # Nearest-rank quantile of an already sorted list
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class MetricsRegistry:
+    """
+    In-process registry of stage timings and counters.
+
+    Each stage keeps its count, total and longest time and errors since start-up plus
+    its latest `window` durations for the p50/p95. Timings and counters recorded in a worker
+    process are moved into the app's registry with `drain` and `merge`.
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = defaultdict(float)
+
+    def _stage(self, stage):
+        entry = self._spans.get(stage)
+        if entry is None:
+            entry = self._spans[stage] = {"count": 0, "sum_s": 0.0, "max_s": 0.0, "errors": 0,
+                                          "recent": deque(maxlen=self.window)}
+        return entry
+
+    def observe(self, stage, seconds, error=False):
+        with self._lock:
+            entry = self._stage(stage)
+            entry["count"] += 1
+            entry["sum_s"] += seconds
+            entry["max_s"] = max(entry["max_s"], seconds)
+            entry["errors"] += bool(error)
+            entry["recent"].append(seconds)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block as one occurrence of `stage`; exceptions count as errors."""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, error)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {"stages": {stage: count, errors, sum_s, mean_s, p50_s, p95_s, max_s}, "counters": {name: value}}
+        """
+        with self._lock:
+            spans = {stage: dict(entry, recent=sorted(entry["recent"])) for stage, entry in self._spans.items()}
+            counters = dict(self._counters)
+        stages = {}
+        for stage, entry in sorted(spans.items()):
+            recent = entry["recent"]
+            stages[stage] = {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "sum_s": entry["sum_s"],
+                "mean_s": entry["sum_s"] / entry["count"] if entry["count"] else None,
+                "p50_s": _quantile(recent, 0.5) if recent else None,
+                "p95_s": _quantile(recent, 0.95) if recent else None,
+                "max_s": entry["max_s"] if entry["count"] else None,
+            }
+        return {"stages": stages, "counters": dict(sorted(counters.items()))}
+
+    def drain(self):
+        """Return the raw timings and counters recorded so far and start over (for worker processes)."""
+        with self._lock:
+            raw = {
+                "spans": {stage: {"count": entry["count"], "sum_s": entry["sum_s"], "max_s": entry["max_s"],
+                                  "errors": entry["errors"], "recent": list(entry["recent"])}
+                          for stage, entry in self._spans.items()},
+                "counters": dict(self._counters),
+            }
+            self._spans.clear()
+            self._counters.clear()
+        return raw
+
+    def merge(self, raw):
+        """Add what another process's `drain` returned."""
+        with self._lock:
+            for stage, other in raw.get("spans", {}).items():
+                entry = self._stage(stage)
+                entry["count"] += other["count"]
+                entry["sum_s"] += other["sum_s"]
+                entry["max_s"] = max(entry["max_s"], other.get("max_s", max(other["recent"], default=0.0)))
+                entry["errors"] += other["errors"]
+                entry["recent"].extend(other["recent"])
+            for name, value in raw.get("counters", {}).items():
+                self._counters[name] += value
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """The registry in the Prometheus text exposition format (stages as summaries)."""
+        snapshot = self.snapshot()
+        name = f"{METRICS_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Time spent per pipeline stage.", f"# TYPE {name} summary"]
+        for stage, s in snapshot["stages"].items():
+            if s["p50_s"] is not None:
+                lines.append(f'{name}{{stage="{stage}",quantile="0.5"}} {s["p50_s"]:.6f}')
+                lines.append(f'{name}{{stage="{stage}",quantile="0.95"}} {s["p95_s"]:.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {s["sum_s"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {s["count"]}')
+
+        name = f"{METRICS_PREFIX}_stage_errors_total"
+        lines += [f"# HELP {name} Pipeline stage runs that raised.", f"# TYPE {name} counter"]
+        lines += [f'{name}{{stage="{stage}"}} {s["errors"]}' for stage, s in snapshot["stages"].items()]
+
+        name = f"{METRICS_PREFIX}_events_total"
+        lines += [f"# HELP {name} Tokens, bytes and items processed.", f"# TYPE {name} counter"]
+        lines += [f'{name}{{name="{counter}"}} {value:g}' for counter, value in snapshot["counters"].items()]
+        return "\n".join(lines) + "\n"
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+def span(stage):
+    """`with span("pdf.embed"): ...` times the block in the process-wide registry."""
+    return get_metrics().span(stage)
+
+
+def incr(name, value=1):
+    get_metrics().incr(name, value)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = get_metrics().to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = get_metrics().to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def serve_metrics(port=METRICS_PORT):
+    """Serve /metrics and /metrics.json for scrapers from a background thread (once per process)."""
+    global _server
+    with _registry_lock:
+        if _server is None and port:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
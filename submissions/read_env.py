@@ -1,5 +1,6 @@
 import os
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+import threading
+import httpx
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -10,28 +11,144 @@ AZURE_OPENAI_DEPLOYMENT = os.getenv('AZURE_OPENAI_DEPLOYMENT')
 OPENAI_API_VERSION = os.getenv('OPENAI_API_VERSION')
 LLM_MODEL_TYPE ='AZUREOPENAI'
 
-if LLM_MODEL_TYPE == 'AZUREOPENAI' :
-    LLM_MODEL_GPT3 = AzureChatOpenAI(
-        azure_deployment="XXXXXXX",
-    )
+# ---------- Shared HTTP connection pool ----------
+# Every model client sends its requests through this one keep-alive pool, so TLS
+# handshakes to the Azure endpoint are paid once per connection, not once per client.
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
 
-    LLM_MODEL_GPT3_16k = AzureChatOpenAI(
-        azure_deployment="XXXXXXX",
-    )
+_http_stats = {"requests": 0, "new_connections": 0}
+_http_stats_lock = threading.Lock()
+_http_client = None
+_http_client_lock = threading.Lock()
 
-    
-    LLM_MODEL_GPT4 = AzureChatOpenAI(
-        azure_deployment="XXXXXXX",
-    )
 
-    LLM_MODEL_GPT4O =AzureChatOpenAI(
-        azure_deployment="XXXXXXX",
-    )
+def _count_new_connection(event_name, info):
+    # httpcore only emits this event when it has to open a fresh TCP connection
+    if event_name == "connection.connect_tcp.complete":
+        with _http_stats_lock:
+            _http_stats["new_connections"] += 1
+
+
+def _on_request(request):
+    with _http_stats_lock:
+        _http_stats["requests"] += 1
+    request.extensions["trace"] = _count_new_connection
+
+
+def get_http_client():
+    """Return the process-wide keep-alive httpx client shared by all model clients."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY),
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                event_hooks={"request": [_on_request]},
+            )
+        return _http_client
+
+
+def http_pool_stats():
+    """Requests sent through the shared pool and how many of them reused a live connection."""
+    with _http_stats_lock:
+        requests = _http_stats["requests"]
+        new_connections = _http_stats["new_connections"]
+    return {
+        "requests": requests,
+        "new_connections": new_connections,
+        "reused_connections": max(requests - new_connections, 0),
+    }
+
+
+# ---------- Lazy model registry ----------
+def _azure_chat(deployment, streaming=False):
+    from langchain_openai import AzureChatOpenAI
+    return AzureChatOpenAI(azure_deployment=deployment, streaming=streaming, http_client=get_http_client())
+
 
-    LLM_MODEL_GPT4O_MINI =AzureChatOpenAI(
-        azure_deployment="XXXXXXX",
+def _azure_embeddings(deployment):
+    from langchain_openai import AzureOpenAIEmbeddings
+    from embedding_cache import CachedEmbeddings
+    # Embeddings are memoized in the local embedding cache shared with the video pipeline
+    return CachedEmbeddings(AzureOpenAIEmbeddings(azure_deployment=deployment, http_client=get_http_client()))
+
+
+def _agno_azure_chat(model_id):
+    from agno.models.azure.openai_chat import AzureOpenAI
+    return AzureOpenAI(id=model_id, api_key=AZURE_OPENAI_API_KEY, http_client=get_http_client())
+
+
+def _llama_azure_chat():
+    from llama_index.llms.azure_openai import AzureOpenAI
+    return AzureOpenAI(
+        model="gpt-35-turbo-16k",
+        deployment_name=AZURE_OPENAI_DEPLOYMENT,
+        api_key=AZURE_OPENAI_API_KEY,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        api_version=OPENAI_API_VERSION,
+        http_client=get_http_client(),
     )
 
-    EMBEDDINGS_MODEL = AzureOpenAIEmbeddings(
-            azure_deployment="XXXXXXX")
 
+def _llama_azure_embeddings():
+    from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
+    from embedding_cache import CachedLlamaEmbedding
+    # Memoized in the same embedding cache as EMBEDDINGS_MODEL
+    return CachedLlamaEmbedding(AzureOpenAIEmbedding(
+        model="text-embedding-ada-002",
+        deployment_name="supplychain-text-embedding-ada-002",
+        api_key=AZURE_OPENAI_API_KEY,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        api_version=OPENAI_API_VERSION,
+        http_client=get_http_client(),
+    ))
+
+
+if LLM_MODEL_TYPE == 'AZUREOPENAI' :
+    MODEL_FACTORIES = {
+        "LLM_MODEL_GPT3": lambda: _azure_chat("XXXXXXX"),
+        # Same deployment, emitting tokens to callbacks as they are generated
+        "LLM_MODEL_GPT3_STREAMING": lambda: _azure_chat("XXXXXXX", streaming=True),
+        "LLM_MODEL_GPT3_16k": lambda: _azure_chat("XXXXXXX"),
+        "LLM_MODEL_GPT4": lambda: _azure_chat("XXXXXXX"),
+        "LLM_MODEL_GPT4O": lambda: _azure_chat("XXXXXXX"),
+        "LLM_MODEL_GPT4O_MINI": lambda: _azure_chat("XXXXXXX"),
+        "EMBEDDINGS_MODEL": lambda: _azure_embeddings("XXXXXXX"),
+        "RECOMMENDATION_MODEL": lambda: _agno_azure_chat("XXXXXXX"),
+        # llama_index clients used by the video chat
+        "VIDEO_LLM": _llama_azure_chat,
+        "VIDEO_EMBED_MODEL": _llama_azure_embeddings,
+    }
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(name):
+    """
+    Return the process-wide instance of a model client, creating it on first use.
+
+    Parameters:
+        name (str): Registry name, e.g. "LLM_MODEL_GPT3" or "EMBEDDINGS_MODEL".
+
+    Returns:
+        The shared LangChain/agno client for that name.
+    """
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                model = MODEL_FACTORIES[name]()
+                _models[name] = model
+    return model
+
+
+def __getattr__(name):
+    # Keeps `read_env.LLM_MODEL_GPT3` working while only building the client on access
+    if name in MODEL_FACTORIES:
+        return get_model(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import Future
+
+from user_db import transaction
+
+# Cached recommendations older than this are regenerated (default: 7 days)
+CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Least recently used entries beyond this count are evicted
+CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "1000"))
+
+# Seconds a caller waits for another caller's in-flight computation of the same key
+WAIT_TIMEOUT = float(os.getenv("RECOMMENDATION_CACHE_WAIT_TIMEOUT", "120"))
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "shared": 0}
+_table_ready = False
+
+
+def _ensure_table(conn):
+    global _table_ready
+    if _table_ready:
+        return
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS RecommendationCache (
+            topic_key VARCHAR(100),
+            proficiency VARCHAR(50),
+            content TEXT,
+            created_at REAL,
+            last_used REAL,
+            PRIMARY KEY (topic_key, proficiency)
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recommendation_cache_last_used ON RecommendationCache(last_used);")
+    _table_ready = True
+
+
+def normalize_topic(topic):
+    """Normalize a topic so that "machine learning", " Machine  Learning." hit the same entry."""
+    topic = re.sub(r"\s+", " ", topic.strip().lower())
+    return topic.strip(" .,;:!?")
+
+
+def normalize_proficiency(proficiency_level):
+    return proficiency_level.strip().capitalize()
+
+
+def cache_key(topic, proficiency_level):
+    return normalize_topic(topic), normalize_proficiency(proficiency_level)
+
+
+def lookup(topic, proficiency_level):
+    """Return the cached recommendation, or None if it is missing or older than the TTL."""
+    topic_key, proficiency = cache_key(topic, proficiency_level)
+    now = time.time()
+    with transaction() as conn:
+        _ensure_table(conn)
+        row = conn.execute(
+            "SELECT content FROM RecommendationCache WHERE topic_key = ? AND proficiency = ? AND created_at > ?",
+            (topic_key, proficiency, now - CACHE_TTL),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE RecommendationCache SET last_used = ? WHERE topic_key = ? AND proficiency = ?",
+            (now, topic_key, proficiency),
+        )
+    return row[0]
+
+
+def store(topic, proficiency_level, content):
+    """Save a recommendation and evict expired and least recently used entries."""
+    topic_key, proficiency = cache_key(topic, proficiency_level)
+    now = time.time()
+    with transaction() as conn:
+        _ensure_table(conn)
+        conn.execute("""
+            INSERT OR REPLACE INTO RecommendationCache (topic_key, proficiency, content, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?)
+        """, (topic_key, proficiency, content, now, now))
+        conn.execute("DELETE FROM RecommendationCache WHERE created_at <= ?", (now - CACHE_TTL,))
+        conn.execute("""
+            DELETE FROM RecommendationCache WHERE rowid IN (
+                SELECT rowid FROM RecommendationCache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (CACHE_MAX_ENTRIES,))
+
+
+def _count(name):
+    with _inflight_lock:
+        _stats[name] += 1
+
+
+def get_or_compute(topic, proficiency_level, compute, timeout=None):
+    """
+    Return the cached recommendation for (topic, proficiency), computing it on a miss.
+
+    Concurrent requests for the same key are collapsed into a single lookup and, on a
+    miss, a single `compute()` call (single-flight); the other callers wait for and share
+    its result. Empty results (None or "") are returned but not cached.
+
+    Parameters:
+        timeout (float): Seconds to wait for another caller's computation before raising
+            TimeoutError, defaults to WAIT_TIMEOUT.
+    """
+    # The in-flight entry is registered before the lookup, so no caller can miss the
+    # cache after another caller's lookup and compute the same key a second time
+    key = cache_key(topic, proficiency_level)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[key] = future
+        else:
+            _stats["shared"] += 1
+
+    if not is_leader:
+        return future.result(timeout=WAIT_TIMEOUT if timeout is None else timeout)
+
+    try:
+        content = lookup(topic, proficiency_level)
+        if content:
+            _count("hits")
+        else:
+            _count("misses")
+            content = compute()
+            if content:
+                store(topic, proficiency_level, content)
+        future.set_result(content)
+        return content
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def clear():
+    with transaction() as conn:
+        _ensure_table(conn)
+        conn.execute("DELETE FROM RecommendationCache;")
+
+
+def stats():
+    """Hit/miss counters of this process; "shared" counts callers served by an in-flight call."""
+    with _inflight_lock:
+        return dict(_stats)
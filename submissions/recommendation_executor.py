@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# At most this many agent calls run at once for a single profile
+MAX_WORKERS = int(os.getenv("RECOMMENDATION_MAX_WORKERS", "4"))
+
+# Threads shared by every profile; timed-out calls that are still running count against it
+POOL_WORKERS = int(os.getenv("RECOMMENDATION_POOL_WORKERS", str(2 * MAX_WORKERS)))
+
+# Seconds a single recommendation may run (or wait for a free thread) before it is reported as timed out
+CALL_TIMEOUT = float(os.getenv("RECOMMENDATION_TIMEOUT", "90"))
+
+# How often pending calls are checked against their timeout
+POLL_INTERVAL = 0.5
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the process-wide pool running recommendation calls.
+
+    A call that times out cannot be interrupted and keeps its thread until the agent
+    returns, so sharing one bounded pool caps how many of them can pile up.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="recommendation")
+        return _executor
+
+
+def iter_recommendations(items, max_workers=MAX_WORKERS, timeout=CALL_TIMEOUT, recommend=None, executor=None):
+    """
+    Run recommendation calls concurrently and yield each result as soon as it finishes.
+
+    At most `max_workers` calls of `items` are submitted to the shared pool at a time.
+    A call that fails, runs for longer than `timeout` seconds, or waits longer than
+    `timeout` for a free thread is reported with an error instead of aborting the others,
+    so one slow topic never blocks the rest of the pane. Calls that have not started
+    when they time out, or when the caller stops iterating, are cancelled.
+
+    Parameters:
+        items (list): (topic, proficiency_level) pairs to get recommendations for.
+        max_workers (int): Maximum number of calls submitted at the same time.
+        timeout (float): Per-call timeout in seconds.
+        recommend (callable): Function taking (topic, proficiency_level), defaults to recommendationTool.
+        executor (Executor): Pool to run the calls on, defaults to `get_executor()`.
+
+    Yields:
+        dict: {"index", "topic", "proficiency", "content", "error", "elapsed"} in completion order,
+        where "index" is the position of the pair in `items`.
+    """
+    if not items:
+        return
+    if recommend is None:
+        from RecommendationAgent import recommendationTool as recommend
+    executor = executor or get_executor()
+
+    submitted = {}
+    started = {}
+
+    def run(index, topic, proficiency):
+        started[index] = time.monotonic()
+        return recommend(topic, proficiency)
+
+    def result(index, content=None, error=None):
+        topic, proficiency = items[index]
+        elapsed = time.monotonic() - started[index] if index in started else 0.0
+        return {"index": index, "topic": topic, "proficiency": proficiency,
+                "content": content, "error": error, "elapsed": elapsed}
+
+    queued = deque(enumerate(items))
+    pending = {}
+
+    def submit_more():
+        while queued and len(pending) < max(1, max_workers):
+            index, (topic, proficiency) = queued.popleft()
+            submitted[index] = time.monotonic()
+            pending[executor.submit(run, index, topic, proficiency)] = index
+
+    try:
+        submit_more()
+        while pending:
+            done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    yield result(index, content=future.result())
+                except Exception as e:
+                    yield result(index, error=e)
+
+            # Give up on calls running, or still waiting for a thread, for longer than the timeout;
+            # only those that have not started can actually be cancelled
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                if now - started.get(index, submitted[index]) > timeout:
+                    future.cancel()
+                    del pending[future]
+                    yield result(index, error=TimeoutError(f"No response after {timeout:.0f}s"))
+            submit_more()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,24 @@
+import os
+import sys
+import queue
+
+import pytest
+
+# The app modules live next to this folder and import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    """Point user_db at an empty database in a temporary folder."""
+    import user_db
+
+    monkeypatch.setattr(user_db, "DB_PATH", str(tmp_path / "user_data.db"))
+    monkeypatch.setattr(user_db, "_conn", None)
+    monkeypatch.setattr(user_db, "_readers", queue.LifoQueue())
+    monkeypatch.setattr(user_db, "_readers_open", 0)
+    yield user_db
+    while not user_db._readers.empty():
+        user_db._readers.get_nowait().close()
+    if user_db._conn is not None:
+        user_db._conn.close()
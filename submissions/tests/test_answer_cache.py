@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+import answer_cache
+
+
+@pytest.fixture
+def cache(user_db, monkeypatch):
+    monkeypatch.setattr(answer_cache, "_table_ready", False)
+    monkeypatch.setattr(answer_cache, "_stats", {"hits": 0, "exact_hits": 0, "misses": 0, "invalidated": 0})
+    return answer_cache
+
+
+class TableEmbeddings:
+    """Embeds the questions of a fixed table and records them."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.embedded = []
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return self.vectors[text]
+
+
+def unit(angle):
+    # 2-d unit vector; cosine between two of them is cos(angle difference)
+    return [float(np.cos(angle)), float(np.sin(angle))]
+
+
+def test_similar_question_hits_above_threshold(cache):
+    cache.store("notes.pdf", "v1", "What is pandas?", unit(0.0), "A library.", [{"page": 1}])
+
+    hit = cache.lookup("notes.pdf", "v1", unit(0.1), threshold=0.99)
+    assert hit["answer"] == "A library."
+    assert hit["sources"] == [{"page": 1}]
+    assert hit["similarity"] == pytest.approx(np.cos(0.1), abs=1e-6)
+
+    assert cache.lookup("notes.pdf", "v1", unit(0.5), threshold=0.99) is None
+
+
+def test_scopes_do_not_share_answers(cache):
+    cache.store("notes.pdf", "v1", "What is pandas?", unit(0.0), "A library.", [])
+    assert cache.lookup("other.pdf", "v1", unit(0.0)) is None
+
+
+def test_new_index_version_evicts_old_answers(cache):
+    cache.store("notes.pdf", "v1", "What is pandas?", unit(0.0), "A library.", [])
+    assert cache.lookup("notes.pdf", "v2", unit(0.0)) is None
+    assert cache.stats()["invalidated"] == 1
+    # Gone for good, not just hidden from the new version
+    assert cache.lookup("notes.pdf", "v1", unit(0.0)) is None
+
+
+def test_expired_answers_are_not_served(cache, monkeypatch):
+    cache.store("notes.pdf", "v1", "What is pandas?", unit(0.0), "A library.", [])
+    monkeypatch.setattr(answer_cache, "CACHE_TTL", 0.0)
+    assert cache.lookup("notes.pdf", "v1", unit(0.0)) is None
+
+
+def test_least_recently_used_answers_are_evicted(cache, monkeypatch):
+    monkeypatch.setattr(answer_cache, "CACHE_MAX_ENTRIES", 2)
+    cache.store("notes.pdf", "v1", "q0", unit(0.0), "a0", [])
+    cache.store("notes.pdf", "v1", "q1", unit(1.0), "a1", [])
+    assert cache.lookup("notes.pdf", "v1", unit(0.0))["answer"] == "a0"
+    cache.store("notes.pdf", "v1", "q2", unit(2.0), "a2", [])
+
+    assert cache.lookup("notes.pdf", "v1", unit(1.0)) is None
+    assert cache.lookup("notes.pdf", "v1", unit(0.0))["answer"] == "a0"
+    assert cache.lookup("notes.pdf", "v1", unit(2.0))["answer"] == "a2"
+
+
+def test_get_or_answer_asks_once(cache):
+    embeddings = TableEmbeddings({"What is pandas?": unit(0.0), "what's pandas": unit(0.01)})
+    calls = []
+
+    def ask(question):
+        calls.append(question)
+        return "A library.", [{"page": 3}]
+
+    first = cache.get_or_answer("notes.pdf", "v1", "What is pandas?", embeddings, ask)
+    second = cache.get_or_answer("notes.pdf", "v1", "what's pandas", embeddings, ask)
+
+    assert first == {"answer": "A library.", "sources": [{"page": 3}], "cached": False}
+    assert second["cached"] and second["answer"] == "A library."
+    assert second["question"] == "What is pandas?"
+    assert calls == ["What is pandas?"]
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_repeated_question_is_not_embedded(cache):
+    embeddings = TableEmbeddings({"What is pandas?": unit(0.0)})
+    ask = lambda question: ("A library.", [])
+
+    cache.get_or_answer("notes.pdf", "v1", "What is pandas?", embeddings, ask)
+    repeat = cache.get_or_answer("notes.pdf", "v1", "  what is PANDAS? ", embeddings, ask)
+
+    assert repeat["cached"] and repeat["similarity"] == 1.0
+    assert embeddings.embedded == ["What is pandas?"]
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_lexical_questions_are_cached_without_embedding(cache):
+    embeddings = TableEmbeddings({})
+    calls = []
+
+    def ask(question):
+        calls.append(question)
+        return "See page 4.", []
+
+    cache.get_or_answer("notes.pdf", "v1", "DataFrame.merge", embeddings, ask, semantic=False)
+    repeat = cache.get_or_answer("notes.pdf", "v1", "DataFrame.merge", embeddings, ask, semantic=False)
+
+    assert repeat["cached"] and calls == ["DataFrame.merge"]
+    assert embeddings.embedded == []
+    # Stored without a vector, so it never matches another question semantically
+    assert cache.lookup("notes.pdf", "v1", unit(0.0), threshold=-1.0) is None
+
+
+def test_exact_lookup_respects_index_version(cache):
+    cache.store("notes.pdf", "v1", "What is pandas?", unit(0.0), "A library.", [])
+    assert cache.lookup_exact("notes.pdf", "v2", "What is pandas?") is None
+    assert cache.stats()["invalidated"] == 1
+
+
+def test_failed_answers_are_not_cached(cache):
+    embeddings = TableEmbeddings({"What is pandas?": unit(0.0)})
+
+    def ask(question):
+        raise RuntimeError("rate limited")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_answer("notes.pdf", "v1", "What is pandas?", embeddings, ask)
+    assert cache.lookup("notes.pdf", "v1", unit(0.0)) is None
+
+
+def test_invalidate_scope(cache):
+    cache.store("notes.pdf", "v1", "q", unit(0.0), "a", [])
+    cache.store("other.pdf", "v1", "q", unit(0.0), "a", [])
+    cache.invalidate("notes.pdf")
+    assert cache.lookup("notes.pdf", "v1", unit(0.0)) is None
+    assert cache.lookup("other.pdf", "v1", unit(0.0)) is not None
@@ -0,0 +1,114 @@
+import itertools
+import queue
+import threading
+import time
+
+import pytest
+
+from asr_worker import WhisperWorkerPool
+
+_pids = itertools.count(1)
+
+
+class StubWorker:
+    """Stands in for a worker process: a thread echoing requests, or dying on "crash"."""
+
+    def __init__(self, responses, load=True):
+        self.pid = next(_pids)
+        self.exitcode = None
+        self.requests = queue.Queue()
+        self.responses = responses
+        self.load = load
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        if not self.load:
+            self.exitcode = 1
+            return
+        self.responses.put({"type": "ready", "pid": self.pid, "load_s": 0.0})
+        for request in iter(self.requests.get, None):
+            self.responses.put({"type": "start", "id": request["id"]})
+            if request["samples"] == "crash":
+                self.exitcode = -9
+                return
+            self.responses.put({"type": "result", "id": request["id"], "text": f"text of {request['samples']}",
+                                "inference_s": 0.0})
+        self.exitcode = 0
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def terminate(self):
+        pass
+
+
+class StubPool(WhisperWorkerPool):
+    def __init__(self, loads, **kwargs):
+        # One entry per spawned worker: whether it manages to load the model
+        self.loads = iter(loads)
+        super().__init__(**kwargs)
+
+    def _spawn(self):
+        worker = StubWorker(self._responses, load=next(self.loads, True))
+        return {"process": worker, "requests": worker.requests, "in_flight": set(), "ready": False}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(loads=(), workers=2, max_attempts=2):
+        pool = StubPool(loads, workers=workers, max_attempts=max_attempts)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_requests_are_transcribed(make_pool):
+    pool = make_pool()
+    futures = [pool.submit(i) for i in range(4)]
+    assert [future.result(timeout=5) for future in futures] == [f"text of {i}" for i in range(4)]
+    assert pool.stats()["requests"] == 4
+
+
+def test_crashed_worker_is_replaced_not_added(make_pool):
+    pool = make_pool(max_attempts=2)
+    wait_for(lambda: pool.stats()["workers_ready"] == 2)
+
+    with pytest.raises(RuntimeError, match="exited"):
+        pool.submit("crash").result(timeout=5)
+    wait_for(lambda: pool.stats()["respawns"] == 2)
+
+    stats = pool.stats()
+    assert pool.workers == 2
+    assert stats["workers"] == stats["workers_alive"] == 2
+    assert pool.submit("after").result(timeout=5) == "text of after"
+
+
+def test_worker_dying_while_loading_is_dropped(make_pool):
+    pool = make_pool(loads=[False, True])
+    wait_for(lambda: pool.workers == 1)
+
+    assert pool.stats()["respawns"] == 0
+    assert pool.submit("after").result(timeout=5) == "text of after"
+
+
+def test_no_workers_left(make_pool):
+    pool = make_pool(loads=[False, False])
+    wait_for(lambda: pool.workers == 0)
+    with pytest.raises(RuntimeError, match="All Whisper workers exited"):
+        pool.submit("after")
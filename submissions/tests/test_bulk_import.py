@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import bulk_import
+
+
+def profile(i, email=None):
+    return {
+        "name": f"user{i}",
+        "email": f"user{i}@example.com" if email is None else email,
+        "age": 20 + i,
+        "phone": f"555-{i:04d}",
+        "skills": [{"name": "Python", "level": "Beginner"}],
+        "learning_goal": {"goal": "Data Science", "desired_proficiency": "Advanced"},
+        "topics_to_learn": [{"name": "Pandas", "level": "Beginner"}],
+    }
+
+
+def write_jsonl(path, profiles):
+    path.write_text("".join(json.dumps(p) + "\n" for p in profiles), encoding="utf-8")
+    return str(path)
+
+
+def count(user_db, table):
+    with user_db.reader() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_bulk_save_dedupes_by_email(user_db):
+    first = bulk_import.bulk_save_to_db([profile(1), profile(2, email=" USER1@example.com "), profile(3, email="")])
+    assert first == {"inserted": 1, "duplicates": 1, "invalid": 1}
+
+    second = bulk_import.bulk_save_to_db([profile(1), profile(4)])
+    assert second == {"inserted": 1, "duplicates": 1, "invalid": 0}
+    assert count(user_db, "User") == 2
+    assert count(user_db, "Skills") == 2
+    assert count(user_db, "LearningGoal") == 2
+    assert count(user_db, "Topic") == 2
+
+
+def test_import_reads_csv_with_json_columns(user_db, tmp_path):
+    path = tmp_path / "profiles.csv"
+    path.write_text(
+        "name,email,age,phone,skills,learning_goal,topics_to_learn\n"
+        'ada,ada@example.com,36,555,"[{""name"": ""Math"", ""level"": ""Expert""}]",'
+        '"{""goal"": ""Engines"", ""desired_proficiency"": ""Expert""}",[]\n',
+        encoding="utf-8",
+    )
+    totals = bulk_import.import_profiles(str(path))
+    assert totals["inserted"] == 1
+    with user_db.reader() as conn:
+        assert conn.execute("SELECT skill_name FROM Skills").fetchall() == [("Math",)]
+
+
+def test_import_resumes_from_checkpoint(user_db, tmp_path):
+    path = write_jsonl(tmp_path / "profiles.jsonl", [profile(i) for i in range(10)])
+    checkpoint = str(tmp_path / "import.checkpoint")
+    bulk_import.write_checkpoint(checkpoint, path, 4)
+
+    totals = bulk_import.import_profiles(path, batch_size=3, checkpoint_path=checkpoint)
+    assert totals["resumed_from"] == 4
+    assert totals["read"] == 6
+    assert totals["inserted"] == 6
+    assert bulk_import.read_checkpoint(checkpoint, path) == 10
+
+    # A finished import read again from its checkpoint has nothing left to do
+    again = bulk_import.import_profiles(path, checkpoint_path=checkpoint)
+    assert again["read"] == 0
+
+
+def test_rerun_after_lost_checkpoint_inserts_nothing_twice(user_db, tmp_path):
+    path = write_jsonl(tmp_path / "profiles.jsonl", [profile(i) for i in range(5)])
+    bulk_import.import_profiles(path, batch_size=2)
+
+    totals = bulk_import.import_profiles(path, batch_size=2)
+    assert totals["inserted"] == 0
+    assert totals["duplicates"] == 5
+    assert count(user_db, "User") == 5
+
+
+def test_checkpoint_of_another_file_is_ignored(tmp_path):
+    checkpoint = str(tmp_path / "import.checkpoint")
+    bulk_import.write_checkpoint(checkpoint, str(tmp_path / "other.jsonl"), 7)
+    assert bulk_import.read_checkpoint(checkpoint, str(tmp_path / "profiles.jsonl")) == 0
+
+
+@pytest.mark.parametrize("email", ["", None, "   "])
+def test_profiles_without_email_are_invalid(user_db, email):
+    assert bulk_import.bulk_save_to_db([dict(profile(1), email=email)])["invalid"] == 1
@@ -0,0 +1,115 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.schema import BaseRetriever, Document
+
+import context_builder
+from context_builder import MAP_PROMPT, BudgetedQA, select_context, truncate_to_budget
+
+
+@pytest.fixture(autouse=True)
+def four_chars_per_token(monkeypatch):
+    # Count tokens without tiktoken, so budgets are exact whatever is installed
+    monkeypatch.setattr(context_builder, "_encoding", False)
+
+
+def chunk(text, score=None, words=40):
+    metadata = {} if score is None else {"score": score}
+    return Document(page_content=" ".join(f"{text}{i}" for i in range(words)), metadata=metadata)
+
+
+def test_picks_up_to_k_chunks():
+    docs = [chunk(name) for name in "abcdef"]
+    context = select_context(docs, k=4, token_budget=10_000)
+    assert [doc.page_content for doc in context["docs"]] == [doc.page_content for doc in docs[:4]]
+    assert context["fits"] and not context["over_budget"]
+
+
+def test_near_duplicates_are_replaced_by_the_next_candidate():
+    a = chunk("a")
+    copy = Document(page_content=a.page_content + " footer", metadata={})
+    context = select_context([a, copy, chunk("b"), chunk("c")], k=3, token_budget=10_000)
+    assert context["duplicates"] == 1
+    assert [doc.page_content for doc in context["docs"]] == [a.page_content, chunk("b").page_content,
+                                                             chunk("c").page_content]
+
+
+def test_stops_at_the_token_budget():
+    docs = [chunk(name) for name in "abcd"]
+    one = context_builder.count_tokens(docs[0].page_content)
+    context = select_context(docs, k=4, token_budget=2 * one + 1)
+    assert len(context["docs"]) == 2
+    assert context["tokens"] == 2 * one
+    assert context["over_budget"] and context["fits"]
+    assert context["candidates"] == docs
+
+
+def test_best_chunk_is_kept_even_over_budget():
+    context = select_context([chunk("a", words=400), chunk("b")], k=4, token_budget=50)
+    assert len(context["docs"]) == 1
+    assert not context["fits"]
+
+
+def test_stops_when_scores_drop_off():
+    docs = [chunk("a", 0.032), chunk("b", 0.030), chunk("c", 0.010), chunk("d", 0.009)]
+    context = select_context(docs, k=4, token_budget=10_000, score_dropoff=0.4)
+    assert len(context["docs"]) == 2
+
+
+def test_chunks_without_scores_are_not_cut():
+    context = select_context([chunk(name) for name in "abc"], k=4, token_budget=10_000, score_dropoff=0.99)
+    assert len(context["docs"]) == 3
+
+
+class ListRetriever(BaseRetriever):
+    docs: list
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.docs
+
+
+class RecordingLLM:
+    """Answers map prompts with their chunk's first word and records every prompt."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt, config=None):
+        self.prompts.append(prompt)
+        if prompt.startswith(MAP_PROMPT.split("\n")[0]):
+            return prompt.split("\n")[2].split()[0]
+        return "answer"
+
+
+def test_overflowing_evidence_is_mapped_in_full():
+    docs = [chunk(name) for name in "abcdef"]
+    one = context_builder.count_tokens(docs[0].page_content)
+    llm = RecordingLLM()
+    qa = BudgetedQA(retriever=ListRetriever(docs=docs), llm=llm, k=4, token_budget=2 * one + 1)
+
+    result = qa.invoke({"query": "what?"})
+
+    map_prompts = [p for p in llm.prompts if p.startswith(MAP_PROMPT.split("\n")[0])]
+    assert len(map_prompts) == len(docs)
+    assert result["source_documents"] == docs
+    # The reduce prompt is written from the extracts
+    assert "a0" in llm.prompts[-1] and "f0" in llm.prompts[-1]
+    assert result["result"] == "answer"
+
+
+def test_evidence_within_budget_is_stuffed():
+    docs = [chunk(name) for name in "abc"]
+    llm = RecordingLLM()
+    qa = BudgetedQA(retriever=ListRetriever(docs=docs), llm=llm, k=4, token_budget=10_000)
+
+    result = qa.invoke({"query": "what?"})
+
+    assert len(llm.prompts) == 1
+    assert result["source_documents"] == docs
+
+
+def test_truncate_keeps_texts_in_order_within_budget():
+    texts = ["x" * 40, "y" * 40, "z" * 40]
+    assert truncate_to_budget(texts, token_budget=20) == texts[:2]
+    assert truncate_to_budget(texts, token_budget=1) == texts[:1]
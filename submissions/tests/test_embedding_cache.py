@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("llama_index.core")
+
+from embedding_cache import CachedEmbeddings, CachedLlamaEmbedding, EmbeddingCache, embedding_model_id
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "embedding_cache.db"))
+
+
+class AzureEmbeddings:
+    """LangChain-style client whose deployment name differs from its model name."""
+
+    deployment = "my-ada-deployment"
+    model = "text-embedding-ada-002"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[0.1 * len(text), 1 / 3] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_hits_and_misses_return_the_same_precision(cache):
+    embeddings = CachedEmbeddings(AzureEmbeddings(), cache=cache)
+    miss = embeddings.embed_documents(["hello"])
+    hit = embeddings.embed_documents(["hello"])
+    assert miss == hit
+    assert cache.stats()["hits"] == 1
+
+
+def test_repeated_texts_are_embedded_once(cache):
+    client = AzureEmbeddings()
+    embeddings = CachedEmbeddings(client, cache=cache)
+    embeddings.embed_documents(["a", "b", "a"])
+    embeddings.embed_documents(["b", "c"])
+    assert client.calls == [["a", "b"], ["c"]]
+
+
+def test_langchain_wrapper_is_keyed_by_model_not_deployment(cache):
+    assert CachedEmbeddings(AzureEmbeddings(), cache=cache).model == "text-embedding-ada-002"
+
+
+def test_llama_index_wrapper_shares_langchain_vectors(cache):
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+
+    class LlamaEmbedding(BaseEmbedding):
+        def _get_query_embedding(self, query):
+            raise AssertionError("should be served from the cache")
+
+        async def _aget_query_embedding(self, query):
+            return self._get_query_embedding(query)
+
+        def _get_text_embedding(self, text):
+            raise AssertionError("should be served from the cache")
+
+    stored = CachedEmbeddings(AzureEmbeddings(), cache=cache).embed_documents(["shared chunk"])
+    llama = CachedLlamaEmbedding(LlamaEmbedding(model_name="text-embedding-ada-002"), cache=cache)
+    assert embedding_model_id(llama) == "text-embedding-ada-002"
+    assert llama.get_text_embedding_batch(["shared chunk"]) == stored
@@ -0,0 +1,47 @@
+import os
+import hashlib
+
+import pytest
+
+import hash_utils
+
+
+@pytest.fixture
+def digests(tmp_path, monkeypatch):
+    monkeypatch.setattr(hash_utils, "FILE_DIGEST_CACHE_PATH", str(tmp_path / "file_digests.db"))
+    monkeypatch.setattr(hash_utils, "_digest_conn", None)
+    reads = []
+    file_sha256 = hash_utils.file_sha256
+    monkeypatch.setattr(hash_utils, "file_sha256", lambda path: reads.append(path) or file_sha256(path))
+    yield reads
+    if hash_utils._digest_conn is not None:
+        hash_utils._digest_conn.close()
+
+
+def test_unchanged_file_is_hashed_once(digests, tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"frames" * 1000)
+    first = hash_utils.cached_file_sha256(str(video))
+    assert hash_utils.cached_file_sha256(str(video)) == first == hashlib.sha256(video.read_bytes()).hexdigest()
+    assert len(digests) == 1
+
+
+def test_modified_file_is_hashed_again(digests, tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"frames")
+    before = hash_utils.cached_file_sha256(str(video))
+    video.write_bytes(b"other frames")
+    stat = video.stat()
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert hash_utils.cached_file_sha256(str(video)) != before
+    assert len(digests) == 2
+
+
+def test_digests_survive_a_restart(digests, tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"frames")
+    digest = hash_utils.cached_file_sha256(str(video))
+    hash_utils._digest_conn.close()
+    hash_utils._digest_conn = None
+    assert hash_utils.cached_file_sha256(str(video)) == digest
+    assert len(digests) == 1
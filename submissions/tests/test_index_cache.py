@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from index_cache import IndexCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IndexCache(max_bytes=100)
+    cache.put("a", "A", nbytes=40)
+    cache.put("b", "B", nbytes=40)
+    assert cache.get("a") == "A"
+    cache.put("c", "C", nbytes=40)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["resident_bytes"] == 80
+
+
+def test_entry_larger_than_budget_is_not_kept():
+    cache = IndexCache(max_bytes=100)
+    cache.put("a", "A", nbytes=40)
+    cache.put("huge", "H", nbytes=101)
+    assert cache.get("huge") is None
+    assert cache.get("a") == "A"
+
+
+def test_replacing_an_entry_recharges_it():
+    cache = IndexCache(max_bytes=100)
+    cache.put("a", "A1", nbytes=60)
+    cache.put("a", "A2", nbytes=30)
+    assert cache.get("a") == "A2"
+    assert cache.stats()["resident_bytes"] == 30
+
+
+def test_pinned_memory_pushes_out_cached_entries():
+    cache = IndexCache(max_bytes=100)
+    cache.put("a", "A", nbytes=40)
+    cache.put("b", "B", nbytes=40)
+    cache.pin(("library",), 50)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "B"
+    stats = cache.stats()
+    assert stats["pinned_bytes"] == 50
+    assert stats["resident_bytes"] == 90
+
+    # Entries must fit next to the pinned memory, and releasing it makes room again
+    cache.put("c", "C", nbytes=60)
+    assert cache.get("c") is None
+    cache.pin(("library",), 0)
+    cache.put("c", "C", nbytes=60)
+    assert cache.get("c") == "C"
+
+
+def test_discard_releases_the_entry():
+    cache = IndexCache(max_bytes=100)
+    cache.put("a", "A", nbytes=40)
+    cache.discard("a")
+    assert cache.get("a") is None
+    assert cache.stats()["resident_bytes"] == 0
+
+
+def test_concurrent_misses_build_once():
+    cache = IndexCache(max_bytes=100)
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.1)
+        return "index"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_build("k", build, size=lambda v: 10)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["index"] * 8
+    assert len(builds) == 1
+    assert cache.stats()["shared"] == 7
+
+
+def test_none_builds_are_not_cached():
+    cache = IndexCache(max_bytes=100)
+    assert cache.get_or_build("k", lambda: None) is None
+    assert cache.get_or_build("k", lambda: "index", size=lambda v: 10) == "index"
+
+
+def test_failed_build_is_retried():
+    cache = IndexCache(max_bytes=100)
+
+    def fail():
+        raise RuntimeError("corrupt index")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_build("k", fail)
+    assert cache.get_or_build("k", lambda: "index", size=lambda v: 10) == "index"
@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from index_store import index_key
+
+
+class NamedEmbeddings:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "notes.pdf"
+    path.write_bytes(b"%PDF-1.4 first version")
+    return path
+
+
+def test_index_key_is_stable(pdf):
+    embeddings = NamedEmbeddings("text-embedding-ada-002")
+    assert index_key(str(pdf), embeddings, 1000, 0) == index_key(str(pdf), embeddings, 1000, 0)
+
+
+def test_index_key_ignores_file_name(pdf, tmp_path):
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(pdf.read_bytes())
+    embeddings = NamedEmbeddings("text-embedding-ada-002")
+    assert index_key(str(pdf), embeddings, 1000, 0) == index_key(str(copy), embeddings, 1000, 0)
+
+
+def test_index_key_changes_with_content(pdf):
+    embeddings = NamedEmbeddings("text-embedding-ada-002")
+    before = index_key(str(pdf), embeddings, 1000, 0)
+    pdf.write_bytes(b"%PDF-1.4 second version")
+    assert index_key(str(pdf), embeddings, 1000, 0) != before
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap, model", [
+    (500, 0, "text-embedding-ada-002"),
+    (1000, 100, "text-embedding-ada-002"),
+    (1000, 0, "text-embedding-3-small"),
+])
+def test_index_key_changes_with_settings(pdf, chunk_size, chunk_overlap, model):
+    base = index_key(str(pdf), NamedEmbeddings("text-embedding-ada-002"), 1000, 0)
+    assert index_key(str(pdf), NamedEmbeddings(model), chunk_size, chunk_overlap) != base
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+import ingestion_queue
+
+
+class FakeJob:
+    """Stands in for an `ingestion.IngestionJob` that finishes when `finish` is called."""
+
+    def __init__(self):
+        self.finished = threading.Event()
+        self.error = None
+
+    def finish(self, error=None):
+        self.error = error
+        self.finished.set()
+
+    def wait(self, timeout=None):
+        if not self.finished.wait(timeout):
+            raise TimeoutError()
+        if self.error is not None:
+            raise self.error
+
+    def progress(self):
+        return {"pages_done": 3, "pages_total": 4, "chunks_indexed": 12}
+
+
+@pytest.fixture
+def queue(user_db, monkeypatch):
+    monkeypatch.setattr(ingestion_queue, "_table_ready", False)
+    monkeypatch.setattr(ingestion_queue, "PROGRESS_INTERVAL", 0.01)
+    queue = ingestion_queue.IngestionQueue(workers=1)
+    yield queue
+    queue.close()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_tracked_job_reports_progress_and_completion(queue):
+    done = []
+    queue.add_done_callback(done.append)
+    job = FakeJob()
+    job_id = queue.track("document", "pdfs/notes.pdf", job)
+
+    wait_for(lambda: queue.get_job(job_id)["message"] is not None)
+    row = queue.get_job(job_id)
+    assert row["status"] == ingestion_queue.RUNNING
+    assert row["progress"] == 0.75
+    assert queue.list_jobs()[0]["id"] == job_id
+
+    job.finish()
+    wait_for(lambda: done)
+    assert done[0]["status"] == ingestion_queue.DONE
+    assert queue.stats()["done"] == 1
+
+
+def test_tracked_job_failure_is_recorded(queue):
+    done = []
+    queue.add_done_callback(done.append)
+    job = FakeJob()
+    queue.track("document", "pdfs/notes.pdf", job)
+    job.finish(ValueError("no text"))
+    wait_for(lambda: done)
+    assert done[0]["status"] == ingestion_queue.FAILED
+    assert "no text" in done[0]["error"]
+
+
+def test_source_is_tracked_once(queue):
+    job = FakeJob()
+    first = queue.track("document", "pdfs/notes.pdf", job)
+    assert queue.track("document", "pdfs/notes.pdf", FakeJob()) == first
+    done = []
+    queue.add_done_callback(done.append)
+    job.finish()
+    wait_for(lambda: done)
+
+
+def test_callback_errors_do_not_stop_other_callbacks(queue):
+    done = []
+    queue.add_done_callback(lambda job: 1 / 0)
+    queue.add_done_callback(done.append)
+    job = FakeJob()
+    queue.track("document", "pdfs/notes.pdf", job)
+    job.finish()
+    wait_for(lambda: done)
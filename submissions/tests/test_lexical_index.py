@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from lexical_index import BM25Index, keywords, reciprocal_rank_fusion, reciprocal_rank_scores
+
+CHUNKS = {
+    "a": "Install pandas with pip install pandas before reading CSV files.",
+    "b": "A DataFrame holds tabular data; pandas reads it from CSV.",
+    "c": "Matplotlib draws line charts and histograms.",
+    "d": "Use git commit to record changes to the repository.",
+}
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add(list(CHUNKS), list(CHUNKS.values()))
+    return index
+
+
+def test_keywords_drop_stopwords_and_repeats():
+    assert keywords("How do I use the pandas pandas library?") == ["pandas", "library"]
+
+
+def test_search_ranks_by_term_frequency(index):
+    hits = index.search("pandas", k=10)
+    assert [doc_id for doc_id, _, _ in hits] == ["a", "b"]
+    assert hits[0][1] > hits[1][1] > 0
+
+
+def test_search_counts_matched_terms(index):
+    hits = dict((doc_id, matched) for doc_id, _, matched in index.search("pandas csv histograms", k=10))
+    assert hits == {"a": 2, "b": 2, "c": 1}
+
+
+def test_search_without_known_terms_is_empty(index):
+    assert index.search("kubernetes") == []
+    assert BM25Index().search("pandas") == []
+
+
+def test_search_restricted_to_allowed_positions(index):
+    hits = index.search("pandas", k=10, allowed=np.array([1, 3]))
+    assert [doc_id for doc_id, _, _ in hits] == ["b"]
+
+
+def test_incremental_add_is_searchable(index):
+    index.add(["e"], ["Kubernetes schedules containers."])
+    assert index.search("kubernetes")[0][0] == "e"
+    assert len(index) == 5
+
+
+def test_confident_needs_every_keyword_and_a_clear_winner(index):
+    assert index.confident("git commit", index.search("git commit"))
+    assert not index.confident("git pandas", index.search("git pandas"))
+    assert not index.confident("kubernetes", [])
+
+
+def test_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]])
+    assert fused[0] == "a"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert fused.index("c") < fused.index("b")
+
+
+def test_fusion_scores_are_sums_of_reciprocal_ranks():
+    scores = dict(reciprocal_rank_scores([["a", "b"], ["b"]], k=60))
+    assert scores["a"] == pytest.approx(1 / 61)
+    assert scores["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert reciprocal_rank_fusion([["a", "b"], ["b"]], k=60) == ["b", "a"]
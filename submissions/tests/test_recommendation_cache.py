@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+import recommendation_cache
+
+
+@pytest.fixture
+def cache(user_db, monkeypatch):
+    monkeypatch.setattr(recommendation_cache, "_table_ready", False)
+    monkeypatch.setattr(recommendation_cache, "_inflight", {})
+    monkeypatch.setattr(recommendation_cache, "_stats", {"hits": 0, "misses": 0, "shared": 0})
+    return recommendation_cache
+
+
+def test_normalized_topics_share_an_entry(cache):
+    cache.store("Machine learning", "beginner", "Course list")
+    assert cache.lookup(" machine  LEARNING. ", "Beginner") == "Course list"
+    assert cache.lookup("machine learning", "Expert") is None
+
+
+def test_expired_entries_are_recomputed(cache, monkeypatch):
+    cache.store("pandas", "Beginner", "old")
+    monkeypatch.setattr(recommendation_cache, "CACHE_TTL", 0.0)
+    assert cache.lookup("pandas", "Beginner") is None
+    assert cache.get_or_compute("pandas", "Beginner", lambda: "new") == "new"
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(cache, monkeypatch):
+    monkeypatch.setattr(recommendation_cache, "CACHE_MAX_ENTRIES", 2)
+    cache.store("t0", "Beginner", "c0")
+    cache.store("t1", "Beginner", "c1")
+    assert cache.lookup("t0", "Beginner") == "c0"
+    cache.store("t2", "Beginner", "c2")
+
+    assert cache.lookup("t1", "Beginner") is None
+    assert cache.lookup("t0", "Beginner") == "c0"
+    assert cache.lookup("t2", "Beginner") == "c2"
+
+
+def test_empty_results_are_not_cached(cache):
+    assert cache.get_or_compute("pandas", "Beginner", lambda: "") == ""
+    assert cache.lookup("pandas", "Beginner") is None
+
+
+def run_concurrently(count, call):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(call())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_misses_compute_once(cache):
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "Course list"
+
+    threads, results, errors = run_concurrently(8, lambda: cache.get_or_compute("pandas", "Beginner", compute))
+    # Wait until the other callers are queued behind the leader
+    while cache.stats()["shared"] < 7:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == [] and results == ["Course list"] * 8
+    assert calls == [1]
+    assert cache.stats() == {"hits": 0, "misses": 1, "shared": 7}
+    assert cache.get_or_compute("pandas", "Beginner", compute) == "Course list"
+    assert cache.stats()["hits"] == 1
+
+
+def test_waiting_callers_time_out(cache):
+    release = threading.Event()
+    leader = threading.Thread(target=cache.get_or_compute,
+                              args=("pandas", "Beginner", lambda: release.wait(5) and "Course list"))
+    leader.start()
+    try:
+        while not cache._inflight:
+            time.sleep(0.01)
+        with pytest.raises(TimeoutError):
+            cache.get_or_compute("pandas", "Beginner", lambda: "unused", timeout=0.05)
+    finally:
+        release.set()
+        leader.join(5)
+    assert cache.lookup("pandas", "Beginner") == "Course list"
+
+
+def test_compute_errors_reach_every_caller(cache):
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise RuntimeError("rate limited")
+
+    threads, results, errors = run_concurrently(3, lambda: cache.get_or_compute("pandas", "Beginner", compute))
+    while cache.stats()["shared"] < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [] and len(errors) == 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert cache._inflight == {}
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import recommendation_executor
+from recommendation_executor import iter_recommendations
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(recommendation_executor, "POLL_INTERVAL", 0.01)
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+class SlowRecommender:
+    """Returns "<topic> for <level>" after the delay of its topic, or blocks until released."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, topic, proficiency):
+        self.calls.append(topic)
+        delay = self.delays.get(topic)
+        if delay is None:
+            self.release.wait(5)
+        else:
+            time.sleep(delay)
+        if topic == "broken":
+            raise RuntimeError("agent failed")
+        return f"{topic} for {proficiency}"
+
+
+def test_results_come_in_completion_order(executor):
+    recommend = SlowRecommender({"slow": 0.3, "fast": 0.0, "medium": 0.15})
+    items = [("slow", "Beginner"), ("fast", "Expert"), ("medium", "Beginner")]
+
+    results = list(iter_recommendations(items, timeout=5, recommend=recommend, executor=executor))
+
+    assert [r["index"] for r in results] == [1, 2, 0]
+    assert [r["content"] for r in results] == ["fast for Expert", "medium for Beginner", "slow for Beginner"]
+    assert all(r["error"] is None for r in results)
+
+
+def test_failures_and_timeouts_do_not_stop_the_others(executor):
+    recommend = SlowRecommender({"fast": 0.0, "broken": 0.0})
+    items = [("stuck", "Beginner"), ("fast", "Beginner"), ("broken", "Beginner")]
+    try:
+        results = {r["topic"]: r for r in iter_recommendations(items, timeout=0.2, recommend=recommend,
+                                                                  executor=executor)}
+    finally:
+        recommend.release.set()
+
+    assert results["fast"]["content"] == "fast for Beginner"
+    assert isinstance(results["broken"]["error"], RuntimeError)
+    assert isinstance(results["stuck"]["error"], TimeoutError)
+    assert results["stuck"]["elapsed"] >= 0.2
+
+
+def test_calls_waiting_for_a_thread_time_out_and_never_run():
+    recommend = SlowRecommender({"next": 0.0})
+    # The only thread is held by a call that already timed out
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        results = list(iter_recommendations([("stuck", "Beginner"), ("next", "Beginner")], max_workers=2,
+                                            timeout=0.2, recommend=recommend, executor=pool))
+        assert [type(r["error"]) for r in results] == [TimeoutError, TimeoutError]
+        assert results[1]["elapsed"] == 0.0
+    finally:
+        recommend.release.set()
+        pool.shutdown(wait=True)
+    assert recommend.calls == ["stuck"]
+
+
+def test_submits_at_most_max_workers_at_a_time(executor):
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def recommend(topic, proficiency):
+        with lock:
+            running.append(topic)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(topic)
+        return topic
+
+    items = [(f"topic {i}", "Beginner") for i in range(6)]
+    results = list(iter_recommendations(items, max_workers=2, timeout=5, recommend=recommend, executor=executor))
+
+    assert sorted(r["index"] for r in results) == list(range(6))
+    assert max(peak) == 2
+
+
+def test_stopping_early_cancels_queued_calls():
+    recommend = SlowRecommender({"first": 0.0})
+    pool = ThreadPoolExecutor(max_workers=1)
+    items = [("first", "Beginner"), ("stuck", "Beginner"), ("queued", "Beginner")]
+    try:
+        results = iter_recommendations(items, max_workers=3, timeout=5, recommend=recommend, executor=pool)
+        assert next(results)["topic"] == "first"
+        while "stuck" not in recommend.calls:
+            time.sleep(0.01)
+        results.close()
+    finally:
+        recommend.release.set()
+        pool.shutdown(wait=True)
+    assert recommend.calls == ["first", "stuck"]
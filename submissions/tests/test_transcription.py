@@ -0,0 +1,92 @@
+import numpy as np
+
+from metrics import get_metrics
+from transcription import WHISPER_SAMPLE_RATE, _transcribe_segments, find_segments, sample_energies
+
+FRAME_S = 0.03
+
+
+def tone(seconds, amplitude=0.3, rate=WHISPER_SAMPLE_RATE):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds, rate=WHISPER_SAMPLE_RATE):
+    return np.zeros(int(seconds * rate), dtype=np.float32)
+
+
+def segments(samples, **kwargs):
+    energies, frame_s = sample_energies(samples)
+    return find_segments(energies, frame_s, **kwargs)
+
+
+def test_no_audio_has_no_segment():
+    assert find_segments(np.zeros(0), FRAME_S) == []
+
+
+def test_digital_silence_has_no_segment():
+    assert segments(silence(5)) == []
+
+
+def test_near_silent_audio_has_no_segment():
+    # Steady hiss is as loud as its own loudest frames, but below the absolute floor
+    rng = np.random.default_rng(0)
+    hiss = (1e-3 * rng.standard_normal(5 * WHISPER_SAMPLE_RATE)).astype(np.float32)
+    assert segments(hiss) == []
+
+
+def test_speech_is_cut_at_silences():
+    audio = np.concatenate([silence(1), tone(2), silence(1), tone(3), silence(1)])
+    found = segments(audio)
+    assert len(found) == 2
+    (start1, end1), (start2, end2) = found
+    assert abs(start1 - 1.0) < 0.05
+    assert 3.0 <= end1 <= start2 <= 4.0
+    assert abs(end2 - 7.0) < 0.05
+
+
+def test_short_pauses_do_not_split():
+    audio = np.concatenate([tone(2), silence(0.2), tone(2)])
+    assert len(segments(audio)) == 1
+
+
+def test_long_speech_is_split_to_max_length():
+    found = segments(tone(70), max_segment_s=30.0)
+    assert len(found) >= 3
+    assert all(end - start <= 30.0 + FRAME_S for start, end in found)
+    assert abs(found[-1][1] - 70.0) < 0.05
+
+
+class FakePool:
+    """Transcribes a segment to its length in samples; segments of `fail_at` samples raise."""
+
+    workers = 2
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+
+    def submit(self, samples):
+        from concurrent.futures import Future
+
+        future = Future()
+        if len(samples) == self.fail_at:
+            future.set_exception(RuntimeError("decoder error"))
+        else:
+            future.set_result(str(len(samples)))
+        return future
+
+
+def test_segments_are_transcribed_in_order():
+    segments = [(0.0, 1.0), (1.0, 3.0), (3.0, 3.5), (4.0, 8.0), (8.0, 9.0)]
+    read = lambda start, end: np.zeros(int((end - start) * 100))
+    found = list(_transcribe_segments(segments, read, FakePool()))
+    assert [s["index"] for s in found] == [0, 1, 2, 3, 4]
+    assert [s["text"] for s in found] == ["100", "200", "50", "400", "100"]
+
+
+def test_failed_segment_is_left_empty_and_counted():
+    before = get_metrics().snapshot()["counters"].get("video.asr_failed_segments", 0)
+    read = lambda start, end: np.zeros(int((end - start) * 100))
+    found = list(_transcribe_segments([(0.0, 1.0), (1.0, 3.0)], read, FakePool(fail_at=200)))
+    assert [s["text"] for s in found] == ["100", ""]
+    assert get_metrics().snapshot()["counters"]["video.asr_failed_segments"] == before + 1
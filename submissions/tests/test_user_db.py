@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+
+import pytest
+
+PROFILE = {
+    "name": "ada",
+    "email": "ada@example.com",
+    "age": 36,
+    "phone": "555-0100",
+    "skills": [{"name": "Math", "level": "Expert"}],
+    "learning_goal": {"goal": "Engines", "desired_proficiency": "Expert"},
+    "topics_to_learn": [{"name": "Looms", "level": "Beginner"}],
+}
+
+
+def test_profile_round_trip(user_db):
+    user_id = user_db.save_to_db(PROFILE)
+    profile = user_db.get_user_profile("ada")
+    assert profile["id"] == user_id
+    assert profile["skills"] == PROFILE["skills"]
+    assert profile["learning_goal"] == PROFILE["learning_goal"]
+    assert profile["topics_to_learn"] == PROFILE["topics_to_learn"]
+    assert user_db.get_user_profile("nobody") is None
+
+
+def test_readers_are_bounded_across_threads(user_db, monkeypatch):
+    monkeypatch.setattr(user_db, "READER_POOL_SIZE", 2)
+    user_db.save_to_db(PROFILE)
+    connections, errors = set(), []
+    start = threading.Barrier(16)
+
+    def read():
+        try:
+            start.wait()
+            for _ in range(20):
+                with user_db.reader() as conn:
+                    connections.add(id(conn))
+                    assert conn.execute("SELECT COUNT(*) FROM User").fetchone()[0] == 1
+        except Exception as e:
+            errors.append(e)
+
+    # A fresh thread per call, as Streamlit reruns do
+    threads = [threading.Thread(target=read) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(connections) <= 2
+    assert user_db._readers_open <= 2
+
+
+def test_readers_see_the_latest_commit(user_db):
+    with user_db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM User").fetchone()[0] == 0
+    user_db.save_to_db(PROFILE)
+    with user_db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM User").fetchone()[0] == 1
+
+
+def test_reader_is_read_only(user_db):
+    with user_db.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("DELETE FROM User")
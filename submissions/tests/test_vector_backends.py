@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from vector_backends import (NUMPY_MAX_VECTORS, NumpyIndex, build_index, choose_backend, read_index,
+                             reconstruct_all, search_ids, write_index)
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((200, 16)).astype(np.float32)
+
+
+def brute_force(vectors, query, k):
+    d2 = ((vectors - query) ** 2).sum(axis=1)
+    return np.argsort(d2)[:k], np.sort(d2)[:k]
+
+
+def test_search_matches_brute_force(vectors):
+    index = NumpyIndex(16)
+    index.add(vectors)
+    queries = vectors[:3] + 0.01
+    distances, labels = index.search(queries, 5)
+    for query, row_distances, row_labels in zip(queries, distances, labels):
+        expected_labels, expected_distances = brute_force(vectors, query, 5)
+        assert list(row_labels) == list(expected_labels)
+        np.testing.assert_allclose(row_distances, expected_distances, rtol=1e-4, atol=1e-4)
+
+
+def test_search_pads_when_k_exceeds_ntotal(vectors):
+    index = NumpyIndex(16, vectors[:3])
+    distances, labels = index.search(vectors[0], 5)
+    assert list(labels[0, 3:]) == [-1, -1]
+    assert np.isinf(distances[0, 3:]).all()
+    assert labels[0, 0] == 0
+
+
+def test_empty_index_returns_no_labels():
+    distances, labels = NumpyIndex(4).search(np.zeros(4), 2)
+    assert (labels == -1).all()
+
+
+def test_add_invalidates_cached_norms(vectors):
+    index = NumpyIndex(16, vectors[:10])
+    index.search(vectors[0], 1)
+    index.add(vectors[50:51])
+    _, labels = index.search(vectors[50], 1)
+    assert labels[0, 0] == 10
+
+
+def test_search_ids_only_returns_selected_positions(vectors):
+    index = build_index(vectors, backend="numpy")
+    allowed = np.array([5, 17, 120, 199])
+    _, labels = search_ids(index, vectors[17], 3, allowed)
+    assert labels[0, 0] == 17
+    assert set(labels[0]) <= set(allowed)
+
+
+def test_round_trip_through_disk(vectors, tmp_path):
+    index = build_index(vectors, backend="numpy")
+    write_index(index, tmp_path)
+    loaded = read_index(tmp_path)
+    assert isinstance(loaded, NumpyIndex)
+    np.testing.assert_array_equal(reconstruct_all(loaded), vectors)
+
+    # Memory-mapped vectors are copied on the first add
+    loaded.add(vectors[:1])
+    assert loaded.ntotal == len(vectors) + 1
+
+
+def test_read_index_without_files(tmp_path):
+    assert read_index(tmp_path) is None
+
+
+def test_auto_backend_by_corpus_size():
+    assert choose_backend(NUMPY_MAX_VECTORS, backend="auto") == "numpy"
+    assert choose_backend(NUMPY_MAX_VECTORS + 1, backend="auto") != "numpy"
+    assert choose_backend(10, backend="flat") == "flat"
@@ -0,0 +1,212 @@
+import os
+import wave
+import logging
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+from metrics import incr
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SAMPLE_RATE = 16000
+
+# Voice activity detection settings
+FRAME_MS = 30
+MIN_SILENCE_S = 0.5
+MAX_SEGMENT_S = 30.0
+SILENCE_DB = -35.0
+# Frames quieter than this (dBFS) are silent however quiet the rest of the audio is
+SPEECH_FLOOR_DB = -50.0
+
+# Frames of audio read per block while scanning the file
+READ_BLOCK_FRAMES = 1 << 16
+
+# Seconds without any segment finishing before a transcription is abandoned
+SEGMENT_TIMEOUT_S = float(os.getenv("ASR_SEGMENT_TIMEOUT", "600"))
+
+
+def _to_mono_float(raw, sample_width, channels):
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[sample_width]
+    samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+    if sample_width == 1:
+        samples = samples - 128.0
+    samples /= float(2 ** (8 * sample_width - 1))
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _energies_db(samples, frame_len):
+    usable = samples.size // frame_len * frame_len
+    frames = samples[:usable].reshape(-1, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def sample_energies(samples, rate=WHISPER_SAMPLE_RATE, frame_ms=FRAME_MS):
+    """RMS energy (dB) of consecutive `frame_ms` frames of an in-memory mono buffer."""
+    frame_len = max(int(rate * frame_ms / 1000), 1)
+    return _energies_db(samples, frame_len), frame_len / rate
+
+
+def frame_energies(audio_path, frame_ms=FRAME_MS):
+    """
+    RMS energy (dB) of consecutive `frame_ms` frames of a WAV file.
+
+    The file is scanned block by block, so memory stays flat however long the audio is.
+
+    Returns:
+        (np.ndarray, float): energies in dB and the frame duration in seconds.
+    """
+    with wave.open(audio_path, "rb") as wav:
+        rate, width, channels = wav.getframerate(), wav.getsampwidth(), wav.getnchannels()
+        frame_len = max(int(rate * frame_ms / 1000), 1)
+        block_frames = max(READ_BLOCK_FRAMES // frame_len, 1) * frame_len
+        energies = []
+        while True:
+            samples = _to_mono_float(wav.readframes(block_frames), width, channels)
+            if samples.size < frame_len:
+                break
+            energies.append(_energies_db(samples, frame_len))
+    energies = np.concatenate(energies) if energies else np.zeros(0)
+    return energies, frame_len / rate
+
+
+def find_segments(energies, frame_s, silence_db=SILENCE_DB, min_silence_s=MIN_SILENCE_S,
+                  max_segment_s=MAX_SEGMENT_S, floor_db=SPEECH_FLOOR_DB):
+    """
+    Split audio into speech segments at silences.
+
+    A frame is silent when it is `silence_db` below the loudest frames or under the
+    absolute `floor_db`, so silent or near-silent audio has no segment. Segments are cut
+    in the middle of every silence of at least `min_silence_s`; segments longer than
+    `max_segment_s` are cut again at their quietest frame. Leading/trailing silence and
+    segments without any speech frame are dropped.
+
+    Returns:
+        list: (start_s, end_s) tuples in order.
+    """
+    if energies.size == 0:
+        return []
+
+    reference = np.percentile(energies, 95)
+    speech = (energies > reference + silence_db) & (energies > floor_db)
+    if not speech.any():
+        return []
+
+    # Boundaries of silent runs: +1 where silence starts, -1 where it ends
+    edges = np.diff(np.concatenate(([0], (~speech).astype(np.int8), [0])))
+    silence_starts = np.flatnonzero(edges == 1)
+    silence_ends = np.flatnonzero(edges == -1)
+    min_silence = int(min_silence_s / frame_s)
+    cuts = [(s + e) // 2 for s, e in zip(silence_starts, silence_ends)
+            if e - s >= min_silence and s > 0 and e < speech.size]
+
+    first, last = np.flatnonzero(speech)[[0, -1]]
+    bounds = [first] + cuts + [last + 1]
+
+    max_frames = int(max_segment_s / frame_s)
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        while end - start > max_frames:
+            window = energies[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(window))
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, end))
+
+    return [(float(start * frame_s), float(end * frame_s)) for start, end in segments
+            if speech[start:end].any()]
+
+
+def resample(samples, rate, target_rate=WHISPER_SAMPLE_RATE):
+    """Linear resampling; plenty for speech recognition input."""
+    if rate == target_rate or not samples.size:
+        return samples.astype(np.float32, copy=False)
+    target = np.arange(0, samples.size, rate / target_rate)
+    return np.interp(target, np.arange(samples.size), samples).astype(np.float32)
+
+
+def read_segment(audio_path, start_s, end_s):
+    """Read one segment of a WAV file as 16 kHz mono float32, the input Whisper expects."""
+    with wave.open(audio_path, "rb") as wav:
+        rate = wav.getframerate()
+        wav.setpos(min(int(start_s * rate), wav.getnframes()))
+        raw = wav.readframes(int((end_s - start_s) * rate))
+        samples = _to_mono_float(raw, wav.getsampwidth(), wav.getnchannels())
+    return resample(samples, rate)
+
+
+def _transcribe_segments(segments, read, pool=None):
+    """
+    Transcribe `segments` on the Whisper workers and yield them in order.
+
+    `read(start_s, end_s)` returns the 16 kHz samples of a segment. At most two
+    segments per worker are queued at a time so audio is not all copied into the
+    request queue up front.
+    """
+    if not segments:
+        return
+    if pool is None:
+        from asr_worker import get_asr_pool
+        pool = get_asr_pool()
+
+    # With every worker gone, submit raises the pool's error
+    max_in_flight = 2 * max(pool.workers, 1)
+    pending = {}
+    finished = {}
+    next_submit = next_index = 0
+    while next_index < len(segments):
+        while next_submit < len(segments) and len(pending) < max_in_flight:
+            start, end = segments[next_submit]
+            pending[pool.submit(read(start, end))] = next_submit
+            next_submit += 1
+
+        done, _ = wait(pending, timeout=SEGMENT_TIMEOUT_S, return_when=FIRST_COMPLETED)
+        if not done:
+            raise TimeoutError(f"No speech segment transcribed in {SEGMENT_TIMEOUT_S:.0f}s")
+        for future in done:
+            index = pending.pop(future)
+            try:
+                finished[index] = future.result()
+            except Exception as e:
+                start, end = segments[index]
+                incr("video.asr_failed_segments")
+                logger.warning("Speech recognition failed for %.1f-%.1fs; %s", start, end, e)
+                finished[index] = ""
+        while next_index in finished:
+            start, end = segments[next_index]
+            yield {"index": next_index, "start": start, "end": end, "text": finished.pop(next_index)}
+            next_index += 1
+
+
+def iter_transcript_segments(audio_path, pool=None):
+    """
+    Transcribe a WAV file segment by segment on the warm Whisper worker pool.
+
+    Segments are split at silences and transcribed in parallel. Results are yielded in
+    audio order as soon as every earlier segment is done, so callers can start using the
+    transcript before the last segment finishes.
+
+    Parameters:
+        audio_path (str): WAV file to transcribe.
+        pool (WhisperWorkerPool): Workers to use, defaults to the process-wide pool.
+
+    Yields:
+        dict: {"index", "start", "end", "text"} for each segment.
+    """
+    energies, frame_s = frame_energies(audio_path)
+    segments = find_segments(energies, frame_s)
+    return _transcribe_segments(segments, lambda start, end: read_segment(audio_path, start, end), pool)
+
+
+def iter_sample_segments(samples, rate=WHISPER_SAMPLE_RATE, pool=None):
+    """Same as `iter_transcript_segments` for an in-memory mono float32 buffer (no WAV file)."""
+    samples = resample(samples, rate)
+    energies, frame_s = sample_energies(samples)
+    segments = find_segments(energies, frame_s)
+
+    def read(start, end):
+        return samples[int(start * WHISPER_SAMPLE_RATE):int(end * WHISPER_SAMPLE_RATE)]
+
+    return _transcribe_segments(segments, read, pool)
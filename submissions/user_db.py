@@ -0,0 +1,204 @@
+import os
+import uuid
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.getenv("USER_DB_PATH", "user_data.db")
+
+# Read-only connections shared by every thread; concurrent readers beyond this wait for one
+READER_POOL_SIZE = int(os.getenv("USER_DB_READERS", "4"))
+
+SCHEMA = [
+    """
+        CREATE TABLE IF NOT EXISTS User (
+            id TEXT PRIMARY KEY,
+            name VARCHAR(50),
+            email NVARCHAR(50),
+            age INTEGER,
+            phone_number NVARCHAR(50)
+        );
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Skills (
+            user_id VARCHAR(50),
+            skill_name VARCHAR(100),
+            skill_proficiency VARCHAR(50),
+            FOREIGN KEY(user_id) REFERENCES User(id)
+        );
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS LearningGoal (
+            user_id VARCHAR(50),
+            goal_name VARCHAR(100),
+            goal_proficiency VARCHAR(50),
+            FOREIGN KEY(user_id) REFERENCES User(id)
+        );
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Topic (
+            user_id VARCHAR(50),
+            topic_name VARCHAR(100),
+            topic_proficiency VARCHAR(50),
+            FOREIGN KEY(user_id) REFERENCES User(id)
+        );
+    """,
+    # Every profile lookup goes through User.name and then the user_id foreign keys
+    "CREATE INDEX IF NOT EXISTS idx_user_name ON User(name);",
+    # Bulk imports de-duplicate users by email
+    "CREATE INDEX IF NOT EXISTS idx_user_email ON User(lower(trim(email)));",
+    "CREATE INDEX IF NOT EXISTS idx_skills_user_id ON Skills(user_id);",
+    "CREATE INDEX IF NOT EXISTS idx_learninggoal_user_id ON LearningGoal(user_id);",
+    "CREATE INDEX IF NOT EXISTS idx_topic_user_id ON Topic(user_id);",
+]
+
+INSERT_USER = "INSERT INTO User (id, name, email, age, phone_number) VALUES (?, ?, ?, ?, ?)"
+INSERT_SKILL = "INSERT INTO Skills (user_id, skill_name, skill_proficiency) VALUES (?, ?, ?)"
+INSERT_GOAL = "INSERT INTO LearningGoal (user_id, goal_name, goal_proficiency) VALUES (?, ?, ?)"
+INSERT_TOPIC = "INSERT INTO Topic (user_id, topic_name, topic_proficiency) VALUES (?, ?, ?)"
+
+# The whole profile in one round-trip: the user row is found through idx_user_name and
+# each child table through its user_id index. The LEFT JOIN on Skills guarantees at least
+# one row for an existing user even when they have no skills.
+SELECT_PROFILE = """
+    WITH u AS (
+        SELECT id, name, email, age, phone_number FROM User WHERE name = ? LIMIT 1
+    )
+    SELECT u.id, u.name, u.email, u.age, u.phone_number, 'skill', s.skill_name, s.skill_proficiency
+    FROM u LEFT JOIN Skills s ON s.user_id = u.id
+    UNION ALL
+    SELECT u.id, u.name, u.email, u.age, u.phone_number, 'goal', g.goal_name, g.goal_proficiency
+    FROM u JOIN LearningGoal g ON g.user_id = u.id
+    UNION ALL
+    SELECT u.id, u.name, u.email, u.age, u.phone_number, 'topic', t.topic_name, t.topic_proficiency
+    FROM u JOIN Topic t ON t.user_id = u.id
+"""
+
+_conn = None
+_lock = threading.RLock()
+_readers = queue.LifoQueue()
+_readers_open = 0
+_readers_lock = threading.Lock()
+
+
+def get_connection():
+    """
+    Return the process-wide write connection to user_data.db, opening it on first use.
+
+    The connection runs in WAL mode so readers never block on a writer, and keeps
+    a statement cache so the fixed queries above are only prepared once.
+    Callers must hold the module lock; use `transaction()` rather than calling this directly.
+    """
+    global _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=30, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _conn = conn
+        return _conn
+
+
+@contextmanager
+def transaction():
+    """Yield the shared connection under the process lock; commit on success, roll back on error."""
+    with _lock:
+        conn = get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+@contextmanager
+def reader():
+    """
+    Yield a read-only connection from the process-wide pool, without taking the write lock.
+
+    At most READER_POOL_SIZE autocommit connections are opened, whichever threads use
+    them (Streamlit runs every rerun on a new thread), so reads run alongside each other
+    and alongside a write transaction (WAL), and always see the latest commit.
+    """
+    global _readers_open
+    try:
+        conn = _readers.get_nowait()
+    except queue.Empty:
+        with _readers_lock:
+            opened = _readers_open < READER_POOL_SIZE
+            if opened:
+                _readers_open += 1
+        if not opened:
+            conn = _readers.get()
+        else:
+            try:
+                # The write connection creates the schema and switches the file to WAL first
+                if _conn is None:
+                    get_connection()
+                conn = sqlite3.connect(DB_PATH, timeout=30, cached_statements=256, isolation_level=None,
+                                       check_same_thread=False)
+                conn.execute("PRAGMA query_only=ON;")
+            except Exception:
+                with _readers_lock:
+                    _readers_open -= 1
+                raise
+    try:
+        yield conn
+    finally:
+        _readers.put(conn)
+
+
+def init_db():
+    # Tables and indexes are created when the shared connection is opened
+    get_connection()
+
+
+def save_to_db(data):
+    user_id = str(uuid.uuid4())
+    goal = data['learning_goal']
+    with transaction() as conn:
+        conn.execute(INSERT_USER, (user_id, data['name'], data['email'], data['age'], data['phone']))
+        conn.executemany(INSERT_SKILL, [(user_id, skill['name'], skill['level']) for skill in data['skills']])
+        conn.execute(INSERT_GOAL, (user_id, goal['goal'], goal['desired_proficiency']))
+        conn.executemany(INSERT_TOPIC, [(user_id, topic['name'], topic['level']) for topic in data['topics_to_learn']])
+    return user_id
+
+
+def get_user_profile(name):
+    """
+    Load a user's profile by name with a single indexed query.
+
+    Returns:
+        dict: The profile in the shape `save_to_db` accepts, plus "id" and
+        "learning_goals" (every goal row; "learning_goal" is the first one),
+        or None if no user has that name.
+    """
+    with reader() as conn:
+        rows = conn.execute(SELECT_PROFILE, (name,)).fetchall()
+
+    if not rows:
+        return None
+
+    user_id, name, email, age, phone = rows[0][:5]
+    items = {"skill": [], "goal": [], "topic": []}
+    for *_, kind, item_name, item_level in rows:
+        if item_name is not None:
+            items[kind].append((item_name, item_level))
+
+    learning_goals = [{"goal": n, "desired_proficiency": l} for n, l in items["goal"]]
+    return {
+        "id": user_id,
+        "name": name,
+        "email": email,
+        "age": age,
+        "phone": phone,
+        "skills": [{"name": n, "level": l} for n, l in items["skill"]],
+        "learning_goal": learning_goals[0] if learning_goals else {},
+        "learning_goals": learning_goals,
+        "topics_to_learn": [{"name": n, "level": l} for n, l in items["topic"]],
+    }
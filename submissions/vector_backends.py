@@ -0,0 +1,261 @@
+import os
+import math
+from pathlib import Path
+
+import numpy as np
+
+# faiss is imported where it is used, so the NumPy backend and the video path do not load it
+
+# Force one backend for every index ("auto" picks one by corpus size)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
+
+# Search-time knobs: higher is better recall and slower queries
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# Largest corpora (in vectors) each backend is picked for by "auto"
+NUMPY_MAX_VECTORS = int(os.getenv("NUMPY_MAX_VECTORS", "5000"))
+HNSW_MAX_VECTORS = int(os.getenv("HNSW_MAX_VECTORS", "50000"))
+IVF_SQ8_MAX_VECTORS = int(os.getenv("IVF_SQ8_MAX_VECTORS", "500000"))
+
+FAISS_FILE = "index.faiss"
+NUMPY_FILE = "index.npy"
+
+# Storage and the recall/latency trade-off of every backend; d is the embedding dimension
+BACKENDS = {
+    "numpy": {"factory": None, "bytes_per_vector": "4d", "recall": "exact",
+              "latency": "linear scan, under a millisecond below ~5k vectors"},
+    "flat": {"factory": "Flat", "bytes_per_vector": "4d", "recall": "exact",
+             "latency": "linear scan (faiss SIMD)"},
+    "hnsw": {"factory": "HNSW32,Flat", "bytes_per_vector": "4d + 256", "recall": "~0.98 at efSearch 64",
+             "latency": "logarithmic, about a millisecond"},
+    "hnsw-fp16": {"factory": "HNSW32,SQfp16", "bytes_per_vector": "2d + 256", "recall": "~0.98 at efSearch 64",
+                  "latency": "logarithmic, about a millisecond"},
+    "ivf-sq8": {"factory": "IVF{nlist},SQ8", "bytes_per_vector": "d", "recall": "~0.95 at nprobe 16",
+                "latency": "scans nprobe/nlist of the corpus"},
+    "ivf-pq": {"factory": "IVF{nlist},PQ{m}", "bytes_per_vector": "d/16", "recall": "~0.85 at nprobe 16",
+               "latency": "scans nprobe/nlist of the corpus"},
+}
+
+
+class NumpyIndex:
+    """
+    Exact L2 search by brute force in NumPy.
+
+    Implements the part of the faiss.Index interface that LangChain's FAISS wrapper and
+    llama_index's FaissVectorStore use (`d`, `ntotal`, `add`, `search`, `reconstruct_n`),
+    so tiny corpora can skip faiss entirely.
+    """
+
+    is_trained = True
+
+    def __init__(self, d, vectors=None):
+        self.d = d
+        self.vectors = np.zeros((0, d), dtype=np.float32) if vectors is None else vectors
+        self._norms = None
+
+    @property
+    def ntotal(self):
+        return len(self.vectors)
+
+    def add(self, x):
+        self.vectors = np.concatenate([self.vectors, np.asarray(x, dtype=np.float32).reshape(-1, self.d)])
+        self._norms = None
+
+    def search(self, x, k):
+        x = np.asarray(x, dtype=np.float32).reshape(-1, self.d)
+        distances = np.full((len(x), k), np.inf, dtype=np.float32)
+        labels = np.full((len(x), k), -1, dtype=np.int64)
+        if not self.ntotal:
+            return distances, labels
+
+        if self._norms is None:
+            self._norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        d2 = self._norms[None, :] - 2 * x @ self.vectors.T + np.einsum("ij,ij->i", x, x)[:, None]
+        top = min(k, self.ntotal)
+        idx = np.argpartition(d2, top - 1, axis=1)[:, :top]
+        order = np.take_along_axis(d2, idx, axis=1).argsort(axis=1)
+        labels[:, :top] = np.take_along_axis(idx, order, axis=1)
+        distances[:, :top] = np.maximum(np.take_along_axis(d2, labels[:, :top], axis=1), 0)
+        return distances, labels
+
+    def reconstruct_n(self, i0, n):
+        return np.asarray(self.vectors[i0:i0 + n], dtype=np.float32)
+
+
+def choose_backend(n_vectors, backend=VECTOR_BACKEND):
+    """Pick the backend for a corpus of `n_vectors`, unless one is forced."""
+    if backend != "auto":
+        return backend
+    if n_vectors <= NUMPY_MAX_VECTORS:
+        return "numpy"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw-fp16"
+    if n_vectors <= IVF_SQ8_MAX_VECTORS:
+        return "ivf-sq8"
+    return "ivf-pq"
+
+
+def _pq_subquantizers(d):
+    # Largest divisor of d giving at least 16 dimensions per sub-quantizer
+    return next(m for m in range(max(d // 16, 1), 0, -1) if d % m == 0)
+
+
+def tune(index):
+    """Apply the search-time knobs to a faiss index (no-op for other backends)."""
+    if isinstance(index, NumpyIndex):
+        return index
+    import faiss
+
+    try:
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    except RuntimeError:
+        pass
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def new_index(d, training_vectors, backend):
+    """
+    Create an empty index of the given backend, trained on `training_vectors` if it needs training.
+
+    Parameters:
+        d (int): Embedding dimension.
+        training_vectors (np.ndarray): Sample of the corpus; IVF backends need at least nlist vectors.
+        backend (str): One of BACKENDS.
+    """
+    if backend == "numpy":
+        return NumpyIndex(d)
+    import faiss
+
+    n = len(training_vectors)
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+    factory = BACKENDS[backend]["factory"].format(nlist=nlist, m=_pq_subquantizers(d))
+    index = faiss.index_factory(d, factory)
+    if not index.is_trained:
+        # faiss only uses up to 256 points per centroid anyway
+        sample = training_vectors
+        if n > 256 * nlist:
+            sample = training_vectors[np.random.default_rng(0).choice(n, 256 * nlist, replace=False)]
+        index.train(np.ascontiguousarray(sample, dtype=np.float32))
+    return tune(index)
+
+
+def build_index(vectors, backend=VECTOR_BACKEND):
+    """Build an index over `vectors`, choosing the backend by corpus size when it is "auto"."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = new_index(vectors.shape[1], vectors, choose_backend(len(vectors), backend))
+    index.add(vectors)
+    return index
+
+
+def reconstruct_all(index):
+    """Every vector of an index as float32 (approximate for quantized backends)."""
+    if isinstance(index, NumpyIndex):
+        return index.reconstruct_n(0, index.ntotal)
+    import faiss
+
+    try:
+        faiss.extract_index_ivf(index).make_direct_map()
+    except RuntimeError:
+        pass
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def search_ids(index, x, k, ids):
+    """
+    Search only the vectors at positions `ids`, e.g. the chunks of one document.
+
+    faiss backends skip other vectors with an ID selector while scanning; the NumPy
+    backend scans just the selected rows.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if isinstance(index, NumpyIndex):
+        distances, labels = NumpyIndex(index.d, index.vectors[ids]).search(x, k)
+        return distances, np.where(labels >= 0, ids[np.maximum(labels, 0)], -1)
+
+    import faiss
+
+    selector = faiss.IDSelectorBatch(ids)
+    if hasattr(index, "hnsw"):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=HNSW_EF_SEARCH)
+    else:
+        try:
+            faiss.extract_index_ivf(index)
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=IVF_NPROBE)
+        except RuntimeError:
+            params = faiss.SearchParameters(sel=selector)
+    return index.search(np.asarray(x, dtype=np.float32).reshape(-1, index.d), k, params=params)
+
+
+_BACKEND_CLASSES = {
+    "IndexFlatL2": "flat",
+    "IndexHNSWFlat": "hnsw",
+    "IndexHNSWSQ": "hnsw-fp16",
+    "IndexIVFScalarQuantizer": "ivf-sq8",
+    "IndexIVFPQ": "ivf-pq",
+}
+
+
+def backend_name(index):
+    if isinstance(index, NumpyIndex):
+        return "numpy"
+    return _BACKEND_CLASSES.get(type(index).__name__, type(index).__name__)
+
+
+def index_nbytes(index):
+    """Cheap estimate of the memory an index holds, without serializing it."""
+    if isinstance(index, NumpyIndex):
+        return int(index.vectors.nbytes)
+    try:
+        return int(index.sa_code_size()) * index.ntotal
+    except RuntimeError:
+        return 4 * index.d * index.ntotal
+
+
+def index_info(index):
+    """Backend, size and memory footprint of an index, for progress reports and benchmarks."""
+    if isinstance(index, NumpyIndex):
+        nbytes = index.vectors.nbytes
+    else:
+        import faiss
+
+        nbytes = faiss.serialize_index(index).nbytes
+    return {"backend": backend_name(index), "vectors": index.ntotal, "dim": index.d, "bytes": int(nbytes)}
+
+
+def write_index(index, folder):
+    """Write an index into `folder` as index.npy (NumPy backend) or index.faiss."""
+    if isinstance(index, NumpyIndex):
+        np.save(Path(folder) / NUMPY_FILE, index.reconstruct_n(0, index.ntotal))
+    else:
+        import faiss
+
+        faiss.write_index(index, str(Path(folder) / FAISS_FILE))
+
+
+def read_index(folder, mmap=True):
+    """
+    Read the index written by `write_index`, or return None if the folder has none.
+
+    With `mmap` the vectors are memory-mapped read-only instead of copied into RAM
+    (NumPy vectors are copied on the first `add` either way).
+    """
+    folder = Path(folder)
+    if (folder / NUMPY_FILE).exists():
+        vectors = np.load(folder / NUMPY_FILE, mmap_mode="r")
+        return NumpyIndex(vectors.shape[1], vectors)
+    if not (folder / FAISS_FILE).exists():
+        return None
+    import faiss
+
+    if not mmap:
+        return tune(faiss.read_index(str(folder / FAISS_FILE)))
+    # Memory-map the vectors instead of copying them into RAM where faiss supports it
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        index = faiss.read_index(str(folder / FAISS_FILE), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(str(folder / FAISS_FILE))
+    return tune(index)
@@ -1,71 +1,98 @@
 import os
-from pathlib import Path
-import streamlit as st
-from video_processing_utils import download_video, video_to_images, video_to_audio, audio_to_text
-from llama_index.llms.azure_openai import AzureOpenAI
-from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
+from video_processing_utils import video_to_frames_and_text
 from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings
-from llama_index.multi_modal_llms.openai import OpenAIMultiModal
 from read_env import *  
+from video_store import (video_artifact_dir, has_frames, begin_frames, commit_frames, frame_files, load_transcript,
+                         save_transcript, load_video_index, save_video_index, write_manifest, read_manifest,
+                         document_metadata, load_combined_index, video_index_nbytes, TRANSCRIPT_FILE)
+from index_cache import get_index_cache
+from metrics import incr, span
 
-# Configure Azure OpenAI LLM
-llm = AzureOpenAI(
-    model="gpt-35-turbo-16k",
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-    api_key=AZURE_OPENAI_API_KEY,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    api_version=OPENAI_API_VERSION,
-)
-Settings.llm = llm
-
-# Configure Azure OpenAI Embedding Model
-embed_model = AzureOpenAIEmbedding(
-    model="text-embedding-ada-002",
-    deployment_name="supplychain-text-embedding-ada-002",
-    api_key=AZURE_OPENAI_API_KEY,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    api_version=OPENAI_API_VERSION,
-)
-Settings.embed_model = embed_model
+def configure_models():
+    """
+    Point llama_index's Settings at the shared Azure OpenAI LLM and embedding model.
+
+    The clients come from the read_env registry, so they are only built the first
+    time the video chat is used rather than when this module is imported.
+    """
+    Settings.llm = get_model("VIDEO_LLM")
+    Settings.embed_model = get_model("VIDEO_EMBED_MODEL")
+    return Settings.embed_model
 
 def process_video(context_name: str):
-     # Set up paths
+    """
+    Build (or load) the searchable index of a video.
+
+    Frames, transcript and the serialized index are kept in a persistent artifact
+    folder keyed by the video's content hash, so each stage only runs the first
+    time a given video is seen and later sessions just load the stored index.
+    The loaded index lives in the process-wide index cache: every session shares
+    one copy and concurrent requests for the same video wait for a single build.
+
+    Parameters:
+        context_name (str): File name of the video inside "./Youtube videos/".
+
+    Returns:
+        VectorStoreIndex: Index over the video's frames and transcript.
+    """
+    # Set up paths
     output_video_path = "./Youtube videos/"
-    output_folder = "./mixed_data/"
     filepath = os.path.join(output_video_path, context_name)
-    output_audio_path = os.path.join(output_folder, "output_audio.wav")
-    
-    # # Ensure output directory exists
-    Path(output_folder).mkdir(parents=True, exist_ok=True)
-
-    # # --- VIDEO PROCESSING PIPELINE ---
+    output_folder = video_artifact_dir(filepath)
 
-    # Step 1: Convert video to frames (images)
-    video_to_images(filepath, output_folder)
+    embed_model = configure_models()
 
-    # # Step 2: Convert video to audio
-    video_to_audio(filepath, output_audio_path)
+    cache_key = ("video", str(output_folder), getattr(embed_model, "model_name", None))
+    return get_index_cache().get_or_build(cache_key, lambda: _load_or_build_index(filepath, output_folder, embed_model),
+                                          size=video_index_nbytes)
 
-    # # Step 3: Convert audio to text using speech-to-text
-    text_data = audio_to_text(output_audio_path)
+def _load_or_build_index(filepath, output_folder, embed_model):
+    # Reuse the persisted index if this video was processed before
+    with span("video.load"):
+        index = load_video_index(output_folder, embed_model)
+    if index is not None:
+        return index
 
-    # Step 4: Save the transcribed text to a file
-    transcript_file_path = os.path.join(output_folder, "output_text.txt")
-    with open(transcript_file_path, "w") as file:
-        file.write(text_data)
+    # # --- VIDEO PROCESSING PIPELINE ---
 
-    # Step 5: Clean up intermediate audio file
-    os.remove(output_audio_path)
+    # Steps 1-3: Decode the video once; keyframes and the transcript are produced
+    # concurrently, with the audio going to speech-to-text in memory (no WAV file)
+    need_frames = not has_frames(output_folder)
+    need_transcript = load_transcript(output_folder) is None
+    if need_frames or need_transcript:
+        frames_folder = begin_frames(output_folder) if need_frames else None
+        _, segments = video_to_frames_and_text(filepath, frames_folder, transcribe=need_transcript)
+
+        # Step 4: Save the frames and transcribed text to the artifact store
+        if need_frames:
+            commit_frames(output_folder)
+        if need_transcript:
+            save_transcript(output_folder, " ".join(segment["text"] for segment in segments))
+        write_manifest(output_folder, filepath, segments)
+    elif read_manifest(output_folder) is None:
+        write_manifest(output_folder, filepath)
 
     # --- INDEXING AND QUERYING ---
 
-    # Step 6: Load the documents from the folder
-    documents = SimpleDirectoryReader(output_folder).load_data()
+    # Step 6: Load only this video's frames and transcript (each video has its own
+    # artifact folder, so other videos are never re-read or re-embedded)
+    input_files = frame_files(output_folder) + [os.path.join(output_folder, TRANSCRIPT_FILE)]
+    documents = SimpleDirectoryReader(input_files=input_files,
+                                      file_metadata=document_metadata(output_folder)).load_data()
 
-    # Step 7: Build an index from the documents
-    index = VectorStoreIndex.from_documents(documents, embed_model=embed_model)
+    # Step 7: Build an index from the documents and persist it for later sessions
+    with span("video.index"):
+        index = VectorStoreIndex.from_documents(documents, embed_model=embed_model)
+    save_video_index(output_folder, index, embed_model)
     return index
 
+def load_video_library_index():
+    """
+    Merge the persisted indexes of every processed video into one index, reusing
+    their stored embeddings, for questions that span several videos.
+    """
+    return load_combined_index(configure_models())
+
 def process_video_and_query(query: str,index: VectorStoreIndex):
     """
     This function processes a video file to extract audio, convert it to text,
@@ -76,14 +103,13 @@ def process_video_and_query(query: str,index: VectorStoreIndex):
 
     Returns:
         str: The answer generated from the indexed content.
+
+    Errors from the query engine are recorded as a failed "video.query" run and re-raised.
     """
+    configure_models()
     query_engine = index.as_query_engine()
-    answer = query_engine.query(query)
-
-    # Optional: print debug info
-    print(answer.get_formatted_sources())
-    print("query was:", query)
-    print("answer was:", answer)
-
-    return str(answer)
+    with span("video.query"):
+        answer = str(query_engine.query(query))
+    incr("llm.answer_chars", len(answer))
+    return answer
 
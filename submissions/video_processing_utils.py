@@ -1,10 +1,32 @@
 import os
-from pathlib import Path
-from pytube import YouTube
-from moviepy.editor import VideoFileClip
-import speech_recognition as sr
+import subprocess
+from frame_sampler import SAMPLE_FPS, select_keyframes, write_keyframes
+from concurrent.futures import ThreadPoolExecutor
+from transcription import iter_transcript_segments, iter_sample_segments, WHISPER_SAMPLE_RATE
+from metrics import incr, span
+
+# pytube and moviepy are imported inside the functions that use
+# them so importing this module (and the video chat tab) stays cheap
+
+def _decode_audio(video_path, output, rate=WHISPER_SAMPLE_RATE, format_args=("-f", "f32le")):
+    # ffmpeg reads only the audio stream (-vn) and does the downmix and the resampling,
+    # with its low-pass filter, instead of moviepy picking the nearest samples
+    from moviepy.config import get_setting
+    command = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-i", video_path,
+               "-vn", "-ac", "1", "-ar", str(rate), *format_args, output]
+    proc = subprocess.run(command, capture_output=True)
+    if proc.returncode:
+        raise RuntimeError(f"ffmpeg could not decode the audio of {video_path}: "
+                           f"{proc.stderr.decode(errors='replace').strip()}")
+    return proc.stdout
+
+def has_audio(video_path):
+    """Whether a video has an audio track, from its container headers (nothing is decoded)."""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return bool(ffmpeg_parse_infos(video_path).get("audio_found"))
 
 def download_video(url, output_path):
+    from pytube import YouTube
     yt = YouTube(url)
     metadata = {"Author": yt.author, "Title": yt.title, "Views": yt.views}
     yt.streams.get_highest_resolution().download(
@@ -12,28 +34,94 @@ def download_video(url, output_path):
     )
     return metadata
 
-def video_to_images(video_path, output_folder, fps=0.2):
-    clip = VideoFileClip(video_path)
-    clip.write_images_sequence(
-        os.path.join(output_folder, "frame%04d.png"), fps=fps
-    )
+def video_to_images(video_path, output_folder, fps=SAMPLE_FPS):
+    """
+    Write the keyframes of a video to `output_folder`.
+
+    Frames are decoded as a stream at `fps`; only scene changes that are not
+    near-duplicates of an earlier keyframe are written, instead of one PNG
+    every few seconds whatever the content.
+
+    Returns:
+        list: {"file", "timestamp"} for every keyframe written (also saved as keyframes.json).
+    """
+    from moviepy.editor import VideoFileClip
+    clip = VideoFileClip(video_path, audio=False)
+    try:
+        with span("video.frames"):
+            frames = clip.iter_frames(fps=fps, dtype="uint8", with_times=True)
+            keyframes = write_keyframes(select_keyframes(frames), output_folder)
+        incr("video.keyframes", len(keyframes))
+        return keyframes
+    finally:
+        clip.close()
 
 def video_to_audio(video_path, output_audio_path):
-    clip = VideoFileClip(video_path)
-    audio = clip.audio
-    audio.write_audiofile(output_audio_path)
+    # 16 kHz mono is all Whisper uses, and a fraction of the default 44.1 kHz stereo size
+    _decode_audio(video_path, output_audio_path, format_args=("-acodec", "pcm_s16le"))
 
 def audio_to_text(audio_path):
-    recognizer = sr.Recognizer()
-    audio_file = sr.AudioFile(audio_path)
-    with audio_file as source:
-        audio_data = recognizer.record(source)
-        try:
-            text = recognizer.recognize_whisper(audio_data)
-        except sr.UnknownValueError:
-            print("Speech recognition could not understand the audio.")
-            text = ""
-        except sr.RequestError as e:
-            print(f"Could not request results from service; {e}")
-            text = ""
+    """
+    Transcribe a WAV file with Whisper.
+
+    The audio is split at silences and the segments are transcribed in parallel by
+    the resident Whisper workers (see asr_worker.py), then joined in order.
+    """
+    with span("video.transcribe"):
+        text = " ".join(segment["text"] for segment in iter_transcript_segments(audio_path) if segment["text"])
+    incr("video.transcript_chars", len(text))
     return text
+
+def video_audio_samples(video_path, rate=WHISPER_SAMPLE_RATE):
+    """Decode a video's audio track straight into a mono float32 buffer at `rate` (no WAV file)."""
+    import numpy as np
+    return np.frombuffer(_decode_audio(video_path, "pipe:1", rate), dtype=np.float32)
+
+def video_to_frames_and_text(video_path, frames_folder=None, transcribe=True, fps=SAMPLE_FPS):
+    """
+    Extract keyframes and the transcript of a video with two concurrent decodes.
+
+    The frame branch decodes only the picture, through a VideoFileClip opened without
+    its audio reader, while the audio branch has a second ffmpeg process decode only the
+    audio track, resampled to 16 kHz mono, into memory. Each stream is decoded once and
+    the two run at the same time, so transcription does not wait for the (much slower)
+    frame decoding, ingestion takes about as long as the slower branch and no WAV is written.
+
+    Parameters:
+        video_path (str): Path of the video file.
+        frames_folder (str): Folder for the keyframes, or None to skip frame extraction.
+        transcribe (bool): Whether to run the audio branch.
+        fps (float): Rate at which frames are decoded for keyframe selection.
+
+    Returns:
+        (list, list): Keyframes written ({"file", "timestamp"}) and transcript segments
+        ({"start", "end", "text"}); None for a branch that was skipped.
+    """
+    from moviepy.editor import VideoFileClip
+    incr("video.bytes", os.path.getsize(video_path))
+
+    def frame_branch():
+        clip = VideoFileClip(video_path, audio=False)
+        try:
+            with span("video.frames"):
+                frames = clip.iter_frames(fps=fps, dtype="uint8", with_times=True)
+                keyframes = write_keyframes(select_keyframes(frames), frames_folder)
+        finally:
+            clip.close()
+        incr("video.keyframes", len(keyframes))
+        return keyframes
+
+    def audio_branch():
+        if not has_audio(video_path):
+            return []
+        with span("video.transcribe"):
+            segments = iter_sample_segments(video_audio_samples(video_path))
+            segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments if s["text"]]
+        incr("video.transcript_chars", sum(len(s["text"]) for s in segments))
+        return segments
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="video-decode") as executor:
+        keyframes = executor.submit(frame_branch) if frames_folder else None
+        segments = executor.submit(audio_branch) if transcribe else None
+        return (keyframes.result() if keyframes else None,
+                segments.result() if segments else None)
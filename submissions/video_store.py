@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import shutil
+from pathlib import Path
+
+import numpy as np
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from embedding_cache import embedding_model_id
+from hash_utils import cached_file_sha256, file_sha256
+from vector_backends import choose_backend, new_index
+
+# Root folder for persisted video artifacts (one sub-folder per video content hash)
+VIDEO_STORE_DIR = os.getenv("VIDEO_STORE_DIR", "video_store")
+
+FRAMES_DIR = "frames"
+TRANSCRIPT_FILE = "transcript.txt"
+STORAGE_DIR = "storage"
+META_FILE = "meta.json"
+MANIFEST_FILE = "manifest.json"
+KEYFRAMES_FILE = "keyframes.json"
+
+
+def video_artifact_dir(video_path, store_dir=VIDEO_STORE_DIR):
+    """
+    Return the artifact folder of a video, keyed by the sha256 of its contents.
+
+    The digest is remembered until the file changes, so reopening a video does not read it again.
+    """
+    folder = Path(store_dir) / cached_file_sha256(video_path)
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def read_meta(artifact_dir):
+    meta_path = Path(artifact_dir) / META_FILE
+    if not meta_path.exists():
+        return {}
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def write_meta(artifact_dir, meta):
+    tmp_path = Path(artifact_dir) / f".{META_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, Path(artifact_dir) / META_FILE)
+
+
+def _write_json(path, data):
+    tmp_path = Path(path).with_name(f".{Path(path).name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(artifact_dir):
+    manifest_path = Path(artifact_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def write_manifest(artifact_dir, video_path, transcript_segments=None):
+    """
+    Record what the artifact folder holds: the source video, every keyframe with its
+    timestamp and hash, and the transcript with its hash and (when known) timed segments.
+
+    Segments of an existing manifest are kept when `transcript_segments` is None.
+    """
+    artifact_dir = Path(artifact_dir)
+    previous = read_manifest(artifact_dir) or {}
+
+    keyframes_path = artifact_dir / FRAMES_DIR / KEYFRAMES_FILE
+    if keyframes_path.exists():
+        with open(keyframes_path) as f:
+            keyframes = json.load(f)
+    else:
+        keyframes = [{"file": Path(p).name, "timestamp": None} for p in frame_files(artifact_dir)]
+    frames = [dict(frame, file=f"{FRAMES_DIR}/{frame['file']}",
+                   sha256=file_sha256(artifact_dir / FRAMES_DIR / frame["file"])) for frame in keyframes]
+
+    transcript_path = artifact_dir / TRANSCRIPT_FILE
+    if transcript_segments is None:
+        transcript_segments = (previous.get("transcript") or {}).get("segments")
+
+    manifest = {
+        "video": os.path.basename(video_path),
+        "video_sha256": artifact_dir.name,
+        "created_at": previous.get("created_at", time.time()),
+        "frames": frames,
+        "transcript": {
+            "file": TRANSCRIPT_FILE,
+            "sha256": file_sha256(transcript_path) if transcript_path.exists() else None,
+            "segments": transcript_segments,
+        },
+    }
+    _write_json(artifact_dir / MANIFEST_FILE, manifest)
+    return manifest
+
+
+def document_metadata(artifact_dir):
+    """
+    Return a `file_metadata` callback for SimpleDirectoryReader that tags every
+    document of this video with its source video, kind and (for frames) timestamp.
+    """
+    manifest = read_manifest(artifact_dir) or {}
+    timestamps = {Path(frame["file"]).name: frame.get("timestamp") for frame in manifest.get("frames", [])}
+    video = manifest.get("video")
+
+    def file_metadata(file_path):
+        name = Path(file_path).name
+        if name == TRANSCRIPT_FILE:
+            return {"video": video, "kind": "transcript", "file_path": file_path}
+        return {"video": video, "kind": "frame", "timestamp": timestamps.get(name), "file_path": file_path}
+
+    return file_metadata
+
+
+def list_artifact_dirs(store_dir=VIDEO_STORE_DIR):
+    """Artifact folders of every video that has a persisted index."""
+    root = Path(store_dir)
+    if not root.exists():
+        return []
+    return sorted(p for p in root.iterdir() if (p / STORAGE_DIR / "docstore.json").exists())
+
+
+def merge_indexes(indexes, embed_model):
+    """
+    Combine per-video indexes into one VectorStoreIndex without re-embedding.
+
+    Nodes are copied together with the embeddings already stored in each index's
+    vector store, so llama_index only embeds nodes that have no vector yet.
+
+    Small libraries stay in llama_index's in-memory SimpleVectorStore (a NumPy brute-force
+    scan). Larger ones go into a FaissVectorStore with the HNSW/IVF backend and quantization
+    `choose_backend` picks for the number of nodes.
+    """
+    nodes = []
+    for index in indexes:
+        for node in index.docstore.docs.values():
+            node = node.model_copy()
+            node.embedding = index.vector_store.get(node.node_id)
+            nodes.append(node)
+
+    backend = choose_backend(len(nodes))
+    if backend == "numpy" or any(node.embedding is None for node in nodes):
+        return VectorStoreIndex(nodes, embed_model=embed_model)
+
+    from llama_index.vector_stores.faiss import FaissVectorStore
+
+    vectors = np.asarray([node.embedding for node in nodes], dtype=np.float32)
+    vector_store = FaissVectorStore(faiss_index=new_index(vectors.shape[1], vectors, backend))
+    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    return VectorStoreIndex(nodes, storage_context=storage_context, embed_model=embed_model)
+
+
+def load_video_nodes(artifact_dir):
+    """
+    Nodes of a persisted video index with their stored embeddings, without needing
+    the embedding model; used to copy videos into the library index.
+
+    Returns:
+        list: (node, embedding) pairs, or an empty list if the video has no index.
+    """
+    storage_dir = Path(artifact_dir) / STORAGE_DIR
+    if not storage_dir.exists():
+        return []
+    storage_context = StorageContext.from_defaults(persist_dir=str(storage_dir))
+    return [(node, storage_context.vector_store.get(node.node_id))
+            for node in storage_context.docstore.docs.values()]
+
+
+def load_combined_index(embed_model, store_dir=VIDEO_STORE_DIR):
+    """Load every persisted video index and merge them into a single queryable index."""
+    indexes = [load_video_index(artifact_dir, embed_model) for artifact_dir in list_artifact_dirs(store_dir)]
+    return merge_indexes([index for index in indexes if index is not None], embed_model)
+
+
+def has_frames(artifact_dir):
+    return (Path(artifact_dir) / FRAMES_DIR).is_dir()
+
+
+def begin_frames(artifact_dir):
+    """
+    Return an empty scratch folder to extract frames into.
+
+    The folder only becomes the video's frames folder in `commit_frames`, once
+    extraction succeeded, so an interrupted run never looks complete.
+    """
+    tmp_folder = Path(artifact_dir) / f".{FRAMES_DIR}.tmp"
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    tmp_folder.mkdir(parents=True)
+    return str(tmp_folder)
+
+
+def commit_frames(artifact_dir):
+    os.replace(Path(artifact_dir) / f".{FRAMES_DIR}.tmp", Path(artifact_dir) / FRAMES_DIR)
+
+
+def frame_files(artifact_dir):
+    return sorted(str(p) for p in (Path(artifact_dir) / FRAMES_DIR).glob("*.png"))
+
+
+def load_transcript(artifact_dir):
+    """Return the stored transcript of a video, or None if it was never transcribed."""
+    transcript_path = Path(artifact_dir) / TRANSCRIPT_FILE
+    if not transcript_path.exists():
+        return None
+    with open(transcript_path) as f:
+        return f.read()
+
+
+def save_transcript(artifact_dir, text):
+    tmp_path = Path(artifact_dir) / f".{TRANSCRIPT_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, Path(artifact_dir) / TRANSCRIPT_FILE)
+
+
+def load_video_index(artifact_dir, embed_model):
+    """
+    Load the persisted VectorStoreIndex of a video.
+
+    Returns None when no index was persisted yet or when it was built with a different
+    embedding model, in which case the caller re-indexes the stored frames and transcript.
+    """
+    storage_dir = Path(artifact_dir) / STORAGE_DIR
+    if not (storage_dir / "docstore.json").exists():
+        return None
+    if read_meta(artifact_dir).get("embedding_model") != embedding_model_id(embed_model):
+        return None
+    storage_context = StorageContext.from_defaults(persist_dir=str(storage_dir))
+    return load_index_from_storage(storage_context, embed_model=embed_model)
+
+
+def video_index_nbytes(index):
+    """Estimated resident size of a video index: node texts plus their embeddings."""
+    nbytes = 2 * sum(len(node.get_content()) for node in index.docstore.docs.values())
+    data = getattr(index.vector_store, "data", None)
+    if data is not None:
+        # SimpleVectorStore keeps embeddings as lists of Python floats (~32 bytes per value)
+        nbytes += 32 * sum(len(vector) for vector in data.embedding_dict.values())
+    return nbytes
+
+
+def save_video_index(artifact_dir, index, embed_model):
+    """Persist the StorageContext of a video index next to its frames and transcript."""
+    tmp_dir = Path(artifact_dir) / f".{STORAGE_DIR}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    index.storage_context.persist(persist_dir=str(tmp_dir))
+    shutil.rmtree(Path(artifact_dir) / STORAGE_DIR, ignore_errors=True)
+    os.replace(tmp_dir, Path(artifact_dir) / STORAGE_DIR)
+
+    meta = read_meta(artifact_dir)
+    meta["embedding_model"] = embedding_model_id(embed_model)
+    write_meta(artifact_dir, meta)